@@ -4,6 +4,6 @@ This package provides functionality for detecting ArUco markers and estimating
 robot poses using computer vision techniques.
 """
 
-from .estimator import ArUcoRobotPoseEstimator, RobotInformation
+from estimator import ROBOT_POSE_DTYPE, ArUcoRobotPoseEstimator, MarkerDetections, RobotInformation
 
-__all__ = ["ArUcoRobotPoseEstimator", "RobotInformation"]
+__all__ = ["ROBOT_POSE_DTYPE", "ArUcoRobotPoseEstimator", "MarkerDetections", "RobotInformation"]
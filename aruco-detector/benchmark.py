@@ -0,0 +1,286 @@
+"""Per-stage benchmark of the ArUco pipeline on recorded or synthetic frames.
+
+Examples:
+    python benchmark.py --recording recordings/arena
+    python benchmark.py --synthetic 30 --markers 12 --width 1920 --height 1080 --json results.json
+    python benchmark.py --detection-scale 0.5
+    python benchmark.py --planar --markers 40
+"""
+
+import argparse
+import json
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from camera_calibration import calibrate_camera
+from estimator import ArUcoRobotPoseEstimator
+from publisher import PosePublisher
+from recording import ReplaySource
+from synthetic import record_synthetic
+
+
+class NullClient:
+    """MQTT client stand-in that drops every message."""
+
+    def publish(self, topic, payload, qos=0):
+        pass
+
+
+class StageTimer:
+    """Collects per-stage durations and summarizes them."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            durations = np.array(samples) * 1000.0
+            mean = float(durations.mean())
+            result[stage] = {
+                "count": len(durations),
+                "mean_ms": mean,
+                "p50_ms": float(np.percentile(durations, 50)),
+                "p99_ms": float(np.percentile(durations, 99)),
+                "throughput_per_s": 1000.0 / mean if mean > 0 else math.inf,
+            }
+        return result
+
+
+def run_benchmark(source, pose_estimator, passes=1, warmup=5):
+    """
+    Feed every frame of source through the pipeline and time each stage.
+
+    Args:
+        source: ReplaySource to read frames from
+        pose_estimator: ArUcoRobotPoseEstimator under test
+        passes: Number of times the recording is played
+        warmup: Frames processed before timing starts
+
+    Returns:
+        dict with per-stage statistics and totals
+    """
+    timer = StageTimer()
+    legacy = PosePublisher(NullClient(), mode="legacy")
+    frame_publisher = PosePublisher(NullClient(), mode="frame", keyframe_interval=0.0)
+    frames = 0
+    markers = 0
+    total = len(source.recording) * passes
+    for index in range(total + warmup):
+        ret, frame = source.read()
+        if not ret:
+            source.position = 0
+            ret, frame = source.read()
+        timed = index >= warmup
+        t0 = time.perf_counter()
+        corners, ids, _ = pose_estimator.detect_markers(frame)
+        t1 = time.perf_counter()
+        valid, rotation_vectors, transition_vectors = pose_estimator.estimate_poses(corners)
+        t2 = time.perf_counter()
+        marker_ids = ids[valid, 0] if ids is not None else np.empty(0, dtype=np.int32)
+        yaws = pose_estimator.rotation_vectors_to_yaw(rotation_vectors[valid])
+        smoothed, smoothed_yaws = pose_estimator.smooth_poses(marker_ids, transition_vectors[valid], yaws, t2)
+        t3 = time.perf_counter()
+        orientation = np.radians(smoothed_yaws)
+        legacy.publish(marker_ids, -smoothed[:, 0], -smoothed[:, 1], orientation, timestamp=t0)
+        t4 = time.perf_counter()
+        frame_publisher.publish(marker_ids, -smoothed[:, 0], -smoothed[:, 1], orientation, timestamp=t0)
+        t5 = time.perf_counter()
+        if not timed:
+            continue
+        frames += 1
+        markers += len(marker_ids)
+        timer.add("detect_markers", t1 - t0)
+        timer.add("estimate_pose", t2 - t1)
+        timer.add("smoothing", t3 - t2)
+        timer.add("serialize_legacy", t4 - t3)
+        timer.add("serialize_frame", t5 - t4)
+        timer.add("total", t4 - t0)
+    return {
+        "frames": frames,
+        "markers_per_frame": markers / frames if frames else 0.0,
+        "stages": timer.summary(),
+    }
+
+
+def corner_accuracy(source, pose_estimator, reference_estimator):
+    """
+    Compare the corners found by pose_estimator with those of reference_estimator on every frame.
+
+    Args:
+        source: ReplaySource to read frames from (played once from the start)
+        pose_estimator: ArUcoRobotPoseEstimator under test
+        reference_estimator: Estimator taken as ground truth, usually full-resolution detection
+
+    Returns:
+        dict with mean/p99/max corner distance in pixels and the share of reference markers found
+    """
+    source.position = 0
+    errors = []
+    reference_markers = 0
+    matched = 0
+    for _ in range(len(source.recording)):
+        ret, frame = source.read()
+        if not ret:
+            break
+        corners, ids, _ = pose_estimator.detect_markers(frame)
+        reference_corners, reference_ids, _ = reference_estimator.detect_markers(frame)
+        if reference_ids is None:
+            continue
+        reference_markers += len(reference_ids)
+        if ids is None:
+            continue
+        found = {int(marker_id): marker_corners for marker_corners, marker_id in zip(corners, ids.ravel(), strict=True)}
+        for marker_corners, marker_id in zip(reference_corners, reference_ids.ravel(), strict=True):
+            candidate = found.get(int(marker_id))
+            if candidate is None:
+                continue
+            matched += 1
+            errors.extend(np.linalg.norm(candidate.reshape(4, 2) - marker_corners.reshape(4, 2), axis=1))
+    errors = np.array(errors) if errors else np.full(1, np.nan)
+    return {
+        "mean_px": float(errors.mean()),
+        "p99_px": float(np.percentile(errors, 99)),
+        "max_px": float(errors.max()),
+        "recall": matched / reference_markers if reference_markers else 0.0,
+    }
+
+
+def planar_agreement(source, planar_estimator, reference_estimator):
+    """
+    Compare planar poses with the PnP poses of the same markers on every frame.
+
+    Returns:
+        dict with mean/p99/max position difference in mm and mean/max yaw difference in degrees
+    """
+    source.position = 0
+    position_errors = []
+    yaw_errors = []
+    for _ in range(len(source.recording)):
+        ret, frame = source.read()
+        if not ret:
+            break
+        corners, ids, _ = reference_estimator.detect_markers(frame)
+        if ids is None:
+            continue
+        valid, rotation_vectors, transition_vectors = reference_estimator.estimate_poses(corners)
+        planar_valid, planar_rotation_vectors, planar_transition_vectors = planar_estimator.estimate_poses(corners)
+        both = valid & planar_valid
+        position_errors.extend(
+            np.linalg.norm(planar_transition_vectors[both, :2] - transition_vectors[both, :2], axis=1) * 1000.0
+        )
+        yaw_difference = (
+            reference_estimator.rotation_vectors_to_yaw(planar_rotation_vectors[both])
+            - reference_estimator.rotation_vectors_to_yaw(rotation_vectors[both])
+        )
+        yaw_errors.extend(np.abs((yaw_difference + 180.0) % 360.0 - 180.0))
+    position_errors = np.array(position_errors) if position_errors else np.full(1, np.nan)
+    yaw_errors = np.array(yaw_errors) if yaw_errors else np.full(1, np.nan)
+    return {
+        "position_mean_mm": float(position_errors.mean()),
+        "position_p99_mm": float(np.percentile(position_errors, 99)),
+        "position_max_mm": float(position_errors.max()),
+        "yaw_mean_deg": float(yaw_errors.mean()),
+        "yaw_max_deg": float(yaw_errors.max()),
+    }
+
+
+def print_report(results):
+    print(f"Frames: {results['frames']}  markers/frame: {results['markers_per_frame']:.1f}")
+    print(f"{'stage':<18}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'per s':>12}")
+    for stage, stats in results["stages"].items():
+        print(
+            f"{stage:<18}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}"
+            f"{stats['p99_ms']:>10.3f}{stats['throughput_per_s']:>12.1f}"
+        )
+    accuracy = results.get("corner_accuracy")
+    if accuracy is not None:
+        print(
+            f"Corners vs full resolution: mean {accuracy['mean_px']:.3f} px  p99 {accuracy['p99_px']:.3f} px  "
+            f"max {accuracy['max_px']:.3f} px  recall {accuracy['recall'] * 100:.1f}%"
+        )
+    agreement = results.get("planar_agreement")
+    if agreement is not None:
+        print(
+            f"Planar vs PnP: position mean {agreement['position_mean_mm']:.2f} mm  "
+            f"p99 {agreement['position_p99_mm']:.2f} mm  max {agreement['position_max_mm']:.2f} mm  "
+            f"yaw mean {agreement['yaw_mean_deg']:.3f} deg  max {agreement['yaw_max_deg']:.3f} deg"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ArUco pipeline benchmark")
+    parser.add_argument("--recording", metavar="DIR", help="Recording made with main.py --record")
+    parser.add_argument("--synthetic", type=int, default=30, help="Synthetic frames to render when no recording is given")
+    parser.add_argument("--markers", type=int, default=12, help="Markers in synthetic frames")
+    parser.add_argument("--width", type=int, default=1920, help="Synthetic frame width")
+    parser.add_argument("--height", type=int, default=1080, help="Synthetic frame height")
+    parser.add_argument("--passes", type=int, default=3, help="How many times the frames are played")
+    parser.add_argument("--realtime", action="store_true", help="Replay with the original frame timing")
+    parser.add_argument("--tracking", action="store_true", help="Benchmark ROI tracking mode")
+    parser.add_argument("--detection-scale", type=float, default=1.0,
+                        help="Coarse-to-fine detection scale; below 1 the full-resolution path is benchmarked too")
+    parser.add_argument("--detector-profile", metavar="FILE", help="Detector parameter profile from tune_detector.py")
+    parser.add_argument("--planar", action="store_true",
+                        help="Benchmark planar mode (floor homography fitted to the frames) against PnP")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    camera_matrix, distortion_coefficients = calibrate_camera()
+    pose_estimator = ArUcoRobotPoseEstimator(
+        camera_matrix, distortion_coefficients, marker_size=0.067, smooting_history=10, tracking=args.tracking,
+        detection_scale=args.detection_scale, detector_profile=args.detector_profile,
+    )
+    reference_estimator = None
+    if args.detection_scale < 1.0:
+        reference_estimator = ArUcoRobotPoseEstimator(
+            camera_matrix, distortion_coefficients, marker_size=0.067, smooting_history=10, tracking=args.tracking
+        )
+    with tempfile.TemporaryDirectory() as scratch:
+        recording = args.recording
+        if recording is None:
+            print(f"Rendering {args.synthetic} synthetic {args.width}x{args.height} frames...")
+            record_synthetic(scratch, args.synthetic, width=args.width, height=args.height, markers=args.markers)
+            recording = scratch
+        source = ReplaySource(recording, realtime=args.realtime)
+        results = run_benchmark(source, pose_estimator, passes=args.passes)
+        if reference_estimator is not None:
+            source.position = 0
+            results["reference"] = run_benchmark(source, reference_estimator, passes=args.passes)
+            results["corner_accuracy"] = corner_accuracy(
+                ReplaySource(recording), pose_estimator, reference_estimator
+            )
+        if args.planar:
+            planar_estimator = ArUcoRobotPoseEstimator(
+                camera_matrix, distortion_coefficients, marker_size=0.067, smooting_history=10,
+                tracking=args.tracking, detection_scale=args.detection_scale,
+            )
+            calibration_source = ReplaySource(recording)
+            planar_estimator.calibrate_floor(calibration_source.read()[1] for _ in calibration_source.recording)
+            source.position = 0
+            results["planar"] = run_benchmark(source, planar_estimator, passes=args.passes)
+            results["planar"]["planar_agreement"] = planar_agreement(
+                ReplaySource(recording), planar_estimator, pose_estimator
+            )
+    results["config"] = vars(args)
+    if "reference" in results:
+        print("Full resolution (reference)")
+        print_report(results["reference"])
+        print(f"Coarse-to-fine, scale {args.detection_scale}")
+    print_report(results)
+    if "planar" in results:
+        print("Planar mode")
+        print_report(results["planar"])
+    if args.json:
+        with Path(args.json).open("w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
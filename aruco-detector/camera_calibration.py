@@ -0,0 +1,124 @@
+import math
+
+import cv2
+import numpy as np
+
+
+def calibrate_camera(path="camera_calibration.npz"):
+    """
+    Load camera calibration data from calibration.npz file.
+    """
+    calibration = CameraCalibration.load(path)
+    return calibration.camera_matrix, calibration.dist_coeffs
+
+
+class CameraCalibration:
+    """Calibration with everything derived from it computed once and cached.
+
+    Holds the intrinsics and distortion for one image resolution plus what the
+    pipeline derives from them: the distortion-free (ideal pinhole) camera used
+    for PnP once corners are undistorted, and the undistortion remap tables of
+    the debug view, which are only built on first use. for_resolution() returns
+    the calibration rescaled to another capture resolution and caches it per
+    resolution, so --width/--height never reuse intrinsics of the wrong size.
+    """
+
+    def __init__(self, camera_matrix, dist_coeffs, image_size=None):
+        """
+        Args:
+            camera_matrix: 3x3 camera intrinsic matrix
+            dist_coeffs: Camera distortion coefficients
+            image_size: (width, height) the intrinsics belong to, None if unknown
+        """
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64).reshape(3, 3)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).reshape(-1)
+        self.image_size = None if image_size is None else (int(image_size[0]), int(image_size[1]))
+        # Without distortion, undistorting corners is the identity and can be skipped
+        self.distorted = bool(np.any(self.dist_coeffs != 0))
+        # Distortion-free parameters to solve PnP with on undistorted corners
+        self.ideal_dist_coeffs = np.zeros(5)
+        self._maps = None
+        self._derived = {}
+
+    @classmethod
+    def load(cls, path="camera_calibration.npz"):
+        """Load a calibration file as written by calibration.py, falling back to default values."""
+        try:
+            # Load calibration data
+            with np.load(path) as calib_data:
+                camera_matrix = calib_data["camera_matrix"]
+                distortion_coefficients = calib_data["dist_coeffs"]
+                image_size = tuple(calib_data["image_size"]) if "image_size" in calib_data else None
+                print(f"Loaded calibration data (RMS Error: {calib_data.get('rms_error', 'N/A'):.4f})")
+        except FileNotFoundError:
+            print("Warning: No calibration data found! Using default values.")
+            print("Run calibration.py first to generate proper calibration data.")
+            # Fallback to example values for Full HD (1920x1080)
+            camera_matrix = np.array([[1400, 0, 960], [0, 1400, 540], [0, 0, 1]], dtype=np.float32)
+            #distortion_coefficients = np.array([0.1, -0.2, 0, 0, 0], dtype=np.float32)
+            distortion_coefficients = np.array([0.0, -0.0, 0, 0, 0], dtype=np.float32)
+            # Example values are not rescaled, they are used as-is at any resolution
+            image_size = None
+        return cls(camera_matrix, distortion_coefficients, image_size)
+
+    def for_resolution(self, width, height):
+        """
+        Return the calibration for frames of width x height.
+
+        Intrinsics are scaled with the resolution (distortion coefficients are
+        resolution independent). This assumes the camera scales the full sensor
+        image; a different aspect ratio usually means a cropped sensor mode and
+        is only warned about.
+        """
+        size = (int(width), int(height))
+        if self.image_size is None or size == self.image_size:
+            return self
+        derived = self._derived.get(size)
+        if derived is None:
+            scale_x = size[0] / self.image_size[0]
+            scale_y = size[1] / self.image_size[1]
+            if not math.isclose(scale_x, scale_y, rel_tol=0.01):
+                print(f"Warning: calibrated at {self.image_size[0]}x{self.image_size[1]}, "
+                      f"scaling to {size[0]}x{size[1]} changes the aspect ratio")
+            camera_matrix = self.camera_matrix.copy()
+            # Pixel centers map as (p + 0.5) * scale - 0.5
+            camera_matrix[0, 0] *= scale_x
+            camera_matrix[0, 1] *= scale_x
+            camera_matrix[0, 2] = (camera_matrix[0, 2] + 0.5) * scale_x - 0.5
+            camera_matrix[1, 1] *= scale_y
+            camera_matrix[1, 2] = (camera_matrix[1, 2] + 0.5) * scale_y - 0.5
+            derived = self._derived[size] = CameraCalibration(camera_matrix, self.dist_coeffs, size)
+        return derived
+
+    def undistort_corners(self, corners):
+        """
+        Undistort the corners of all markers of a frame in one call.
+
+        Args:
+            corners: Sequence of marker corners, each shape (1, 4, 2), as returned by the detector
+
+        Returns:
+            Undistorted corners in pixels of the ideal camera, shape (n, 4, 2)
+        """
+        points = np.asarray(corners, dtype=np.float64).reshape(-1, 1, 2)
+        if not self.distorted or len(points) == 0:
+            return points.reshape(-1, 4, 2)
+        undistorted = cv2.undistortPoints(points, self.camera_matrix, self.dist_coeffs, P=self.camera_matrix)
+        return undistorted.reshape(-1, 4, 2)
+
+    def undistort_maps(self, size=None):
+        """Remap tables (built once) that undistort a whole frame, for cv2.remap."""
+        size = size or self.image_size
+        if self._maps is None or self._maps[0] != size:
+            map1, map2 = cv2.initUndistortRectifyMap(
+                self.camera_matrix, self.dist_coeffs, None, self.camera_matrix, size, cv2.CV_16SC2
+            )
+            self._maps = (size, map1, map2)
+        return self._maps[1], self._maps[2]
+
+    def undistort_frame(self, frame):
+        """Undistort a whole frame with the cached remap tables."""
+        if not self.distorted:
+            return frame
+        map1, map2 = self.undistort_maps((frame.shape[1], frame.shape[0]))
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class LatestFrameBuffer:
+    """Single-slot buffer that only keeps the newest frame.
+
+    The producer overwrites the slot on every write; a frame that is replaced
+    before the consumer picked it up is counted as dropped.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._sequence = 0
+        self._consumed_sequence = 0
+        self._closed = False
+        self.dropped_frames = 0
+
+    def put(self, frame, timestamp):
+        """Store frame as the newest one; returns the frame it replaced unread, or None."""
+        with self._condition:
+            replaced = None
+            if self._sequence > self._consumed_sequence:
+                self.dropped_frames += 1
+                replaced = self._frame
+            self._frame = frame
+            self._timestamp = timestamp
+            self._sequence += 1
+            self._condition.notify()
+            return replaced
+
+    def get(self, timeout=None):
+        """
+        Wait for a frame newer than the last one returned.
+
+        Args:
+            timeout: Maximum time to wait in seconds (None waits forever)
+
+        Returns:
+            (sequence, timestamp, frame) tuple, or None if the buffer was closed
+            or the timeout expired
+        """
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self._closed or self._sequence > self._consumed_sequence, timeout
+            )
+            if not ready or self._sequence == self._consumed_sequence:
+                return None
+            self._consumed_sequence = self._sequence
+            return self._sequence, self._timestamp, self._frame
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class FramePool:
+    """Recycles frame buffers so capture does not allocate a new array per frame.
+
+    Whoever ends up owning a frame (the detection loop, the debug overlay, or
+    the capture thread when a frame is dropped) hands it back with release().
+    When no buffer is free acquire() returns None and the reader allocates a
+    new one, so a slow consumer never stalls the camera; the pool keeps at most
+    capacity free buffers.
+    """
+
+    def __init__(self, capacity=4):
+        self.capacity = capacity
+        self._free = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """A free buffer to read into, or None to let the reader allocate one."""
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, frame):
+        """Return a frame to the pool once nobody reads it anymore."""
+        if frame is None:
+            return
+        with self._lock:
+            if len(self._free) < self.capacity:
+                self._free.append(frame)
+
+
+class CaptureThread(threading.Thread):
+    """Reads frames from a cv2.VideoCapture as fast as the camera delivers them.
+
+    Every frame is pushed into a LatestFrameBuffer so the detection stage always
+    works on the freshest frame instead of draining the driver queue. If a
+    recorder is given, every captured frame is also written to it. With a
+    FramePool, frames are read into recycled buffers and the consumer must
+    release() every frame it got from the buffer.
+    """
+
+    def __init__(self, capture, buffer=None, recorder=None, pool=None):
+        super().__init__(name="capture", daemon=True)
+        self.capture = capture
+        self.buffer = buffer if buffer is not None else LatestFrameBuffer()
+        self.recorder = recorder
+        self.pool = pool
+        self.captured_frames = 0
+        self._running = threading.Event()
+        self._running.set()
+
+    def run(self):
+        try:
+            while self._running.is_set():
+                if self.pool is None:
+                    ret, frame = self.capture.read()
+                else:
+                    # A buffer of the wrong size is reallocated by read() and simply dropped here
+                    ret, frame = self.capture.read(self.pool.acquire())
+                if not ret:
+                    break
+                timestamp = time.time()
+                if self.recorder is not None:
+                    self.recorder.write(frame, timestamp)
+                replaced = self.buffer.put(frame, timestamp)
+                if self.pool is not None:
+                    self.pool.release(replaced)
+                self.captured_frames += 1
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+            self.buffer.close()
+
+    def stop(self):
+        self._running.clear()
+
+    @property
+    def dropped_frames(self):
+        return self.buffer.dropped_frames
+
+
+def open_camera(index, width, height, fps=144):
+    """
+    Open and configure the camera used by the detector.
+
+    Args:
+        index: Camera device index
+        width: Requested frame width
+        height: Requested frame height
+        fps: Requested frame rate
+
+    Returns:
+        Configured cv2.VideoCapture
+    """
+    cap = cv2.VideoCapture(index)  # cv2.VideoCapture(4, cv2.CAP_V4L2)  # Use 0 for default camera
+    fourcc = cv2.VideoWriter_fourcc(*"MJPG")
+    cap.set(cv2.CAP_PROP_FOURCC, fourcc)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    # Keep the driver queue as short as possible, the capture thread drains it anyway
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
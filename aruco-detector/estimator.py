@@ -1,8 +1,48 @@
+import json
 import math
+from pathlib import Path
 
 import cv2
 import numpy as np
 import time
+from camera_calibration import CameraCalibration
+from planar import FloorHomography
+
+# One row per detected marker, as returned by ArUcoRobotPoseEstimator.get_robot_pose_array()
+ROBOT_POSE_DTYPE = np.dtype(
+    [
+        ("marker_id", "<i4"),
+        ("position", "<f8", (3,)),  # smoothed translation vector (m)
+        ("yaw", "<f8"),  # smoothed yaw (deg)
+        ("distance", "<f8"),
+        ("rotation_vector", "<f8", (3,)),
+    ]
+)
+
+
+def detector_parameters(profile=None):
+    """
+    Build cv2.aruco.DetectorParameters, optionally overridden by a tuned profile.
+
+    Args:
+        profile: None for OpenCV's defaults, a dict of DetectorParameters attributes,
+            or the path of a JSON profile written by tune_detector.py
+
+    Returns:
+        cv2.aruco.DetectorParameters
+    """
+    parameters = cv2.aruco.DetectorParameters()
+    if profile is None:
+        return parameters
+    if not isinstance(profile, dict):
+        with Path(profile).open() as f:
+            profile = json.load(f)
+        profile = profile.get("parameters", profile)
+    for name, value in profile.items():
+        if not hasattr(parameters, name):
+            raise ValueError(f"Unknown detector parameter in profile: {name}")
+        setattr(parameters, name, type(getattr(parameters, name))(value))
+    return parameters
 
 
 class OneEuroFilter:
@@ -51,6 +91,119 @@ class OneEuroFilter:
         return x_hat
 
 
+class OneEuroFilterBank:
+    """Array-backed One Euro filters for many markers and channels at once.
+
+    State is kept in preallocated arrays indexed by marker id (rows) and channel
+    (columns), so a whole frame of detections is filtered with one vectorized call.
+    Each channel behaves exactly like an independent OneEuroFilter. Angular channels
+    (degrees) are unwrapped against the previous raw sample before filtering and
+    wrapped back to [-180, 180) on output.
+    """
+
+    def __init__(self, channels, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, angular_channels=(), capacity=50):
+        self.channels = channels
+        self.min_cutoff = np.broadcast_to(np.asarray(min_cutoff, dtype=np.float64), (channels,)).copy()
+        self.beta = np.broadcast_to(np.asarray(beta, dtype=np.float64), (channels,)).copy()
+        self.d_cutoff = np.broadcast_to(np.asarray(d_cutoff, dtype=np.float64), (channels,)).copy()
+        self.angular = np.zeros(channels, dtype=bool)
+        self.angular[list(angular_channels)] = True
+        self.x_prev = np.zeros((capacity, channels), dtype=np.float64)
+        self.dx_prev = np.zeros((capacity, channels), dtype=np.float64)
+        self.raw_prev = np.zeros((capacity, channels), dtype=np.float64)  # last unwrapped input
+        self.t_prev = np.zeros(capacity, dtype=np.float64)
+        self.initialized = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self):
+        return self.initialized.shape[0]
+
+    def _ensure_capacity(self, size):
+        if size <= self.capacity:
+            return
+        grow = size - self.capacity
+        self.x_prev = np.pad(self.x_prev, ((0, grow), (0, 0)))
+        self.dx_prev = np.pad(self.dx_prev, ((0, grow), (0, 0)))
+        self.raw_prev = np.pad(self.raw_prev, ((0, grow), (0, 0)))
+        self.t_prev = np.pad(self.t_prev, (0, grow))
+        self.initialized = np.pad(self.initialized, (0, grow))
+
+    def reset(self, rows=None):
+        """Forget the state of the given rows (all rows if None)."""
+        if rows is None:
+            self.initialized[:] = False
+        else:
+            self.initialized[np.asarray(rows, dtype=np.intp)] = False
+
+    @staticmethod
+    def _alpha(dt, cutoff):
+        tau = 1.0 / (2.0 * math.pi * np.where(cutoff > 0.0, cutoff, 1.0))
+        return np.where(cutoff > 0.0, 1.0 / (1.0 + tau / dt), 1.0)
+
+    @staticmethod
+    def _wrap(angle):
+        return ((angle + 180.0) % 360.0) - 180.0
+
+    def __call__(self, rows, x, t=None):
+        """
+        Filter one sample per row.
+
+        Args:
+            rows: Marker ids, shape (n,)
+            x: Samples, shape (n, channels)
+            t: Timestamp shared by all samples (defaults to now)
+
+        Returns:
+            Filtered samples, shape (n, channels)
+        """
+        if t is None:
+            t = time.time()
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1)
+        x = np.array(x, dtype=np.float64).reshape(len(rows), self.channels)
+        if len(rows) == 0:
+            return x
+        self._ensure_capacity(int(rows.max()) + 1)
+
+        known = self.initialized[rows]
+        if self.angular.any() and known.any():
+            # Unwrap angular channels against the previous raw sample
+            ang = x[known][:, self.angular]
+            prev = self.raw_prev[rows[known]][:, self.angular]
+            delta = self._wrap(ang) - self._wrap(prev)
+            delta = np.where(delta > 180.0, delta - 360.0, np.where(delta < -180.0, delta + 360.0, delta))
+            unwrapped = x[known]
+            unwrapped[:, self.angular] = prev + delta
+            x[known] = unwrapped
+        self.raw_prev[rows] = x
+
+        out = x.copy()
+        if known.any():
+            idx = rows[known]
+            dt = t - self.t_prev[idx]
+            dt = np.where(dt <= 0, 1e-6, dt)[:, None]
+            x_known = x[known]
+            x_prev = self.x_prev[idx]
+            dx = (x_known - x_prev) / dt
+            alpha_d = self._alpha(dt, self.d_cutoff)
+            dx_hat = alpha_d * dx + (1 - alpha_d) * self.dx_prev[idx]
+            cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+            alpha = self._alpha(dt, cutoff)
+            x_hat = alpha * x_known + (1 - alpha) * x_prev
+            self.dx_prev[idx] = dx_hat
+            out[known] = x_hat
+
+        # First sample initializes state
+        fresh = rows[~known]
+        self.dx_prev[fresh] = 0.0
+        self.x_prev[rows] = out
+        self.t_prev[rows] = t
+        self.initialized[rows] = True
+
+        if self.angular.any():
+            out[:, self.angular] = self._wrap(out[:, self.angular])
+        return out
+
+
 class RobotInformation:
     def __init__(self, marker_id, position, rotation, distance, rotation_vector, transition_vector):
         self.marker_id = marker_id
@@ -71,10 +224,35 @@ class RobotInformation:
         }
 
 
+class MarkerDetections:
+    """Raw per-frame detection results, kept so callers can reuse them (e.g. for the debug overlay)."""
+
+    def __init__(self, corners, ids, rotation_vectors, transition_vectors):
+        self.corners = corners
+        self.ids = ids
+        self.rotation_vectors = rotation_vectors  # (n, 3), only successfully solved markers
+        self.transition_vectors = transition_vectors  # (n, 3), unsmoothed
+        # Seconds spent in each stage of get_robot_poses()
+        self.detect_time = 0.0
+        self.pnp_time = 0.0
+        self.filter_time = 0.0
+
+    @property
+    def poses(self):
+        """(rotation_vector, transition_vector) tuples in the format of estimate_pose()."""
+        return [
+            (rotation_vector.reshape(3, 1), transition_vector.reshape(3, 1))
+            for rotation_vector, transition_vector in zip(self.rotation_vectors, self.transition_vectors, strict=True)
+        ]
+
+
 class ArUcoRobotPoseEstimator:
     def __init__(self, camera_matrix, distorsion_coefficients, marker_size=0.05, smooting_history=5,
                  position_min_cutoff=0.5, position_beta=0.01, position_d_cutoff=5.0,
-                 yaw_min_cutoff=0.5, yaw_beta=0.01, yaw_d_cutoff=5.0):
+                 yaw_min_cutoff=0.5, yaw_beta=0.01, yaw_d_cutoff=5.0,
+                 tracking=False, roi_padding=0.5, full_scan_interval=30,
+                 pnp_method=cv2.SOLVEPNP_IPPE_SQUARE, detection_scale=1.0, floor=None,
+                 detector_profile=None):
         """
         Initialize the ArUco pose estimator.
 
@@ -82,16 +260,52 @@ class ArUcoRobotPoseEstimator:
             camera_matrix: 3x3 camera intrinsic matrix
             dist_coeffs: Camera distortion coefficients
             marker_size: Size of ArUco marker in meters (default: 5cm)
+            tracking: Detect only around the markers found in the previous frame
+            roi_padding: Padding around a tracked marker, as a fraction of its size in pixels
+            full_scan_interval: Frames between full-frame rescans in tracking mode
+            pnp_method: cv2.solvePnP flag used for every marker (default: square-marker solver)
+            detection_scale: Downscale factor for full-frame candidate search (1.0 = full resolution).
+                Corners found on the downscaled image are refined to sub-pixel accuracy at full resolution.
+            floor: planar.FloorHomography; when set, poses are mapped onto the floor plane instead of
+                solved with PnP (see calibrate_floor)
+            detector_profile: DetectorParameters overrides, a dict or the path of a JSON profile
+                written by tune_detector.py (default: OpenCV's defaults)
         """
         self.camera_matrix = camera_matrix
         self.dist_coeffs = distorsion_coefficients
+        # Corners are undistorted per frame in one batch, PnP then runs distortion-free
+        self.calibration = CameraCalibration(camera_matrix, distorsion_coefficients)
+        self.floor = floor
         self.marker_size = marker_size
+        self.pnp_method = pnp_method
+
+        # 3D points of marker corners in marker coordinate system, in the order expected by IPPE_SQUARE
+        half = marker_size / 2
+        self.marker_points = np.array(
+            [[-half, half, 0], [half, half, 0], [half, -half, 0], [-half, -half, 0]],
+            dtype=np.float32,
+        )
 
         # Initialize ArUco detector
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
-        self.aruco_params = cv2.aruco.DetectorParameters()
+        self.aruco_params = detector_parameters(detector_profile)
         self.detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.aruco_params)
 
+        # Coarse-to-fine detection state
+        self.set_detection_scale(detection_scale)
+        self.refine_criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 30, 0.01)
+        # Reused per-frame buffers: grayscale frame, downscaled frame and pose results
+        self._gray = None
+        self._small = None
+        self._pose_array = np.zeros(len(self.aruco_dict.bytesList), dtype=ROBOT_POSE_DTYPE)
+
+        # ROI tracking state
+        self.tracking = tracking
+        self.roi_padding = roi_padding
+        self.full_scan_interval = full_scan_interval
+        self._tracked_corners = {}  # marker_id -> corners from the previous frame
+        self._frames_since_full_scan = 0
+
         # For smoothing pose estimates - separate history for each robot
         self.pose_histories = {}  # Dictionary with marker_id as key
         self.yaw_histories = {}
@@ -99,10 +313,24 @@ class ArUcoRobotPoseEstimator:
         # One Euro filter parameter storage
         self.position_filter_params = (position_min_cutoff, position_beta, position_d_cutoff)
         self.yaw_filter_params = (yaw_min_cutoff, yaw_beta, yaw_d_cutoff)
-        # Per-marker filters
-        self.position_filters = {}  # marker_id -> [fx, fy, fz]
-        self.yaw_filters = {}       # marker_id -> filter for unwrapped yaw
-        self._yaw_last_unwrapped = {}  # marker_id -> last unwrapped yaw (deg)
+        # One filter bank for all markers, channels are x, y, z and unwrapped yaw
+        self.filter_bank = OneEuroFilterBank(
+            4,
+            min_cutoff=(position_min_cutoff,) * 3 + (yaw_min_cutoff,),
+            beta=(position_beta,) * 3 + (yaw_beta,),
+            d_cutoff=(position_d_cutoff,) * 3 + (yaw_d_cutoff,),
+            angular_channels=(3,),
+            capacity=len(self.aruco_dict.bytesList),
+        )
+
+    def set_detection_scale(self, detection_scale):
+        """Change the downscale factor of full-frame detection, also between frames."""
+        if not 0.0 < detection_scale <= 1.0:
+            raise ValueError(f"detection_scale must be in (0, 1], got {detection_scale}")
+        self.detection_scale = detection_scale
+        # Refinement window covers the uncertainty of an upscaled corner (about one coarse pixel)
+        half_window = max(2, int(math.ceil(1.0 / detection_scale)) + 1)
+        self.refine_window = (half_window, half_window)
 
     def detect_markers(self, frame):
         """
@@ -116,9 +344,187 @@ class ArUcoRobotPoseEstimator:
             ids: Detected marker IDs
             rejected: Rejected marker candidates
         """
-        corners, ids, rejected = self.detector.detectMarkers(frame)
+        # Convert once; the detector would otherwise convert every full frame and ROI crop itself
+        frame = self._to_gray(frame)
+        if not self.tracking:
+            return self._detect_full_frame(frame)
+
+        if self._tracked_corners and self._frames_since_full_scan < self.full_scan_interval:
+            corners, ids, rejected = self._detect_in_rois(frame)
+            found = set() if ids is None else {int(marker_id) for marker_id in ids.ravel()}
+            # A lost marker triggers a full rescan so it can be picked up elsewhere
+            if found.issuperset(self._tracked_corners):
+                self._frames_since_full_scan += 1
+                self._remember_corners(corners, ids)
+                return corners, ids, rejected
+
+        corners, ids, rejected = self._detect_full_frame(frame)
+        self._frames_since_full_scan = 0
+        self._remember_corners(corners, ids)
         return corners, ids, rejected
 
+    def _to_gray(self, frame):
+        """Grayscale version of frame, converted into a buffer reused across frames."""
+        if frame.ndim == 2:
+            return frame
+        if self._gray is None or self._gray.shape != frame.shape[:2]:
+            self._gray = np.empty(frame.shape[:2], dtype=frame.dtype)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray
+
+    def _detect_full_frame(self, gray):
+        """Full-frame detection, coarse-to-fine when a detection scale below 1 is configured."""
+        if self.detection_scale >= 1.0:
+            return self.detector.detectMarkers(gray)
+        height, width = gray.shape
+        small_shape = (max(1, round(height * self.detection_scale)), max(1, round(width * self.detection_scale)))
+        if self._small is None or self._small.shape != small_shape:
+            self._small = np.empty(small_shape, dtype=gray.dtype)
+        small = cv2.resize(gray, small_shape[::-1], dst=self._small, interpolation=cv2.INTER_AREA)
+        corners, ids, rejected = self.detector.detectMarkers(small)
+        scale = np.array([width / small_shape[1], height / small_shape[0]], dtype=np.float32)
+        # Pixel centers: coarse pixel c covers full-resolution pixels around (c + 0.5) * scale - 0.5
+        rejected = tuple((candidate + 0.5) * scale - 0.5 for candidate in rejected)
+        if ids is None:
+            return corners, ids, rejected
+        stacked = (np.concatenate(corners).reshape(-1, 2) + 0.5) * scale - 0.5
+        stacked = cv2.cornerSubPix(gray, stacked, self.refine_window, (-1, -1), self.refine_criteria)
+        return tuple(stacked.reshape(-1, 1, 4, 2)), ids, rejected
+
+    def _remember_corners(self, corners, ids):
+        self._tracked_corners = {}
+        if ids is None:
+            return
+        for marker_corners, marker_id in zip(corners, ids.ravel(), strict=True):
+            self._tracked_corners[int(marker_id)] = marker_corners
+
+    def _tracked_rois(self, frame_shape):
+        """Padded bounding boxes (x0, y0, x1, y1) around tracked markers, overlapping boxes merged."""
+        height, width = frame_shape[:2]
+        rois = []
+        for marker_corners in self._tracked_corners.values():
+            points = marker_corners.reshape(4, 2)
+            x0, y0 = points.min(axis=0)
+            x1, y1 = points.max(axis=0)
+            pad = max(x1 - x0, y1 - y0) * self.roi_padding + 4
+            rois.append([
+                max(int(x0 - pad), 0),
+                max(int(y0 - pad), 0),
+                min(int(math.ceil(x1 + pad)), width),
+                min(int(math.ceil(y1 + pad)), height),
+            ])
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(rois)):
+                for j in range(i + 1, len(rois)):
+                    a, b = rois[i], rois[j]
+                    if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                        rois[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del rois[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return rois
+
+    def _detect_in_rois(self, frame):
+        """Run the detector on each tracked region and map results back to frame coordinates."""
+        all_corners = []
+        all_ids = []
+        all_rejected = []
+        seen = set()
+        for x0, y0, x1, y1 in self._tracked_rois(frame.shape):
+            offset = np.array([x0, y0], dtype=np.float32)
+            corners, ids, rejected = self.detector.detectMarkers(frame[y0:y1, x0:x1])
+            all_rejected.extend(candidate + offset for candidate in rejected)
+            if ids is None:
+                continue
+            for marker_corners, marker_id in zip(corners, ids.ravel(), strict=True):
+                if int(marker_id) in seen:
+                    continue
+                seen.add(int(marker_id))
+                all_corners.append(marker_corners + offset)
+                all_ids.append(marker_id)
+        ids = np.array(all_ids, dtype=np.int32).reshape(-1, 1) if all_ids else None
+        return tuple(all_corners), ids, tuple(all_rejected)
+
+    def estimate_poses(self, corners):
+        """
+        Estimate the pose of every detected marker in one pass.
+
+        Corners are undistorted in one batch and solved with PnP without distortion,
+        or mapped onto the floor in planar mode.
+
+        Args:
+            corners: Detected marker corners
+
+        Returns:
+            valid: Boolean mask of markers whose pose could be solved, shape (n,)
+            rotation_vectors: Stacked rotation vectors, shape (n, 3)
+            transition_vectors: Stacked translation vectors, shape (n, 3)
+        """
+        count = len(corners)
+        valid = np.zeros(count, dtype=bool)
+        rotation_vectors = np.zeros((count, 3), dtype=np.float64)
+        transition_vectors = np.zeros((count, 3), dtype=np.float64)
+        if count == 0:
+            return valid, rotation_vectors, transition_vectors
+        undistorted = self.calibration.undistort_corners(corners)
+        if self.floor is not None:
+            return self.floor.estimate_poses(undistorted)
+        camera_matrix = self.calibration.camera_matrix
+        ideal_dist_coeffs = self.calibration.ideal_dist_coeffs
+        for i in range(count):
+            image_points = undistorted[i]
+            success, rotation_vector, transition_vector = cv2.solvePnP(
+                self.marker_points, image_points, camera_matrix, ideal_dist_coeffs, flags=self.pnp_method,
+            )
+            if success and not np.isfinite(rotation_vector).all():
+                # IPPE returns NaN rotations for markers seen exactly face-on; the iterative solver copes
+                success, rotation_vector, transition_vector = cv2.solvePnP(
+                    self.marker_points, image_points, camera_matrix, ideal_dist_coeffs,
+                    flags=cv2.SOLVEPNP_ITERATIVE,
+                )
+            if success and np.isfinite(rotation_vector).all() and np.isfinite(transition_vector).all():
+                valid[i] = True
+                rotation_vectors[i] = rotation_vector.ravel()
+                transition_vectors[i] = transition_vector.ravel()
+        return valid, rotation_vectors, transition_vectors
+
+    def calibrate_floor(self, frames):
+        """
+        Fit the floor homography to the markers seen in frames and switch to planar mode.
+
+        Markers are solved with PnP once, every corner of every frame then
+        constrains the image-to-floor mapping.
+
+        Args:
+            frames: Iterable of camera frames showing markers on the floor
+
+        Returns:
+            planar.FloorHomography, or None if too few markers were seen
+        """
+        self.floor = None
+        all_corners, rotation_vectors, transition_vectors = [], [], []
+        for frame in frames:
+            corners, ids, _ = self.detect_markers(frame)
+            if ids is None or len(ids) == 0:
+                continue
+            valid, frame_rotation_vectors, frame_transition_vectors = self.estimate_poses(corners)
+            all_corners.append(self.calibration.undistort_corners(corners)[valid])
+            rotation_vectors.append(frame_rotation_vectors[valid])
+            transition_vectors.append(frame_transition_vectors[valid])
+        if not all_corners:
+            return None
+        self.floor = FloorHomography.fit(
+            self.marker_points,
+            np.concatenate(all_corners),
+            np.concatenate(rotation_vectors),
+            np.concatenate(transition_vectors),
+        )
+        return self.floor
+
     def estimate_pose(self, corners, ids):
         """
         Estimate pose from detected markers.
@@ -132,30 +538,32 @@ class ArUcoRobotPoseEstimator:
         """
         if len(corners) == 0:
             return []
+        valid, rotation_vectors, transition_vectors = self.estimate_poses(corners)
+        return [
+            (rotation_vectors[i].reshape(3, 1), transition_vectors[i].reshape(3, 1))
+            for i in np.flatnonzero(valid)
+        ]
+
+    @staticmethod
+    def rotation_vectors_to_yaw(rotation_vectors):
+        """
+        Extract yaw (rotation around the Z axis) from stacked Rodrigues vectors.
 
-        poses = []
-
-        # Define 3D points of marker corners in marker coordinate system
-        marker_3d_points = np.array(
-            [
-                [-self.marker_size / 2, self.marker_size / 2, 0],
-                [self.marker_size / 2, self.marker_size / 2, 0],
-                [self.marker_size / 2, -self.marker_size / 2, 0],
-                [-self.marker_size / 2, -self.marker_size / 2, 0],
-            ],
-            dtype=np.float32,
-        )
-
-        for i in range(len(ids)):
-            # Use solvePnP to estimate pose
-            success, rotation_vector, transition_vector = cv2.solvePnP(
-                marker_3d_points, corners[i][0], self.camera_matrix, self.dist_coeffs
-            )
-
-            if success:
-                poses.append((rotation_vector, transition_vector))
+        Args:
+            rotation_vectors: Rotation vectors, shape (n, 3)
 
-        return poses
+        Returns:
+            Yaw angles in degrees, shape (n,)
+        """
+        rotation_vectors = np.asarray(rotation_vectors, dtype=np.float64).reshape(-1, 3)
+        theta = np.linalg.norm(rotation_vectors, axis=1)
+        axis = rotation_vectors / np.where(theta > 0, theta, 1.0)[:, None]
+        cos_t = np.cos(theta)
+        sin_t = np.sin(theta)
+        # R[0, 0] and R[1, 0] of the Rodrigues rotation matrix
+        r00 = cos_t + (1 - cos_t) * axis[:, 0] * axis[:, 0]
+        r10 = (1 - cos_t) * axis[:, 0] * axis[:, 1] + sin_t * axis[:, 2]
+        return np.degrees(np.arctan2(r10, r00))
 
     def rotation_vector_to_euler(self, rotation_vector):
         """
@@ -199,55 +607,26 @@ class ArUcoRobotPoseEstimator:
         """Wrap angle to [-180, 180)."""
         return ((angle + 180.0) % 360.0) - 180.0
 
-    def smooth_yaw(self, marker_id, yaw, timestamp=None):
-        """One Euro filter based yaw smoothing with angle unwrapping.
-        Steps:
-          1. Unwrap new yaw vs previous to maintain continuity.
-          2. Apply One Euro filter on unwrapped yaw.
-          3. Wrap back to [-180,180) for output.
+    def smooth_poses(self, marker_ids, translation_vectors, yaws, timestamp=None):
+        """
+        Apply the One Euro filter bank to every detected marker of a frame.
+
+        Args:
+            marker_ids: Marker IDs, shape (n,)
+            translation_vectors: Translation vectors, shape (n, 3) or (n, 3, 1)
+            yaws: Yaw angles in degrees, shape (n,)
+            timestamp: Frame timestamp
+
+        Returns:
+            smoothed translation vectors (n, 3) and smoothed yaws (n,) wrapped to [-180, 180)
         """
-        if marker_id not in self.yaw_filters:
-            min_c, beta, d_c = self.yaw_filter_params
-            self.yaw_filters[marker_id] = OneEuroFilter(min_cutoff=min_c, beta=beta, d_cutoff=d_c)
-            self._yaw_last_unwrapped[marker_id] = yaw
-            # First sample just returns wrapped yaw
-            return self._wrap_angle(yaw)
-        # Unwrap
-        prev_unwrapped = self._yaw_last_unwrapped[marker_id]
-        raw_wrapped = self._wrap_angle(yaw)
-        prev_wrapped = self._wrap_angle(prev_unwrapped)
-        delta = raw_wrapped - prev_wrapped
-        if delta > 180:
-            delta -= 360
-        elif delta < -180:
-            delta += 360
-        unwrapped = prev_unwrapped + delta
-        # Filter
-        filtered_unwrapped = self.yaw_filters[marker_id](unwrapped, timestamp)
-        self._yaw_last_unwrapped[marker_id] = unwrapped
-        return self._wrap_angle(filtered_unwrapped)
-
-    def smooth_pose(self, marker_id, translation_vector, timestamp=None):
-        """Apply One Euro filter to translation vector (x,y,z)."""
-        # translation_vector shape (3,1) or (3,) expected
-        vec = translation_vector.reshape(3)
-        if marker_id not in self.position_filters:
-            min_c, beta, d_c = self.position_filter_params
-            self.position_filters[marker_id] = [
-                OneEuroFilter(min_cutoff=min_c, beta=beta, d_cutoff=d_c),
-                OneEuroFilter(min_cutoff=min_c, beta=beta, d_cutoff=d_c),
-                OneEuroFilter(min_cutoff=min_c, beta=beta, d_cutoff=d_c),
-            ]
-        filters = self.position_filters[marker_id]
-        t = timestamp if timestamp is not None else None
-        smoothed = np.array([
-            filters[0](float(vec[0]), t),
-            filters[1](float(vec[1]), t),
-            filters[2](float(vec[2]), t),
-        ], dtype=np.float32).reshape(3, 1)
-        return smoothed
-
-    def draw_pose_info(self, frame, corners, ids, poses):
+        samples = np.empty((len(marker_ids), 4), dtype=np.float64)
+        samples[:, :3] = np.asarray(translation_vectors, dtype=np.float64).reshape(-1, 3)
+        samples[:, 3] = yaws
+        smoothed = self.filter_bank(marker_ids, samples, timestamp)
+        return smoothed[:, :3], smoothed[:, 3]
+
+    def draw_pose_info(self, frame, corners, ids, poses, in_place=False, undistorted=False):
         """
         Draw pose information on the frame.
 
@@ -256,11 +635,13 @@ class ArUcoRobotPoseEstimator:
             corners: Detected marker corners
             ids: Detected marker IDs
             poses: Estimated poses
+            in_place: Draw directly on frame instead of on a copy
+            undistorted: frame and corners are undistorted (see CameraCalibration.undistort_frame)
 
         Returns:
             Frame with pose information drawn
         """
-        result_frame = frame.copy()
+        result_frame = frame if in_place else frame.copy()
 
         # Draw detected markers
         cv2.aruco.drawDetectedMarkers(result_frame, corners, ids)
@@ -271,7 +652,7 @@ class ArUcoRobotPoseEstimator:
             cv2.drawFrameAxes(
                 result_frame,
                 self.camera_matrix,
-                self.dist_coeffs,
+                self.calibration.ideal_dist_coeffs if undistorted else self.dist_coeffs,
                 rotation_vector,
                 transition_vector,
                 self.marker_size,
@@ -281,34 +662,67 @@ class ArUcoRobotPoseEstimator:
 
         return result_frame
 
-    def get_robot_poses(self, frame):
+    def get_robot_pose_array(self, frame, return_detections=False):
         """
-        Main function to get all robot poses from camera frame.
+        Detect, solve and smooth every marker of a frame into a reused structured array.
 
         Args:
             frame: Camera frame
+            return_detections: Also return the raw MarkerDetections of this frame
 
         Returns:
-            List of RobotInformation objects
+            View of ROBOT_POSE_DTYPE rows, one per marker, or (poses, detections) if
+            return_detections is set. The view is overwritten by the next call.
         """
+        started = time.perf_counter()
         corners, ids, _ = self.detect_markers(frame)
-        robots = []
+        detected = time.perf_counter()
+        poses = self._pose_array[:0]
+        detections = MarkerDetections(corners, ids, np.empty((0, 3)), np.empty((0, 3)))
+        detections.detect_time = detected - started
         if ids is not None and len(ids) > 0:
-            poses = self.estimate_pose(corners, ids)
-            current_time = time.time()
-            for i, (rotation_vector, transition_vector) in enumerate(poses):
-                marker_id = ids[i][0]
-                smooth_transition_vector = self.smooth_pose(marker_id, transition_vector, current_time)
-                x, y, z = smooth_transition_vector[0][0], smooth_transition_vector[1][0], smooth_transition_vector[2][0]
-                yaw = self.rotation_vector_to_yaw(rotation_vector)
-                yaw = self.smooth_yaw(marker_id, yaw, current_time)
-                robot_info = RobotInformation(
-                    marker_id=marker_id,
+            valid, rotation_vectors, transition_vectors = self.estimate_poses(corners)
+            solved = time.perf_counter()
+            detections = MarkerDetections(corners, ids, rotation_vectors[valid], transition_vectors[valid])
+            detections.detect_time = detected - started
+            detections.pnp_time = solved - detected
+            if valid.any():
+                marker_ids = ids[valid, 0]
+                rotation_vectors = rotation_vectors[valid]
+                yaws = self.rotation_vectors_to_yaw(rotation_vectors)
+                smoothed, smoothed_yaws = self.smooth_poses(marker_ids, transition_vectors[valid], yaws, time.time())
+                poses = self._pose_array[: len(marker_ids)]
+                poses["marker_id"] = marker_ids
+                poses["position"] = smoothed
+                poses["yaw"] = smoothed_yaws
+                poses["distance"] = np.linalg.norm(smoothed, axis=1)
+                poses["rotation_vector"] = rotation_vectors
+                detections.filter_time = time.perf_counter() - solved
+        return (poses, detections) if return_detections else poses
+
+    def get_robot_poses(self, frame, return_detections=False):
+        """
+        Main function to get all robot poses from camera frame.
+
+        Args:
+            frame: Camera frame
+            return_detections: Also return the raw MarkerDetections of this frame
+
+        Returns:
+            List of RobotInformation objects, or (robots, detections) if return_detections is set
+        """
+        poses, detections = self.get_robot_pose_array(frame, return_detections=True)
+        robots = []
+        for pose in poses:
+            x, y, z = pose["position"]
+            robots.append(
+                RobotInformation(
+                    marker_id=pose["marker_id"],
                     position={"x": x, "y": y, "z": z},
-                    rotation={"roll": 0.0, "pitch": 0.0, "yaw": yaw},
-                    distance=np.linalg.norm(smooth_transition_vector),
-                    rotation_vector=rotation_vector,
-                    transition_vector=smooth_transition_vector,
+                    rotation={"roll": 0.0, "pitch": 0.0, "yaw": pose["yaw"]},
+                    distance=pose["distance"],
+                    rotation_vector=pose["rotation_vector"].reshape(3, 1).copy(),
+                    transition_vector=pose["position"].reshape(3, 1).copy(),
                 )
-                robots.append(robot_info)
-        return robots
+            )
+        return (robots, detections) if return_detections else robots
@@ -0,0 +1,148 @@
+import metrics
+
+
+class LatencyGovernor:
+    """Trades detection quality for latency when frames take longer than a budget.
+
+    The governor smooths the processing time per frame and walks a ladder of
+    quality levels: level 0 is the configured quality; every further level
+    lowers the detection resolution, stretches the full-frame rescan interval
+    (tracking mode) or skips frames on purpose. It steps down one level when the
+    smoothed time stays above the budget for a few frames, and back up when it
+    stays below headroom * budget, re-checking each level's own cost before
+    going further. Skipped frames count as frames processed in no time, so the
+    average is the amortized cost per captured frame. A level that has to be
+    left again soon after quality was raised doubles the patience before the
+    next raise, which stops flapping around the budget. Every change is printed
+    and exported as metrics.
+    """
+
+    def __init__(self, pose_estimator, budget, headroom=0.6, patience=10, smoothing=0.2, min_detection_scale=0.5):
+        """
+        Args:
+            pose_estimator: ArUcoRobotPoseEstimator whose detection_scale and full_scan_interval are governed
+            budget: Processing time budget per frame in seconds
+            headroom: Fraction of the budget below which quality is raised again
+            patience: Consecutive frames over (or under) the threshold before changing level
+            smoothing: Weight of the newest sample in the moving average
+            min_detection_scale: Lowest detection scale the governor goes down to
+        """
+        self.pose_estimator = pose_estimator
+        self.budget = budget
+        self.headroom = headroom
+        self.patience = patience
+        self.smoothing = smoothing
+        self.levels = self._build_levels(
+            pose_estimator.detection_scale, pose_estimator.full_scan_interval, pose_estimator.tracking,
+            min_detection_scale,
+        )
+        self.level = 0
+        self.average = None
+        self._over = 0
+        self._under = 0
+        self._raise_patience = patience
+        self._frames_since_raise = None
+        self._frame_index = 0
+        self.skipped_frames = 0
+        self._apply()
+
+    @staticmethod
+    def _build_levels(detection_scale, full_scan_interval, tracking, min_detection_scale):
+        """Quality ladder of (detection_scale, full_scan_interval, frame_stride), best first."""
+        levels = [(detection_scale, full_scan_interval, 1)]
+        for scale in (0.75, 0.5, 0.35, 0.25):
+            if min_detection_scale <= scale < levels[-1][0]:
+                levels.append((scale, full_scan_interval, 1))
+        scale = levels[-1][0]
+        if tracking:
+            # Full-frame rescans are the expensive frames of tracking mode
+            levels.append((scale, full_scan_interval * 2, 1))
+            levels.append((scale, full_scan_interval * 4, 1))
+        interval = levels[-1][1]
+        levels.append((scale, interval, 2))
+        levels.append((scale, interval, 3))
+        return levels
+
+    @property
+    def detection_scale(self):
+        return self.levels[self.level][0]
+
+    @property
+    def full_scan_interval(self):
+        return self.levels[self.level][1]
+
+    @property
+    def frame_stride(self):
+        return self.levels[self.level][2]
+
+    def should_process(self):
+        """Whether the next frame is processed; at the frame-skipping levels some are dropped on purpose."""
+        self._frame_index += 1
+        if self._frame_index % self.frame_stride == 0:
+            return True
+        self.skipped_frames += 1
+        metrics.FRAMES_SKIPPED.inc()
+        self.observe(0.0)
+        return False
+
+    def observe(self, seconds):
+        """
+        Record the processing time of one frame and adjust the level.
+
+        Returns:
+            -1 when quality was lowered, 1 when it was raised, 0 otherwise
+        """
+        if self.average is None:
+            self.average = seconds
+        else:
+            self.average += self.smoothing * (seconds - self.average)
+        self._over = self._over + 1 if self.average > self.budget else 0
+        self._under = self._under + 1 if self.average < self.headroom * self.budget else 0
+        if self._frames_since_raise is not None:
+            self._frames_since_raise += 1
+            if self._frames_since_raise > 4 * self._raise_patience:
+                # The raised level held, forget the backoff
+                self._raise_patience = self.patience
+                self._frames_since_raise = None
+        if self._over >= self.patience and self.level < len(self.levels) - 1:
+            if self._frames_since_raise is not None:
+                # Raised too early, wait longer next time
+                self._raise_patience = min(self._raise_patience * 2, 64 * self.patience)
+                self._frames_since_raise = None
+            return self._change(1, "over")
+        if self._under >= self._raise_patience and self.level > 0:
+            self._frames_since_raise = 0
+            return self._change(-1, "under")
+        return 0
+
+    def _change(self, step, reason):
+        self.level += step
+        self._over = 0
+        self._under = 0
+        # The new level has a different cost, measure it afresh
+        self.average = None
+        self._apply()
+        direction = "lower" if step > 0 else "raise"
+        metrics.GOVERNOR_DECISIONS.labels(direction).inc()
+        print(
+            f"\nGovernor: {direction} quality to level {self.level} ({reason} budget "
+            f"{self.budget * 1000:.1f} ms): {self.describe()}"
+        )
+        return -step
+
+    def _apply(self):
+        if self.pose_estimator.detection_scale != self.detection_scale:
+            self.pose_estimator.set_detection_scale(self.detection_scale)
+        self.pose_estimator.full_scan_interval = self.full_scan_interval
+        metrics.GOVERNOR_LEVEL.set(self.level)
+        metrics.DETECTION_SCALE.set(self.detection_scale)
+        metrics.FRAME_STRIDE.set(self.frame_stride)
+
+    def describe(self):
+        """One-line summary of the current level for the FPS output."""
+        text = f"level {self.level}/{len(self.levels) - 1}, scale {self.detection_scale:.2f}"
+        if self.pose_estimator.tracking:
+            text += f", rescan every {self.full_scan_interval}"
+        if self.frame_stride > 1:
+            text += f", 1 of {self.frame_stride} frames"
+        return text
@@ -1,82 +1,187 @@
 import argparse
-import json
 import math
+import time
+from pathlib import Path
 
 import cv2
+import metrics
 import numpy as np
 import paho.mqtt.client as mqtt
+from camera_calibration import CameraCalibration
+from capture import CaptureThread, FramePool, open_camera
 from estimator import ArUcoRobotPoseEstimator
+from governor import LatencyGovernor
+from multicam import MAX_MARKERS, CameraPool, CameraSpec, run_fusion
+from overlay import DebugOverlay
+from planar import FloorHomography
+from predictor import PredictivePublisher
+from publisher import PosePublisher
+from recording import FrameRecorder, ReplaySource
+from tracker import MarkerTracker
 
 
-def calibrate_camera():
+def publish_stable_poses(publisher, tracker, pose_infos, capture_time, debug=False):
     """
-    Load camera calibration data from calibration.npz file.
+    Track RobotInformation objects with tracker and publish the confirmed ones.
+
+    Returns:
+        Time publishing started and the number of confirmed poses
+    """
+    for pose_info in pose_infos:
+        # Print pose information
+        pos = pose_info.position
+        rot = pose_info.rotation
+        if(debug):
+            print(
+                f"\rMarker {pose_info.marker_id}: "
+                f"Pos({pos['x']:.3f}, {pos['y']:.3f}, {pos['z']:.3f}) "
+                f"Rot({rot['roll']:.1f}, {rot['pitch']:.1f}, {rot['yaw']:.1f})"
+            )
+    tracker.update(
+        [int(pose_info.marker_id) for pose_info in pose_infos],
+        [float(pose_info.position["x"]) * -1 for pose_info in pose_infos],
+        [float(pose_info.position["y"]) * -1 for pose_info in pose_infos],
+        [float(pose_info.rotation["yaw"]) * math.pi / 180.0 for pose_info in pose_infos],
+        timestamp=capture_time,
+    )
+    ids, x, y, orientation, last_seen = tracker.confirmed()
+    publish_started = time.time()
+    # Held poses keep the capture time of the frame they were last seen in
+    publisher.publish(ids, x, y, orientation, timestamp=last_seen)
+    return publish_started, len(ids)
+
+
+def create_publisher(client, publish_mode, frame_encoding, qos, max_publish_rate, position_threshold,
+                     orientation_threshold, keyframe_interval, predict_rate, predict_lead):
+    """
+    Create the pose publisher shared by the single- and multi-camera modes.
+
+    With predict_rate > 0 poses are published at that fixed rate, extrapolated to the
+    publish time, instead of per frame; the returned PredictivePublisher is already started.
     """
+    publisher = PosePublisher(
+        client,
+        mode=publish_mode,
+        encoding=frame_encoding,
+        qos=qos,
+        max_rate=max_publish_rate,
+        position_threshold=position_threshold,
+        orientation_threshold=orientation_threshold,
+        keyframe_interval=keyframe_interval,
+    )
+    if predict_rate > 0:
+        publisher = PredictivePublisher(publisher, rate=predict_rate, lead=predict_lead)
+        publisher.start()
+        print(f"Publishing predicted poses at {predict_rate:.0f} Hz (lead {predict_lead * 1000:.0f} ms)")
+    return publisher
+
+
+def run_cameras(config, publisher, tracker):
+    """
+    Multi-camera mode: one detection worker process per camera, fused into world coordinates.
+
+    Args:
+        config: Path of the cameras JSON config (see multicam.CameraSpec)
+        publisher: PosePublisher the fused poses are published with
+        tracker: MarkerTracker deciding which fused markers are published
+    """
+    specs = CameraSpec.load_all(config)
+    pool = CameraPool(specs)
+    pool.start()
+    print(f"Fusing {len(specs)} cameras: {', '.join(spec.name for spec in specs)}")
+    fps_counter = 0
+    fps_start_time = time.time()
+
+    def publish(ids, xy, yaw, capture_time):
+        nonlocal fps_counter, fps_start_time
+        tracker.update(ids, xy[:, 0], xy[:, 1], np.radians(yaw), timestamp=capture_time)
+        stable_ids, x, y, orientation, last_seen = tracker.confirmed()
+        published_messages = publisher.published_messages
+        publisher.publish(stable_ids, x, y, orientation, timestamp=last_seen)
+        metrics.END_TO_END_LATENCY.observe(time.time() - capture_time)
+        metrics.FRAMES_PROCESSED.inc()
+        metrics.MESSAGES_PUBLISHED.inc(publisher.published_messages - published_messages)
+        metrics.MARKERS_DETECTED.set(len(ids))
+        metrics.MARKERS_TRACKED.set(len(stable_ids))
+        fps_counter += 1
+        if fps_counter % 30 == 0:
+            now = time.time()
+            print(f"\nFused updates/s: {30 / (now - fps_start_time):.1f}", end="")
+            fps_start_time = now
+
     try:
-        # Load calibration data
-        calib_data = np.load('camera_calibration.npz')
-        camera_matrix = calib_data['camera_matrix']
-        distortion_coefficients = calib_data['dist_coeffs']
-        print(f"Loaded calibration data (RMS Error: {calib_data.get('rms_error', 'N/A'):.4f})")
-        return camera_matrix, distortion_coefficients
-    except FileNotFoundError:
-        print("Warning: No calibration data found! Using default values.")
-        print("Run calibration.py first to generate proper calibration data.")
-        # Fallback to example values for Full HD (1920x1080)
-        camera_matrix = np.array([[1400, 0, 960], [0, 1400, 540], [0, 0, 1]], dtype=np.float32)
-        #distortion_coefficients = np.array([0.1, -0.2, 0, 0, 0], dtype=np.float32)
-        distortion_coefficients = np.array([0.0, -0.0, 0, 0, 0], dtype=np.float32)
-        return camera_matrix, distortion_coefficients
-
-
-class PoseInfo:
-    def __init__(self, marker_id, position, rotation):
-        self.marker_id = marker_id
-        self.position = position
-        self.rotation = rotation
-        self.ticks = 0  # Initialize ticks to zero
-
-    def __repr__(self):
-        return f"PoseInfo(marker_id={self.marker_id}, position={self.position}, rotation={self.rotation})"
-
-class PosesInfo:
-    def __init__(self):
-        self.poses = {}
-
-    def update_pose(self, marker_id, position, rotation):
-        if marker_id not in self.poses:
-            self.poses[marker_id] = PoseInfo(marker_id, position, rotation)
-        else:
-            self.poses[marker_id].position = position
-            self.poses[marker_id].rotation = rotation
-        self.poses[marker_id].ticks += 1  # Increment ticks on each update
+        run_fusion(pool, publish)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+def calibrate_floor(pose_estimator, frame_buffer, path, frames=30, release=None):
+    """
+    Switch pose_estimator to planar mode with the floor homography stored at path.
+
+    Without a stored homography it is fitted to the markers of the next frames
+    (solved once with PnP) and saved to path.
+    """
+    if Path(path).exists():
+        pose_estimator.floor = FloorHomography.load(path)
+        print(f"Planar mode, floor homography loaded from {path}")
+        return
 
-    def remove_poses_not_in_list(self, valid_ids):
-        for marker_id in list(self.poses.keys()):
-            if marker_id not in valid_ids:
-                del self.poses[marker_id]
-    def get_pose(self, marker_id):
-        return self.poses.get(marker_id, None)
+    def next_frames():
+        taken = 0
+        while taken < frames:
+            latest = frame_buffer.get(timeout=1.0)
+            if latest is None:
+                if frame_buffer.closed:
+                    return
+                continue
+            taken += 1
+            yield latest[2]
+            if release is not None:
+                release(latest[2])
 
-    def get_all_poses_greater_than_ticks(self, min_ticks):
-        return [pose for pose in self.poses.values() if pose.ticks > min_ticks]
+    print(f"Calibrating the floor homography on {frames} frames...")
+    floor = pose_estimator.calibrate_floor(next_frames())
+    if floor is None:
+        print("Warning: no markers seen, planar mode disabled")
+        return
+    floor.save(path)
+    print(f"Planar mode, floor homography saved to {path}")
 
-    def __repr__(self):
-        return f"PosesInfo(poses={self.poses})"
 
-poses_info = PosesInfo()
-def main(debug=False, mqtt_url="localhost", width=640, height=480):
+def main(debug=False, mqtt_url="localhost", width=640, height=480, tracking=False, full_scan_interval=30,
+         debug_fps=30.0, publish_mode="legacy", frame_encoding="binary", qos=0, max_publish_rate=0.0,
+         position_threshold=0.0, orientation_threshold=0.0, keyframe_interval=1.0, record=None, replay=None,
+         replay_realtime=False, metrics_port=8000, cameras=None, detection_scale=1.0, zero_copy=False, predict_rate=0.0,
+         predict_lead=0.0, undistort_view=False, planar=None, confirm_hits=6, drop_misses=5,
+         detector_profile=None, latency_budget=0.0, min_detection_scale=0.5):
     """
     Main function to run the robot pose estimation system.
     """
+    if cameras is not None:
+        client = mqtt.Client()
+        client.connect(mqtt_url, 1883)
+        client.loop_start()
+        if metrics_port:
+            metrics.start_metrics_server(metrics_port)
+        publisher = create_publisher(
+            client, publish_mode, frame_encoding, qos, max_publish_rate, position_threshold, orientation_threshold,
+            keyframe_interval, predict_rate, predict_lead,
+        )
+        run_cameras(cameras, publisher, MarkerTracker(MAX_MARKERS, confirm_hits=confirm_hits, drop_misses=drop_misses))
+        if predict_rate > 0:
+            publisher.stop()
+        client.loop_stop()
+        client.disconnect()
+        return
 
-    # Initialize camera
-    cap = cv2.VideoCapture(5) # cv2.VideoCapture(4, cv2.CAP_V4L2)  # Use 0 for default camera
-    fourcc = cv2.VideoWriter_fourcc(*"MJPG")
-    cap.set(cv2.CAP_PROP_FOURCC, fourcc)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-    cap.set(cv2.CAP_PROP_FPS, 144)
+    # Initialize camera, or play back a recording instead
+    if replay is not None:
+        cap = ReplaySource(replay, realtime=replay_realtime)
+    else:
+        cap = open_camera(5, width, height, fps=144)
 
     # Check what we actually got
     actual_width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
@@ -85,11 +190,21 @@ def main(debug=False, mqtt_url="localhost", width=640, height=480):
 
     print(f"Camera initialized with resolution: {int(actual_width)}x{int(actual_height)} at {actual_fps} FPS")
 
-    # Get camera calibration parameters
-    camera_matrix, distortion_coefficients = calibrate_camera()
+    # Get camera calibration parameters for the resolution we actually got
+    calibration = CameraCalibration.load().for_resolution(actual_width, actual_height)
+    camera_matrix, distortion_coefficients = calibration.camera_matrix, calibration.dist_coeffs
 
     # Initialize pose estimator
-    pose_estimator = ArUcoRobotPoseEstimator(camera_matrix, distortion_coefficients, marker_size=0.067, smooting_history=10)
+    pose_estimator = ArUcoRobotPoseEstimator(
+        camera_matrix,
+        distortion_coefficients,
+        marker_size=0.067,
+        smooting_history=10,
+        tracking=tracking,
+        full_scan_interval=full_scan_interval,
+        detection_scale=detection_scale,
+        detector_profile=detector_profile,
+    )
 
     # Initialize MQTT client
     print(f"Connecting to MQTT broker... {mqtt_url}")
@@ -100,75 +215,131 @@ def main(debug=False, mqtt_url="localhost", width=640, height=480):
     print(f"Connected to MQTT broker at {mqtt_url}")
     print("Press 'q' to quit")
     print("Press 's' to save current pose")
-    mqtt_topic = "robots/"
+    publisher = create_publisher(
+        client, publish_mode, frame_encoding, qos, max_publish_rate, position_threshold, orientation_threshold,
+        keyframe_interval, predict_rate, predict_lead,
+    )
     client.loop_start()
+    if metrics_port:
+        metrics.start_metrics_server(metrics_port)
+    # Capture runs on its own thread and only keeps the newest frame
+    recorder = FrameRecorder(record) if record is not None else None
+    if recorder is not None:
+        print(f"Recording raw frames to {record}")
+    # In zero-copy mode frames are read into recycled buffers that are released after use
+    frame_pool = FramePool() if zero_copy else None
+    capture_thread = CaptureThread(cap, recorder=recorder, pool=frame_pool)
+    capture_thread.start()
+    frame_buffer = capture_thread.buffer
+    if planar is not None:
+        calibrate_floor(pose_estimator, frame_buffer, planar, release=frame_pool.release if frame_pool is not None else None)
+    # Debug view is drawn and shown on its own thread at a capped rate
+    overlay = None
+    if debug:
+        overlay = DebugOverlay(
+            pose_estimator,
+            max_fps=debug_fps,
+            release=frame_pool.release if frame_pool is not None else None,
+            undistort=undistort_view,
+        )
+        overlay.start()
+    # Lowers detection quality when frames take longer than the latency budget
+    governor = None
+    if latency_budget > 0:
+        governor = LatencyGovernor(pose_estimator, latency_budget / 1000.0, min_detection_scale=min_detection_scale)
+        print(f"Latency governor: budget {latency_budget:.1f} ms, {governor.describe()}")
+    # One tracker slot per marker id decides which markers are published
+    tracker = MarkerTracker(len(pose_estimator.aruco_dict.bytesList), confirm_hits=confirm_hits, drop_misses=drop_misses)
     # FPS calculation variables
     fps_counter = 0
     fps_start_time = cv2.getTickCount()
+    dropped_frames = 0
+    published_messages = 0
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Get robot pose
-        pose_infos = pose_estimator.get_robot_poses(frame)
-        for pose_info in pose_infos:
-            # Print pose information
-            pos = pose_info.position
-            rot = pose_info.rotation
-            if(debug):
-                print(
-                    f"\rMarker {pose_info.marker_id}: "
-                    f"Pos({pos['x']:.3f}, {pos['y']:.3f}, {pos['z']:.3f}) "
-                    f"Rot({rot['roll']:.1f}, {rot['pitch']:.1f}, {rot['yaw']:.1f})"
-                )
-            poses_info.update_pose(pose_info.marker_id, pos, rot)
-
-            # Draw pose information on frame
-            if debug:
-                corners, ids, _ = pose_estimator.detect_markers(frame)
-                poses = pose_estimator.estimate_pose(corners, ids)
-                frame = pose_estimator.draw_pose_info(frame, corners, ids, poses)
-        # Remove poses not detected in this frame
-        detected_ids = [pose_info.marker_id for pose_info in pose_infos]
-        poses_info.remove_poses_not_in_list(detected_ids)
-        # Publish all poses with ticks > 30
-        for pose in poses_info.get_all_poses_greater_than_ticks(5):
-            pos = pose.position
-            rot = pose.rotation
-            client.publish(
-                f"{mqtt_topic}{pose.marker_id}/position",
-                json.dumps(
-                    {
-                        "x": float(pos["x"]) * -1,
-                        "y": float(pos["y"]) * -1,
-                        "orientation": float(rot["yaw"]) * math.pi / 180.0,
-                        "robot_id": int(pose.marker_id),
-                    }
-                ),
+        latest = frame_buffer.get(timeout=1.0)
+        if latest is None:
+            if frame_buffer.closed:
+                break
+            continue
+        _, capture_time, frame = latest
+        processing_started = time.time()
+        metrics.QUEUE_LATENCY.observe(processing_started - capture_time)
+        if governor is not None and not governor.should_process():
+            # Overloaded: this frame is skipped on purpose
+            if frame_pool is not None:
+                frame_pool.release(frame)
+            continue
+
+        if zero_copy:
+            # Poses are rows of one reused structured array, no per-marker objects
+            pose_infos, detections = pose_estimator.get_robot_pose_array(frame, return_detections=True)
+            tracker.update(
+                pose_infos["marker_id"],
+                -pose_infos["position"][:, 0],
+                -pose_infos["position"][:, 1],
+                np.radians(pose_infos["yaw"]),
+                timestamp=capture_time,
+            )
+            stable_ids, x, y, orientation, last_seen = tracker.confirmed()
+            publish_started = time.time()
+            publisher.publish(stable_ids, x, y, orientation, timestamp=last_seen)
+            stable_count = len(stable_ids)
+        else:
+            # Get robot pose
+            pose_infos, detections = pose_estimator.get_robot_poses(frame, return_detections=True)
+            publish_started, stable_count = publish_stable_poses(
+                publisher, tracker, pose_infos, capture_time, debug
             )
-        # Display frame in debug mode
-        if debug:
-            cv2.imshow("Robot Pose Estimation", frame)
+        metrics.DETECT_LATENCY.observe(detections.detect_time)
+        metrics.PNP_LATENCY.observe(detections.pnp_time)
+        metrics.FILTER_LATENCY.observe(detections.filter_time)
+        publish_done = time.time()
+        metrics.PUBLISH_LATENCY.observe(publish_done - publish_started)
+        metrics.END_TO_END_LATENCY.observe(publish_done - capture_time)
+        if governor is not None:
+            governor.observe(publish_done - processing_started)
+        metrics.FRAMES_PROCESSED.inc()
+        metrics.FRAMES_DROPPED.inc(capture_thread.dropped_frames - dropped_frames)
+        dropped_frames = capture_thread.dropped_frames
+        metrics.MESSAGES_PUBLISHED.inc(publisher.published_messages - published_messages)
+        published_messages = publisher.published_messages
+        metrics.MARKERS_DETECTED.set(len(pose_infos))
+        metrics.MARKERS_TRACKED.set(stable_count)
+        # Display frame in debug mode, reusing this frame's detections
+        if overlay is not None:
+            overlay.submit(frame, detections)
+        elif frame_pool is not None:
+            frame_pool.release(frame)
 
         # Calculate and print FPS
         fps_counter += 1
         if fps_counter % 30 == 0:  # Print FPS every 30 frames
             fps_end_time = cv2.getTickCount()
             fps = 30 / ((fps_end_time - fps_start_time) / cv2.getTickFrequency())
-            print(f"\nFPS: {fps:.1f}", end="")
+            status = f"dropped frames: {capture_thread.dropped_frames}"
+            if governor is not None:
+                status += f", skipped: {governor.skipped_frames}, governor {governor.describe()}"
+            print(f"\nFPS: {fps:.1f} ({status})", end="")
             fps_start_time = fps_end_time
 
-        # Handle key presses
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord("q"):
-            break
-        if key == ord("s") and pose_infos and len(pose_infos) > 0:
-            print(f"\nSaved pose: {pose_infos[0]}")
+        # Handle key presses (forwarded by the debug overlay)
+        if overlay is not None:
+            if overlay.quit_requested.is_set():
+                break
+            key = overlay.pop_key()
+            if key == ord("s") and len(pose_infos) > 0:
+                print(f"\nSaved pose: {pose_infos[0]}")
+    capture_thread.stop()
+    capture_thread.join(timeout=1.0)
+    if predict_rate > 0:
+        publisher.stop()
+        publisher.join(timeout=1.0)
+    if overlay is not None:
+        overlay.stop()
+        overlay.join(timeout=1.0)
     client.loop_stop()
     cap.release()
-    cv2.destroyAllWindows()
     client.disconnect()
 
 
@@ -178,7 +349,81 @@ if __name__ == "__main__":
     parser.add_argument("--mqtt-url", default="localhost", help="MQTT broker URL")
     parser.add_argument("--width", type=int, default=640, help="Camera frame width")
     parser.add_argument("--height", type=int, default=480, help="Camera frame height")
+    parser.add_argument("--debug-fps", type=float, default=30.0, help="Maximum refresh rate of the debug view")
+    parser.add_argument("--publish-mode", choices=["legacy", "frame", "both"], default="legacy",
+                        help="legacy: one message per robot, frame: one message per frame on robots/poses")
+    parser.add_argument("--frame-encoding", choices=["binary", "json"], default="binary", help="Encoding of frame messages")
+    parser.add_argument("--qos", type=int, choices=[0, 1, 2], default=0, help="MQTT QoS of pose messages")
+    parser.add_argument("--max-publish-rate", type=float, default=0.0, help="Maximum publish rate in Hz (0 = every frame)")
+    parser.add_argument("--position-threshold", type=float, default=0.0,
+                        help="Minimum movement in meters before a robot is re-sent in frame mode")
+    parser.add_argument("--orientation-threshold", type=float, default=0.0,
+                        help="Minimum rotation in radians before a robot is re-sent in frame mode")
+    parser.add_argument("--keyframe-interval", type=float, default=1.0,
+                        help="Seconds between frame-mode keyframes carrying every robot")
+    parser.add_argument("--record", metavar="DIR", help="Record raw camera frames to DIR for later replay")
+    parser.add_argument("--replay", metavar="DIR", help="Replay a recording instead of reading the camera")
+    parser.add_argument("--replay-realtime", action="store_true", help="Replay with the original frame timing")
+    parser.add_argument("--metrics-port", type=int, default=8000, help="Port of the Prometheus metrics endpoint (0 = off)")
+    parser.add_argument("--tracking", action="store_true", help="Detect markers only around their last known position")
+    parser.add_argument("--full-scan-interval", type=int, default=30, help="Frames between full-frame rescans in tracking mode")
+    parser.add_argument("--detection-scale", type=float, default=1.0,
+                        help="Search markers on a frame downscaled by this factor, then refine corners at full resolution")
+    parser.add_argument("--detector-profile", metavar="FILE",
+                        help="ArUco detector parameters tuned with tune_detector.py (default: OpenCV's defaults)")
+    parser.add_argument("--latency-budget", type=float, default=0.0,
+                        help="Processing time budget per frame in ms; when exceeded, detection resolution is "
+                             "lowered, rescans stretched and frames skipped until it fits (0 = off)")
+    parser.add_argument("--min-detection-scale", type=float, default=0.5,
+                        help="Lowest detection scale the latency governor may use")
+    parser.add_argument("--zero-copy", action="store_true",
+                        help="Reuse frame buffers and return poses as one structured array (no per-marker objects)")
+    parser.add_argument("--cameras", metavar="CONFIG",
+                        help="JSON config of several cameras, each detected in its own process and fused (no debug view)")
+    parser.add_argument("--undistort-view", action="store_true", help="Show the debug view undistorted")
+    parser.add_argument("--planar", metavar="FILE",
+                        help="Map markers onto the floor with the homography in FILE instead of solving PnP "
+                             "(calibrated from the first frames and saved to FILE if missing)")
+    parser.add_argument("--confirm-hits", type=int, default=6,
+                        help="Consecutive detections before a marker is published")
+    parser.add_argument("--drop-misses", type=int, default=5,
+                        help="Missed frames a published marker is held for before it is dropped (0 = drop on any miss)")
+    parser.add_argument("--predict-rate", type=float, default=0.0,
+                        help="Publish poses at this fixed rate in Hz, predicted with a constant-velocity Kalman filter (0 = per frame)")
+    parser.add_argument("--predict-lead", type=float, default=0.0,
+                        help="Extra seconds to predict ahead of the publish time, e.g. network and controller latency")
 
     args = parser.parse_args()
 
-    main(debug=args.debug, mqtt_url=args.mqtt_url, width=args.width, height=args.height)
+    main(
+        debug=args.debug,
+        mqtt_url=args.mqtt_url,
+        width=args.width,
+        height=args.height,
+        tracking=args.tracking,
+        full_scan_interval=args.full_scan_interval,
+        debug_fps=args.debug_fps,
+        publish_mode=args.publish_mode,
+        frame_encoding=args.frame_encoding,
+        qos=args.qos,
+        max_publish_rate=args.max_publish_rate,
+        position_threshold=args.position_threshold,
+        orientation_threshold=args.orientation_threshold,
+        keyframe_interval=args.keyframe_interval,
+        record=args.record,
+        replay=args.replay,
+        replay_realtime=args.replay_realtime,
+        metrics_port=args.metrics_port,
+        cameras=args.cameras,
+        detection_scale=args.detection_scale,
+        zero_copy=args.zero_copy,
+        predict_rate=args.predict_rate,
+        predict_lead=args.predict_lead,
+        undistort_view=args.undistort_view,
+        planar=args.planar,
+        confirm_hits=args.confirm_hits,
+        drop_misses=args.drop_misses,
+        detector_profile=args.detector_profile,
+        latency_budget=args.latency_budget,
+        min_detection_scale=args.min_detection_scale,
+    )
@@ -0,0 +1,46 @@
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Sub-millisecond to a quarter second, the range the detector loop operates in
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03, 0.05, 0.075, 0.1, 0.25)
+
+STAGE_LATENCY = Histogram(
+    "detector_stage_latency_seconds",
+    "Time spent in each stage of the detection pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+END_TO_END_LATENCY = Histogram(
+    "detector_capture_to_publish_seconds",
+    "Time from frame capture until its poses were handed to MQTT",
+    buckets=LATENCY_BUCKETS,
+)
+FRAMES_PROCESSED = Counter("detector_frames_processed_total", "Frames that went through detection")
+FRAMES_DROPPED = Counter("detector_frames_dropped_total", "Captured frames replaced before detection picked them up")
+MESSAGES_PUBLISHED = Counter("detector_messages_published_total", "MQTT messages published")
+MARKERS_DETECTED = Gauge("detector_markers_detected", "Markers detected in the last frame")
+PREDICTION_HORIZON = Histogram(
+    "detector_prediction_horizon_seconds",
+    "How far past their capture time predicted poses were extrapolated",
+    buckets=LATENCY_BUCKETS,
+)
+MARKERS_TRACKED = Gauge("detector_markers_tracked", "Markers stable enough to be published")
+FRAMES_SKIPPED = Counter("detector_frames_skipped_total", "Frames skipped on purpose by the latency governor")
+GOVERNOR_DECISIONS = Counter(
+    "detector_governor_decisions_total", "Quality changes made by the latency governor", ["direction"]
+)
+GOVERNOR_LEVEL = Gauge("detector_governor_level", "Current quality level of the latency governor (0 = full quality)")
+DETECTION_SCALE = Gauge("detector_detection_scale", "Downscale factor of full-frame marker detection")
+FRAME_STRIDE = Gauge("detector_frame_stride", "Every how many frames one is processed")
+
+# Pre-bound children so recording a sample is a single method call
+QUEUE_LATENCY = STAGE_LATENCY.labels("queue")
+DETECT_LATENCY = STAGE_LATENCY.labels("detect")
+PNP_LATENCY = STAGE_LATENCY.labels("pnp")
+FILTER_LATENCY = STAGE_LATENCY.labels("filter")
+PUBLISH_LATENCY = STAGE_LATENCY.labels("publish")
+
+
+def start_metrics_server(port):
+    """Serve the metrics in Prometheus text format on http://0.0.0.0:<port>/metrics."""
+    start_http_server(port)
+    print(f"Metrics available on port {port}")
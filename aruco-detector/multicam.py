@@ -0,0 +1,255 @@
+import json
+import math
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import cv2
+import numpy as np
+from camera_calibration import CameraCalibration
+from capture import CaptureThread, open_camera
+from estimator import ArUcoRobotPoseEstimator
+from recording import ReplaySource
+
+MAX_MARKERS = 50  # DICT_4X4_50
+
+# Latest detection results of one camera, written by its worker process into shared memory.
+# "sequence" works as a seqlock: odd while the worker is writing, even when the slot is consistent.
+RESULT_DTYPE = np.dtype(
+    [
+        ("sequence", "<u8"),
+        ("timestamp", "<f8"),
+        ("count", "<u4"),
+        ("ids", "<i4", (MAX_MARKERS,)),
+        ("position", "<f8", (MAX_MARKERS, 3)),
+        ("yaw", "<f8", (MAX_MARKERS,)),
+    ]
+)
+
+
+class CameraSpec:
+    """
+    One camera of a multi-camera setup, as read from the cameras JSON config.
+
+    Config entry keys:
+        name: Camera name used in logs
+        source: Device index, or path of a recording to replay
+        width, height, fps: Requested capture format
+        calibration: Path of the camera_calibration.npz of this camera
+        rotation: 3x3 rotation from camera to world coordinates
+        translation: Camera position in world coordinates (m)
+        yaw_offset: Heading trim in degrees added to marker yaw on top of the rotation (default: 0)
+        tracking: Enable ROI tracking in this camera's estimator
+        detection_scale: Coarse-to-fine detection scale of this camera's estimator
+        detector_profile: Detector parameter profile of this camera (see tune_detector.py)
+
+    A single camera published the legacy way corresponds to rotation diag(-1, -1, 1),
+    translation 0 and yaw_offset 0. Marker yaw is turned by the rotation's heading
+    relative to that legacy orientation, so a camera mounted rotated about the
+    vertical axis needs no yaw_offset.
+    """
+
+    def __init__(self, name, source, width=1920, height=1080, fps=144, calibration="camera_calibration.npz",
+                 rotation=None, translation=None, yaw_offset=0.0, tracking=False, marker_size=0.067,
+                 detection_scale=1.0, detector_profile=None):
+        self.name = name
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.calibration = calibration
+        self.rotation = np.array(rotation if rotation is not None else np.diag([-1.0, -1.0, 1.0]), dtype=np.float64)
+        self.translation = np.array(translation if translation is not None else [0.0, 0.0, 0.0], dtype=np.float64)
+        self.yaw_offset = float(yaw_offset)
+        # Heading of the rotation relative to the legacy diag(-1, -1, 1), i.e. of rotation @ diag(-1, -1, 1)
+        self.heading_offset = math.degrees(math.atan2(-self.rotation[1, 0], -self.rotation[0, 0])) + self.yaw_offset
+        self.tracking = tracking
+        self.marker_size = marker_size
+        self.detection_scale = detection_scale
+        self.detector_profile = detector_profile
+
+    @classmethod
+    def load_all(cls, path):
+        with Path(path).open() as f:
+            config = json.load(f)
+        return [cls(**entry) for entry in config["cameras"]]
+
+
+def camera_worker(spec, shm_name, stop):
+    """Worker process: capture and detect on one camera, write results to shared memory."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slot = np.ndarray((), dtype=RESULT_DTYPE, buffer=shm.buf)
+    if isinstance(spec.source, str):
+        cap = ReplaySource(spec.source, realtime=True, loop=True)
+    else:
+        cap = open_camera(spec.source, spec.width, spec.height, fps=spec.fps)
+    calibration = CameraCalibration.load(spec.calibration).for_resolution(
+        cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    )
+    camera_matrix, distortion_coefficients = calibration.camera_matrix, calibration.dist_coeffs
+    pose_estimator = ArUcoRobotPoseEstimator(
+        camera_matrix, distortion_coefficients, marker_size=spec.marker_size, tracking=spec.tracking,
+        detection_scale=spec.detection_scale, detector_profile=spec.detector_profile,
+    )
+    capture_thread = CaptureThread(cap)
+    capture_thread.start()
+    try:
+        while not stop.is_set():
+            latest = capture_thread.buffer.get(timeout=0.5)
+            if latest is None:
+                if capture_thread.buffer.closed:
+                    break
+                continue
+            _, capture_time, frame = latest
+            robots = pose_estimator.get_robot_poses(frame)[:MAX_MARKERS]
+            count = len(robots)
+            slot["sequence"] += 1
+            slot["timestamp"] = capture_time
+            slot["count"] = count
+            for i, robot in enumerate(robots):
+                slot["ids"][i] = robot.marker_id
+                slot["position"][i] = (robot.position["x"], robot.position["y"], robot.position["z"])
+                slot["yaw"][i] = robot.rotation["yaw"]
+            slot["sequence"] += 1
+    finally:
+        capture_thread.stop()
+        capture_thread.join(timeout=1.0)
+        cap.release()
+        del slot
+        shm.close()
+
+
+class CameraPool:
+    """Runs one worker process per camera and reads their latest results from shared memory."""
+
+    def __init__(self, specs):
+        self.specs = specs
+        self._context = mp.get_context("spawn")
+        self._stop = self._context.Event()
+        self._shms = []
+        self._slots = []
+        self._processes = []
+        self._last_sequence = [0] * len(specs)
+
+    def start(self):
+        for spec in self.specs:
+            shm = shared_memory.SharedMemory(create=True, size=RESULT_DTYPE.itemsize)
+            slot = np.ndarray((), dtype=RESULT_DTYPE, buffer=shm.buf)
+            slot.fill(0)
+            process = self._context.Process(
+                target=camera_worker, args=(spec, shm.name, self._stop), name=f"camera-{spec.name}", daemon=True
+            )
+            process.start()
+            self._shms.append(shm)
+            self._slots.append(slot)
+            self._processes.append(process)
+            print(f"Started camera worker {spec.name} (pid {process.pid})")
+
+    def read(self, index, attempts=1000):
+        """
+        Consistent copy of a camera's slot, or None if it has nothing new since the last read.
+
+        A worker holds the slot for microseconds while writing, so the retries are
+        bounded: a worker that died mid-write leaves the sequence odd forever, and
+        after attempts tries without a consistent copy this returns None as well.
+        """
+        slot = self._slots[index]
+        for _ in range(attempts):
+            sequence = int(slot["sequence"])
+            if sequence % 2:
+                continue
+            if sequence == self._last_sequence[index]:
+                return None
+            snapshot = slot.copy()
+            if int(slot["sequence"]) == sequence:
+                self._last_sequence[index] = sequence
+                return snapshot
+        return None
+
+    def alive(self):
+        return any(process.is_alive() for process in self._processes)
+
+    def stop(self):
+        self._stop.set()
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self._slots.clear()
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms.clear()
+
+
+def to_world(spec, result):
+    """Convert one camera's slot to world coordinates: ids, xy, yaw (deg) and camera distance per marker."""
+    count = int(result["count"])
+    ids = result["ids"][:count].copy()
+    camera_positions = result["position"][:count]
+    world = camera_positions @ spec.rotation.T + spec.translation
+    yaw = (result["yaw"][:count] + spec.heading_offset + 180.0) % 360.0 - 180.0
+    distance = np.linalg.norm(camera_positions, axis=1)
+    return ids, world[:, :2], yaw, distance
+
+
+def fuse(observations):
+    """
+    Merge the world-frame observations of all cameras into one pose per marker.
+
+    Duplicate sightings of a marker are averaged, weighted by the inverse squared
+    distance to the camera that saw them (closer cameras resolve the marker better).
+    Yaw is averaged on the unit circle.
+
+    Args:
+        observations: List of (ids, xy, yaw_deg, distance) tuples, one per camera
+
+    Returns:
+        ids (n,), xy (n, 2), yaw in degrees (n,)
+    """
+    observations = [o for o in observations if len(o[0])]
+    if not observations:
+        return np.empty(0, dtype=np.int32), np.empty((0, 2)), np.empty(0)
+    ids = np.concatenate([o[0] for o in observations])
+    xy = np.concatenate([o[1] for o in observations])
+    yaw = np.radians(np.concatenate([o[2] for o in observations]))
+    weights = 1.0 / np.maximum(np.concatenate([o[3] for o in observations]), 1e-6) ** 2
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    total = np.bincount(inverse, weights=weights)
+    fused_xy = np.column_stack(
+        (np.bincount(inverse, weights=weights * xy[:, 0]), np.bincount(inverse, weights=weights * xy[:, 1]))
+    ) / total[:, None]
+    fused_yaw = np.arctan2(
+        np.bincount(inverse, weights=weights * np.sin(yaw)), np.bincount(inverse, weights=weights * np.cos(yaw))
+    )
+    return unique_ids, fused_xy, np.degrees(fused_yaw)
+
+
+def run_fusion(pool, publish, max_age=0.1, poll_interval=0.001):
+    """
+    Fuse and publish whenever any camera produced new results.
+
+    Args:
+        pool: Started CameraPool
+        publish: Callback taking (ids, xy, yaw_deg, capture_timestamp)
+        max_age: Results older than this (s) are left out of the fusion
+        poll_interval: Sleep between polls when no camera has new results
+    """
+    latest = [None] * len(pool.specs)
+    while pool.alive():
+        updated = False
+        for index, spec in enumerate(pool.specs):
+            result = pool.read(index)
+            if result is not None:
+                latest[index] = (float(result["timestamp"]), to_world(spec, result))
+                updated = True
+        if not updated:
+            time.sleep(poll_interval)
+            continue
+        now = time.time()
+        fresh = [entry for entry in latest if entry is not None and now - entry[0] <= max_age]
+        if not fresh:
+            continue
+        ids, xy, yaw = fuse([observation for _, observation in fresh])
+        publish(ids, xy, yaw, min(timestamp for timestamp, _ in fresh))
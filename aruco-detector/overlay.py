@@ -0,0 +1,77 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+from capture import LatestFrameBuffer
+
+
+class DebugOverlay(threading.Thread):
+    """Draws and shows the debug view on its own thread at a capped rate.
+
+    The detection loop only hands over the frame and the detections it already
+    computed; frames submitted faster than the display rate are simply replaced.
+    All HighGUI calls (imshow/waitKey) happen on this thread, key presses are
+    forwarded to the detection loop through pop_key(). Frames are drawn on in
+    place; when release is given it is called with every submitted frame once
+    the overlay is done with it (shown or replaced), e.g. FramePool.release.
+    With undistort set the view is remapped with the estimator's cached
+    undistortion tables and markers are drawn at their undistorted corners.
+    """
+
+    def __init__(self, pose_estimator, max_fps=30.0, window_name="Robot Pose Estimation", release=None,
+                 undistort=False):
+        super().__init__(name="debug-overlay", daemon=True)
+        self.pose_estimator = pose_estimator
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.window_name = window_name
+        self.release = release
+        self.undistort = undistort
+        self._buffer = LatestFrameBuffer()
+        self._keys = []
+        self._keys_lock = threading.Lock()
+        self.quit_requested = threading.Event()
+
+    def submit(self, frame, detections):
+        """Hand over a frame and its MarkerDetections; the frame must not be modified afterwards."""
+        replaced = self._buffer.put((frame, detections), time.time())
+        if replaced is not None and self.release is not None:
+            self.release(replaced[0])
+
+    def pop_key(self):
+        """Return the oldest unprocessed key press, or None."""
+        with self._keys_lock:
+            return self._keys.pop(0) if self._keys else None
+
+    def run(self):
+        last_shown = 0.0
+        while not self._buffer.closed:
+            latest = self._buffer.get(timeout=0.1)
+            if latest is not None:
+                _, _, (frame, detections) = latest
+                view = frame
+                corners = detections.corners
+                if self.undistort:
+                    calibration = self.pose_estimator.calibration
+                    view = calibration.undistort_frame(frame)
+                    corners = tuple(c.reshape(1, 4, 2).astype(np.float32) for c in calibration.undistort_corners(corners))
+                # The frame is not used by anyone else anymore, draw on it directly
+                self.pose_estimator.draw_pose_info(
+                    view, corners, detections.ids, detections.poses, in_place=True, undistorted=self.undistort
+                )
+                cv2.imshow(self.window_name, view)
+                if self.release is not None:
+                    self.release(frame)
+                last_shown = time.time()
+            # waitKey pumps the GUI events and doubles as the rate limiter
+            wait_ms = max(1, int((self.min_interval - (time.time() - last_shown)) * 1000))
+            key = cv2.waitKey(wait_ms) & 0xFF
+            if key == ord("q"):
+                self.quit_requested.set()
+            elif key != 0xFF:
+                with self._keys_lock:
+                    self._keys.append(key)
+        cv2.destroyAllWindows()
+
+    def stop(self):
+        self._buffer.close()
@@ -0,0 +1,102 @@
+import math
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class FloorHomography:
+    """Maps undistorted image points onto the plane the markers move in.
+
+    Robots drive on a flat floor, so every marker lies in one plane at a fixed
+    distance from the camera and a single homography takes its image corners to
+    plane coordinates. The plane coordinates are the camera-frame x and y of
+    that plane, in meters, so poses come out in the same frame (and with the
+    same yaw convention) as the PnP path and everything downstream is unchanged.
+    """
+
+    def __init__(self, homography, depth):
+        """
+        Args:
+            homography: 3x3 homography from undistorted pixels to plane x, y (meters)
+            depth: Camera-frame z of the marker plane (meters), reported as the z of every pose
+        """
+        self.homography = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+        self.depth = float(depth)
+
+    @classmethod
+    def fit(cls, marker_points, corners, rotation_vectors, transition_vectors):
+        """
+        Fit the homography to markers whose pose was solved with PnP.
+
+        Args:
+            marker_points: 3D marker corners in marker coordinates, shape (4, 3)
+            corners: Undistorted image corners of the markers, shape (n, 4, 2)
+            rotation_vectors: PnP rotation vectors, shape (n, 3)
+            transition_vectors: PnP translation vectors, shape (n, 3)
+
+        Returns:
+            FloorHomography, or None when fewer than 4 corners were given
+        """
+        corners = np.asarray(corners, dtype=np.float64).reshape(-1, 2)
+        if len(corners) < 4:
+            return None
+        camera_points = np.concatenate([
+            marker_points @ cv2.Rodrigues(rotation_vector)[0].T + transition_vector
+            for rotation_vector, transition_vector in zip(
+                np.asarray(rotation_vectors, dtype=np.float64).reshape(-1, 3),
+                np.asarray(transition_vectors, dtype=np.float64).reshape(-1, 3),
+                strict=True,
+            )
+        ])
+        homography, _ = cv2.findHomography(corners, camera_points[:, :2], cv2.RANSAC, 0.005)
+        if homography is None:
+            return None
+        return cls(homography, camera_points[:, 2].mean())
+
+    @classmethod
+    def load(cls, path):
+        with Path(path).open("rb") as f, np.load(f) as data:
+            return cls(data["homography"], data["depth"])
+
+    def save(self, path):
+        # Through a file handle np.savez keeps path as given instead of appending .npz
+        with Path(path).open("wb") as f:
+            np.savez(f, homography=self.homography, depth=self.depth)
+
+    def map_points(self, points):
+        """Map undistorted pixels, shape (..., 2), to plane x, y in meters."""
+        points = np.asarray(points, dtype=np.float64)
+        h = self.homography
+        w = points[..., 0] * h[2, 0] + points[..., 1] * h[2, 1] + h[2, 2]
+        x = (points[..., 0] * h[0, 0] + points[..., 1] * h[0, 1] + h[0, 2]) / w
+        y = (points[..., 0] * h[1, 0] + points[..., 1] * h[1, 1] + h[1, 2]) / w
+        return np.stack((x, y), axis=-1)
+
+    def estimate_poses(self, corners):
+        """
+        Planar pose of every marker of a frame in one vectorized pass, without PnP.
+
+        Args:
+            corners: Undistorted image corners, shape (n, 4, 2), in ArUco order
+
+        Returns:
+            Same as ArUcoRobotPoseEstimator.estimate_poses: valid mask (n,), rotation
+            vectors (n, 3) and translation vectors (n, 3). The rotation is the yaw
+            about the camera axis of a marker facing the camera.
+        """
+        floor = self.map_points(corners)  # (n, 4, 2)
+        count = len(floor)
+        transition_vectors = np.empty((count, 3), dtype=np.float64)
+        # A square maps onto a square, the mean of its corners is its center
+        transition_vectors[:, :2] = floor.mean(axis=1)
+        transition_vectors[:, 2] = self.depth
+        # Marker x axis: top-left to top-right, averaged with bottom-left to bottom-right
+        x_axis = (floor[:, 1] - floor[:, 0]) + (floor[:, 2] - floor[:, 3])
+        yaw = np.arctan2(x_axis[:, 1], x_axis[:, 0])
+        # Rz(yaw) @ Rx(pi), a half turn about the in-plane axis at yaw / 2
+        rotation_vectors = np.zeros((count, 3), dtype=np.float64)
+        rotation_vectors[:, 0] = math.pi * np.cos(yaw / 2)
+        rotation_vectors[:, 1] = math.pi * np.sin(yaw / 2)
+        valid = np.isfinite(transition_vectors).all(axis=1) & np.isfinite(yaw)
+        return valid, rotation_vectors, transition_vectors
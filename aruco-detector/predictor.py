@@ -0,0 +1,204 @@
+import math
+import threading
+import time
+
+import metrics
+import numpy as np
+
+
+class ConstantVelocityKalman:
+    """Array-backed constant-velocity Kalman filters for many markers at once.
+
+    Every channel (x, y and orientation by default) of every marker is an
+    independent position/velocity filter driven by white-noise acceleration, so
+    the state is kept as plain arrays indexed by marker id (rows) and channel
+    (columns) and a whole frame of measurements is fused with one vectorized
+    call. Angular channels (radians) are innovated on the wrapped difference.
+    """
+
+    def __init__(self, process_noise=(1.0, 1.0, 20.0), measurement_noise=(1e-4, 1e-4, 1e-3),
+                 initial_velocity_variance=(1.0, 1.0, 10.0), angular_channels=(2,), max_gap=0.5, capacity=50):
+        """
+        Args:
+            process_noise: Acceleration spectral density per channel ((unit/s^2)^2 * s)
+            measurement_noise: Measurement variance per channel (unit^2)
+            initial_velocity_variance: Velocity variance of a new track per channel ((unit/s)^2)
+            angular_channels: Channels holding angles in radians
+            max_gap: A track not updated for this many seconds restarts from its next measurement
+            capacity: Initial number of marker ids
+        """
+        self.q = np.asarray(process_noise, dtype=np.float64)
+        self.r = np.asarray(measurement_noise, dtype=np.float64)
+        self.v0 = np.asarray(initial_velocity_variance, dtype=np.float64)
+        self.channels = len(self.q)
+        self.angular = np.zeros(self.channels, dtype=bool)
+        self.angular[list(angular_channels)] = True
+        self.max_gap = max_gap
+        self.position = np.zeros((capacity, self.channels))
+        self.velocity = np.zeros((capacity, self.channels))
+        # Symmetric 2x2 covariance per channel: var(position), cov(position, velocity), var(velocity)
+        self.p00 = np.zeros((capacity, self.channels))
+        self.p01 = np.zeros((capacity, self.channels))
+        self.p11 = np.zeros((capacity, self.channels))
+        self.t_last = np.zeros(capacity)
+        self.initialized = np.zeros(capacity, dtype=bool)
+
+    def _ensure_capacity(self, size):
+        if size <= len(self.t_last):
+            return
+        grow = size - len(self.t_last)
+        for name in ("position", "velocity", "p00", "p01", "p11"):
+            setattr(self, name, np.vstack((getattr(self, name), np.zeros((grow, self.channels)))))
+        self.t_last = np.concatenate((self.t_last, np.zeros(grow)))
+        self.initialized = np.concatenate((self.initialized, np.zeros(grow, dtype=bool)))
+
+    def _wrap(self, values):
+        wrapped = (values + math.pi) % (2 * math.pi) - math.pi
+        return np.where(self.angular, wrapped, values)
+
+    def update(self, rows, measurements, timestamp):
+        """
+        Fuse one measurement per marker.
+
+        Args:
+            rows: Marker ids, shape (n,)
+            measurements: Measured values, shape (n, channels)
+            timestamp: Time the measurements describe (capture time), or one per marker, shape (n,).
+                Markers already updated at their timestamp (poses held from an earlier frame) are skipped.
+        """
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1)
+        z = np.asarray(measurements, dtype=np.float64).reshape(len(rows), self.channels)
+        if len(rows) == 0:
+            return
+        self._ensure_capacity(int(rows.max()) + 1)
+        timestamp = np.broadcast_to(np.asarray(timestamp, dtype=np.float64), rows.shape)
+        repeated = self.initialized[rows] & (timestamp == self.t_last[rows])
+        if repeated.any():
+            rows, z, timestamp = rows[~repeated], z[~repeated], timestamp[~repeated]
+        dt = timestamp - self.t_last[rows]
+        fresh = ~self.initialized[rows] | (dt > self.max_gap) | (dt < 0)
+
+        known = rows[~fresh]
+        if len(known):
+            dt_k = dt[~fresh][:, None]
+            q = self.q
+            # Predict
+            position = self.position[known] + self.velocity[known] * dt_k
+            p00 = self.p00[known] + 2 * dt_k * self.p01[known] + dt_k**2 * self.p11[known] + q * dt_k**3 / 3
+            p01 = self.p01[known] + dt_k * self.p11[known] + q * dt_k**2 / 2
+            p11 = self.p11[known] + q * dt_k
+            # Update
+            innovation = self._wrap(z[~fresh] - position)
+            s = p00 + self.r
+            k0 = p00 / s
+            k1 = p01 / s
+            self.position[known] = self._wrap(position + k0 * innovation)
+            self.velocity[known] = self.velocity[known] + k1 * innovation
+            self.p00[known] = (1 - k0) * p00
+            self.p01[known] = (1 - k0) * p01
+            self.p11[known] = p11 - k1 * p01
+
+        # New or restarted tracks start at the measurement, at rest
+        started = rows[fresh]
+        self.position[started] = z[fresh]
+        self.velocity[started] = 0.0
+        self.p00[started] = self.r
+        self.p01[started] = 0.0
+        self.p11[started] = self.v0
+        self.t_last[rows] = timestamp
+        self.initialized[rows] = True
+
+    def predict(self, rows, timestamp):
+        """
+        Extrapolate tracks to timestamp without changing the filter state.
+
+        Returns:
+            Predicted values, shape (n, channels)
+        """
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1)
+        dt = (timestamp - self.t_last[rows])[:, None]
+        return self._wrap(self.position[rows] + self.velocity[rows] * dt)
+
+    def reset(self, rows=None):
+        if rows is None:
+            self.initialized[:] = False
+        else:
+            self.initialized[np.asarray(rows, dtype=np.intp)] = False
+
+
+class PredictivePublisher(threading.Thread):
+    """Publishes poses at a fixed rate, extrapolated with a motion model to the publish time.
+
+    Drop-in for PosePublisher on the detection side: publish() feeds the poses
+    of a frame (with its capture timestamp) into a ConstantVelocityKalman
+    instead of sending them. This thread then sends every robot of the latest
+    frame at rate Hz through the wrapped PosePublisher, predicted to
+    now + lead, so the pipeline latency from capture to publish is compensated
+    and lead can cover what happens after (network, controller). Messages still
+    carry the capture timestamp of each pose and report the time it was
+    predicted to as prediction_time. Poses are not
+    extrapolated further than max_horizon past their capture time; once the
+    detection stalls that long nothing is published.
+    """
+
+    def __init__(self, publisher, rate=60.0, lead=0.0, max_horizon=0.25, kalman=None):
+        super().__init__(name="predictive-publisher", daemon=True)
+        self.publisher = publisher
+        self.period = 1.0 / rate
+        self.lead = lead
+        self.max_horizon = max_horizon
+        self.kalman = kalman if kalman is not None else ConstantVelocityKalman()
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.intp)
+        self._capture_time = 0.0
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def published_messages(self):
+        return self.publisher.published_messages
+
+    def publish(self, ids, x, y, orientation, timestamp=None):
+        """
+        Feed the poses of one frame; only these robots are published until the next frame.
+
+        timestamp is the capture time of the frame or one per robot, as for
+        PosePublisher. Poses held from earlier frames keep their own capture
+        time and are not fused again, so they do not count as new measurements.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        ids = np.asarray(ids, dtype=np.intp)
+        measurements = np.column_stack((x, y, orientation)) if len(ids) else np.empty((0, 3))
+        timestamps = np.broadcast_to(np.asarray(timestamp, dtype=np.float64), ids.shape)
+        with self._lock:
+            self.kalman.update(ids, measurements, timestamps)
+            self._ids = ids.copy()
+            self._capture_time = float(np.max(timestamp, initial=self._capture_time))
+        return True
+
+    def run(self):
+        next_publish = time.monotonic()
+        while self._running.is_set():
+            target = time.time() + self.lead
+            with self._lock:
+                ids = self._ids
+                horizon = target - self._capture_time
+                predicted = self.kalman.predict(ids, target) if horizon <= self.max_horizon else None
+                capture_times = self.kalman.t_last[ids]
+            if predicted is not None:
+                metrics.PREDICTION_HORIZON.observe(horizon)
+                # Messages keep the capture timestamp contract, the predicted-for time goes separately
+                self.publisher.publish(
+                    ids, predicted[:, 0], predicted[:, 1], predicted[:, 2], timestamp=capture_times,
+                    prediction_time=target,
+                )
+            next_publish += self.period
+            delay = next_publish - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind, skip the missed slots instead of bursting
+                next_publish = time.monotonic()
+
+    def stop(self):
+        self._running.clear()
@@ -0,0 +1,190 @@
+import json
+import struct
+import time
+
+import numpy as np
+
+POSITION_TOPIC = "robots/{}/position"
+FRAME_TOPIC = "robots/poses"
+
+# Binary frame layout (little endian):
+#   header: version u8, flags u8, robot count u16, sequence number u32, capture timestamp f64 (unix seconds)
+#   robots: robot id u16, x f32, y f32, orientation f32 (radians), one record per robot
+# Flags: bit 0 set on keyframes (every robot), clear on deltas (only robots that changed)
+FRAME_VERSION = 2
+FRAME_HEADER = struct.Struct("<BBHId")
+FRAME_FLAG_KEYFRAME = 0x01
+FRAME_RECORD = np.dtype([("robot_id", "<u2"), ("x", "<f4"), ("y", "<f4"), ("orientation", "<f4")])
+
+
+def encode_frame_binary(sequence, timestamp, ids, x, y, orientation, keyframe=False, prediction_time=None):
+    records = np.empty(len(ids), dtype=FRAME_RECORD)
+    records["robot_id"] = ids
+    records["x"] = x
+    records["y"] = y
+    records["orientation"] = orientation
+    flags = FRAME_FLAG_KEYFRAME if keyframe else 0
+    return FRAME_HEADER.pack(FRAME_VERSION, flags, len(ids), sequence & 0xFFFFFFFF, timestamp) + records.tobytes()
+
+
+def encode_frame_json(sequence, timestamp, ids, x, y, orientation, keyframe=False, prediction_time=None):
+    message = {
+        "seq": sequence,
+        "timestamp": timestamp,
+        "keyframe": keyframe,
+        "robots": [
+            {"robot_id": int(i), "x": float(px), "y": float(py), "orientation": float(o)}
+            for i, px, py, o in zip(ids, x, y, orientation, strict=True)
+        ],
+    }
+    if prediction_time is not None:
+        message["prediction_time"] = prediction_time
+    return json.dumps(message)
+
+
+def decode_frame(payload):
+    """
+    Decode a frame message published on FRAME_TOPIC, in either encoding.
+
+    Returns:
+        dict with "seq", "timestamp", "keyframe" and "robots" (list of robot_id/x/y/orientation dicts)
+    """
+    if isinstance(payload, str) or payload[:1] == b"{":
+        return json.loads(payload)
+    version, flags, count, sequence, timestamp = FRAME_HEADER.unpack_from(payload)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    records = np.frombuffer(payload, dtype=FRAME_RECORD, count=count, offset=FRAME_HEADER.size)
+    return {
+        "seq": sequence,
+        "timestamp": timestamp,
+        "keyframe": bool(flags & FRAME_FLAG_KEYFRAME),
+        "robots": [
+            {"robot_id": int(r["robot_id"]), "x": float(r["x"]), "y": float(r["y"]), "orientation": float(r["orientation"])}
+            for r in records
+        ],
+    }
+
+
+class PosePublisher:
+    """Publishes robot poses to MQTT.
+
+    Modes:
+        legacy: one JSON message per robot on robots/<id>/position (default),
+                carrying the capture timestamp next to the pose (and the
+                prediction_time of predicted poses)
+        frame:  one message per frame with every robot on robots/poses
+        both:   legacy and frame messages
+
+    Frame messages are either keyframes, flagged as such and holding every
+    robot, or deltas holding only the robots that moved more than
+    position_threshold (m) or turned more than orientation_threshold (rad)
+    since they were last sent. A keyframe goes out every keyframe_interval
+    seconds so late subscribers and TTL-based consumers stay in sync; a
+    consumer replaces its state on a keyframe and applies deltas on top. A
+    delta without any changed robot is not sent at all.
+    """
+
+    def __init__(self, client, mode="legacy", encoding="binary", qos=0, max_rate=0.0,
+                 position_threshold=0.0, orientation_threshold=0.0, keyframe_interval=1.0):
+        if mode not in ("legacy", "frame", "both"):
+            raise ValueError(f"Unknown publish mode {mode}")
+        if encoding not in ("binary", "json"):
+            raise ValueError(f"Unknown frame encoding {encoding}")
+        self.client = client
+        self.mode = mode
+        self.encode = encode_frame_binary if encoding == "binary" else encode_frame_json
+        self.qos = qos
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.position_threshold = position_threshold
+        self.orientation_threshold = orientation_threshold
+        self.keyframe_interval = keyframe_interval
+        self.sequence = 0
+        self.published_messages = 0
+        self._last_publish = 0.0
+        self._last_keyframe = 0.0
+        # Last sent pose per robot id, NaN when never sent
+        self._sent = np.full((0, 3), np.nan)
+
+    def publish(self, ids, x, y, orientation, timestamp=None, prediction_time=None):
+        """
+        Publish the poses of one frame.
+
+        Args:
+            ids: Robot ids, shape (n,)
+            x, y: Positions in meters, shape (n,)
+            orientation: Orientations in radians, shape (n,)
+            timestamp: Capture timestamp of the frame (defaults to now), or one per robot, shape (n,),
+                for poses held from earlier frames. Frame messages carry one timestamp, the newest.
+            prediction_time: Time predicted poses were extrapolated to, sent as a separate field
+                (legacy and JSON frames; binary frames do not carry it)
+
+        Returns:
+            True if anything was published, False if the rate cap skipped this frame or nothing changed
+        """
+        now = time.time()
+        if self.min_interval and now - self._last_publish < self.min_interval:
+            return False
+        self._last_publish = now
+        ids = np.asarray(ids, dtype=np.int64)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        orientation = np.asarray(orientation, dtype=np.float64)
+        timestamp = now if timestamp is None else timestamp
+        timestamps = np.broadcast_to(np.asarray(timestamp, dtype=np.float64), ids.shape)
+        if np.ndim(timestamp):
+            # Per-robot timestamps, a frame message carries the newest
+            timestamp = float(timestamps.max()) if len(ids) else now
+
+        published = False
+        if self.mode in ("legacy", "both"):
+            for i, px, py, o, t in zip(ids, x, y, orientation, timestamps, strict=True):
+                message = {
+                    "x": float(px),
+                    "y": float(py),
+                    "orientation": float(o),
+                    "robot_id": int(i),
+                    "timestamp": float(t),
+                }
+                if prediction_time is not None:
+                    message["prediction_time"] = prediction_time
+                self.client.publish(POSITION_TOPIC.format(int(i)), json.dumps(message), qos=self.qos)
+            self.published_messages += len(ids)
+            published = bool(len(ids))
+
+        if self.mode in ("frame", "both"):
+            keyframe, changed = self._changed(ids, x, y, orientation, now)
+            if keyframe or changed.any():
+                self._sent[ids[changed]] = np.column_stack((x[changed], y[changed], orientation[changed]))
+                self.client.publish(
+                    FRAME_TOPIC,
+                    self.encode(
+                        self.sequence, timestamp, ids[changed], x[changed], y[changed], orientation[changed],
+                        keyframe=keyframe, prediction_time=prediction_time,
+                    ),
+                    qos=self.qos,
+                )
+                self.sequence += 1
+                self.published_messages += 1
+                published = True
+        return published
+
+    def _changed(self, ids, x, y, orientation, now):
+        """
+        Decide between a keyframe and a delta.
+
+        Returns:
+            (keyframe, mask of the robots to send): every robot on a keyframe,
+            otherwise those that moved past the thresholds
+        """
+        if len(ids) and ids.max() >= len(self._sent):
+            grow = int(ids.max()) + 1 - len(self._sent)
+            self._sent = np.vstack((self._sent, np.full((grow, 3), np.nan)))
+        if now - self._last_keyframe >= self.keyframe_interval:
+            self._last_keyframe = now
+            return True, np.ones(len(ids), dtype=bool)
+        last = self._sent[ids]
+        moved = np.hypot(x - last[:, 0], y - last[:, 1]) > self.position_threshold
+        turn = np.abs((orientation - last[:, 2] + np.pi) % (2 * np.pi) - np.pi)
+        # Never sent robots have NaN state and are always considered changed
+        return False, moved | (turn > self.orientation_threshold) | np.isnan(last[:, 0])
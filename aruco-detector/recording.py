@@ -0,0 +1,136 @@
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FRAMES_FILE = "frames.raw"
+TIMESTAMPS_FILE = "timestamps.npy"
+META_FILE = "meta.json"
+
+
+class FrameRecorder:
+    """Writes raw frames to a directory that FrameRecording can memory map.
+
+    Layout:
+        frames.raw      frames back to back, C order, no header
+        timestamps.npy  capture timestamp of every frame (float64, unix seconds)
+        meta.json       frame shape, dtype and count
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._file = (self.path / FRAMES_FILE).open("wb")
+        self._timestamps = []
+        self.shape = None
+        self.dtype = None
+
+    def write(self, frame, timestamp=None):
+        if self.shape is None:
+            self.shape = frame.shape
+            self.dtype = frame.dtype
+        elif frame.shape != self.shape or frame.dtype != self.dtype:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} does not match recording {self.shape} {self.dtype}")
+        self._file.write(np.ascontiguousarray(frame).data)
+        self._timestamps.append(time.time() if timestamp is None else timestamp)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        np.save(self.path / TIMESTAMPS_FILE, np.array(self._timestamps, dtype=np.float64))
+        meta = {
+            "shape": list(self.shape) if self.shape is not None else [],
+            "dtype": np.dtype(self.dtype).str if self.dtype is not None else "|u1",
+            "count": len(self._timestamps),
+        }
+        with (self.path / META_FILE).open("w") as f:
+            json.dump(meta, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameRecording:
+    """Read-only, memory-mapped view of a directory written by FrameRecorder."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with (self.path / META_FILE).open() as f:
+            meta = json.load(f)
+        self.timestamps = np.load(self.path / TIMESTAMPS_FILE)
+        count = meta["count"]
+        if count == 0:
+            self.frames = np.empty((0, *meta["shape"]), dtype=meta["dtype"])
+        else:
+            self.frames = np.memmap(
+                self.path / FRAMES_FILE, dtype=meta["dtype"], mode="r", shape=(count, *meta["shape"])
+            )
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+
+class ReplaySource:
+    """Drop-in replacement for cv2.VideoCapture that plays back a FrameRecording.
+
+    With realtime=True frames are released following the original capture timing,
+    otherwise as fast as they are read.
+    """
+
+    def __init__(self, recording, realtime=False, loop=False):
+        self.recording = recording if isinstance(recording, FrameRecording) else FrameRecording(recording)
+        self.realtime = realtime
+        self.loop = loop
+        self.position = 0
+        self._start = None
+
+    def read(self, image=None):
+        """Next frame, copied into image when it has the right shape (like cv2.VideoCapture.read)."""
+        if self.position >= len(self.recording):
+            if not self.loop or len(self.recording) == 0:
+                return False, None
+            self.position = 0
+            self._start = None
+        if self.realtime:
+            offset = self.recording.timestamps[self.position] - self.recording.timestamps[0]
+            if self._start is None or self.position == 0:
+                self._start = time.monotonic()
+            delay = self._start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        # Copy out of the memory map so consumers may draw on the frame
+        source = self.recording[self.position]
+        if image is not None and image.shape == source.shape and image.dtype == source.dtype:
+            np.copyto(image, source)
+            frame = image
+        else:
+            frame = np.array(source)
+        self.position += 1
+        return True, frame
+
+    def isOpened(self):  # noqa: N802 - mirrors cv2.VideoCapture
+        return len(self.recording) > 0
+
+    def get(self, prop):
+        shape = self.recording.frames.shape
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(shape[2]) if len(shape) > 2 else 0.0
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(shape[1]) if len(shape) > 1 else 0.0
+        if prop == cv2.CAP_PROP_FPS:
+            timestamps = self.recording.timestamps
+            duration = timestamps[-1] - timestamps[0] if len(timestamps) > 1 else 0.0
+            return (len(timestamps) - 1) / duration if duration > 0 else 0.0
+        return 0.0
+
+    def release(self):
+        pass
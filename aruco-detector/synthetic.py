@@ -0,0 +1,107 @@
+import cv2
+import numpy as np
+from recording import FrameRecorder
+
+
+class SyntheticArena:
+    """Renders frames of ArUco markers moving on a plain floor, with ground truth.
+
+    Markers follow a random walk with rotation, are drawn with a white quiet
+    zone through a perspective warp and get optional sensor noise. Useful to
+    benchmark and tune the detector without a camera.
+    """
+
+    def __init__(self, width=1920, height=1080, markers=12, marker_pixels=80, dictionary=cv2.aruco.DICT_4X4_50,
+                 noise=2.0, speed=3.0, seed=0):
+        self.width = width
+        self.height = height
+        self.marker_pixels = marker_pixels
+        self.noise = noise
+        self.speed = speed
+        self.rng = np.random.default_rng(seed)
+        aruco_dict = cv2.aruco.getPredefinedDictionary(dictionary)
+        self.ids = np.arange(markers, dtype=np.int32)
+        border = marker_pixels // 4
+        self._border = border
+        self._tiles = [
+            cv2.copyMakeBorder(
+                cv2.aruco.generateImageMarker(aruco_dict, int(marker_id), marker_pixels),
+                border, border, border, border, cv2.BORDER_CONSTANT, value=255,
+            )
+            for marker_id in self.ids
+        ]
+        # Spread markers on a grid so they start without overlapping
+        cols = int(np.ceil(np.sqrt(markers * width / height)))
+        rows = int(np.ceil(markers / cols))
+        cell_w, cell_h = width / cols, height / rows
+        self.centers = np.array(
+            [((i % cols + 0.5) * cell_w, (i // cols + 0.5) * cell_h) for i in range(markers)], dtype=np.float64
+        )
+        self._home = self.centers.copy()
+        self._reach = max(0.0, 0.5 * min(cell_w, cell_h) - marker_pixels)
+        self.angles = self.rng.uniform(0, 2 * np.pi, markers)
+
+    def _corners(self, center, angle, half):
+        """Corners around center in ArUco order (top-left, top-right, bottom-right, bottom-left)."""
+        square = np.array([[-half, -half], [half, -half], [half, half], [-half, half]], dtype=np.float64)
+        rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        return square @ rotation.T + center
+
+    def step(self):
+        """Advance the random walk, keeping every marker inside its own grid cell."""
+        self.centers += self.rng.normal(0, self.speed, self.centers.shape)
+        offset = np.clip(self.centers - self._home, -self._reach, self._reach)
+        self.centers = self._home + offset
+        self.angles += self.rng.normal(0, 0.03, len(self.angles))
+
+    def render(self):
+        """
+        Render the current state.
+
+        Returns:
+            frame: BGR image
+            ids: Marker ids, shape (n,)
+            corners: Ground truth corners, shape (n, 4, 2)
+        """
+        frame = np.full((self.height, self.width), 170, dtype=np.uint8)
+        corners = np.empty((len(self.ids), 4, 2), dtype=np.float64)
+        half = self.marker_pixels / 2
+        tile_size = self.marker_pixels + 2 * self._border
+        # Pixel centers sit on integer coordinates, so the tile's outer edge is at -0.5
+        edge = tile_size - 0.5
+        src = np.array([[-0.5, -0.5], [edge, -0.5], [edge, edge], [-0.5, edge]], dtype=np.float32)
+        for i, tile in enumerate(self._tiles):
+            corners[i] = self._corners(self.centers[i], self.angles[i], half)
+            outer = self._corners(self.centers[i], self.angles[i], half + self._border)
+            x0, y0 = np.floor(outer.min(axis=0)).astype(int)
+            x1, y1 = np.ceil(outer.max(axis=0)).astype(int)
+            x0, y0 = max(x0, 0), max(y0, 0)
+            x1, y1 = min(x1, self.width), min(y1, self.height)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            dst = (outer - (x0, y0)).astype(np.float32)
+            transform = cv2.getPerspectiveTransform(src, dst)
+            size = (x1 - x0, y1 - y0)
+            warped = cv2.warpPerspective(tile, transform, size, flags=cv2.INTER_LINEAR)
+            mask = cv2.warpPerspective(np.full_like(tile, 255), transform, size, flags=cv2.INTER_LINEAR)
+            region = frame[y0:y1, x0:x1]
+            region[mask > 127] = warped[mask > 127]
+        if self.noise > 0:
+            noise = self.rng.normal(0, self.noise, frame.shape)
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR), self.ids.copy(), corners
+
+    def frames(self, count):
+        """Yield count (frame, ids, corners) tuples, advancing the walk between frames."""
+        for _ in range(count):
+            yield self.render()
+            self.step()
+
+
+def record_synthetic(path, count, **arena_options):
+    """Render count synthetic frames into a FrameRecorder directory and return the arena used."""
+    arena = SyntheticArena(**arena_options)
+    with FrameRecorder(path) as recorder:
+        for index, (frame, _, _) in enumerate(arena.frames(count)):
+            recorder.write(frame, index / 60.0)
+    return arena
@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+import pytest
+from camera_calibration import CameraCalibration
+
+CAMERA_MATRIX = np.array([[1400.0, 0.0, 955.0], [0.0, 1390.0, 545.0], [0.0, 0.0, 1.0]])
+DIST_COEFFS = np.array([0.08, -0.12, 0.001, -0.0005, 0.02])
+
+
+def scene_points(count=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack((rng.uniform(-0.6, 0.6, count), rng.uniform(-0.35, 0.35, count), rng.uniform(1.0, 2.0, count)))
+
+
+def project(calibration, points):
+    image_points, _ = cv2.projectPoints(points, np.zeros(3), np.zeros(3), calibration.camera_matrix, calibration.dist_coeffs)
+    return image_points.reshape(-1, 2)
+
+
+@pytest.mark.parametrize("size", [(640, 360), (1280, 720), (3840, 2160)])
+def test_for_resolution_scales_intrinsics(size):
+    calibration = CameraCalibration(CAMERA_MATRIX, DIST_COEFFS, (1920, 1080))
+    points = scene_points()
+
+    scaled = calibration.for_resolution(*size)
+
+    assert scaled.image_size == size
+    np.testing.assert_array_equal(scaled.dist_coeffs, DIST_COEFFS)
+    # The same scene point lands on the same spot of the resized image (pixel centers at integers)
+    scale = np.array(size) / (1920, 1080)
+    np.testing.assert_allclose(project(scaled, points), (project(calibration, points) + 0.5) * scale - 0.5, atol=1e-9)
+
+
+def test_for_resolution_is_cached():
+    calibration = CameraCalibration(CAMERA_MATRIX, DIST_COEFFS, (1920, 1080))
+
+    assert calibration.for_resolution(1920, 1080) is calibration
+    assert calibration.for_resolution(640, 360) is calibration.for_resolution(640.0, 360.0)
+    assert calibration.for_resolution(640, 360) is not calibration.for_resolution(1280, 720)
+    # Without a known calibration size the intrinsics are used as they are
+    unknown = CameraCalibration(CAMERA_MATRIX, DIST_COEFFS)
+    assert unknown.for_resolution(640, 360) is unknown
+
+
+def test_load_keeps_the_calibration_size(tmp_path):
+    path = tmp_path / "camera_calibration.npz"
+    np.savez(path, camera_matrix=CAMERA_MATRIX, dist_coeffs=DIST_COEFFS, image_size=np.array([1920, 1080]), rms_error=0.2)
+
+    calibration = CameraCalibration.load(path)
+
+    assert calibration.image_size == (1920, 1080)
+    np.testing.assert_array_equal(calibration.camera_matrix, CAMERA_MATRIX)
+    assert CameraCalibration.load(tmp_path / "missing.npz").image_size is None
+
+
+def test_undistort_corners_matches_per_marker_undistort_points():
+    calibration = CameraCalibration(CAMERA_MATRIX, DIST_COEFFS, (1920, 1080))
+    corners = tuple(project(calibration, scene_points(40)).reshape(-1, 1, 4, 2).astype(np.float32))
+
+    undistorted = calibration.undistort_corners(corners)
+
+    assert undistorted.shape == (10, 4, 2)
+    for marker_corners, batched in zip(corners, undistorted, strict=True):
+        expected = cv2.undistortPoints(marker_corners.reshape(4, 1, 2), CAMERA_MATRIX, DIST_COEFFS, P=CAMERA_MATRIX)
+        np.testing.assert_allclose(batched, expected.reshape(4, 2), atol=1e-9)
+
+
+def test_undistort_corners_without_distortion_or_markers():
+    calibration = CameraCalibration(CAMERA_MATRIX, np.zeros(5))
+    corners = (np.arange(8, dtype=np.float32).reshape(1, 4, 2),)
+
+    np.testing.assert_array_equal(calibration.undistort_corners(corners), corners[0].reshape(1, 4, 2))
+    assert CameraCalibration(CAMERA_MATRIX, DIST_COEFFS).undistort_corners(()).shape == (0, 4, 2)
+
+
+def test_undistort_maps_are_built_once():
+    calibration = CameraCalibration(CAMERA_MATRIX, DIST_COEFFS, (1920, 1080))
+
+    first = calibration.undistort_maps()
+
+    assert all(a is b for a, b in zip(calibration.undistort_maps(), first, strict=True))
+    assert calibration.undistort_frame(np.zeros((1080, 1920), dtype=np.uint8)).shape == (1080, 1920)
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from estimator import ArUcoRobotPoseEstimator
+from synthetic import SyntheticArena
+
+CAMERA_MATRIX = np.array([[800.0, 0.0, 320.0], [0.0, 800.0, 240.0], [0.0, 0.0, 1.0]])
+
+
+def arena_frames(count, seed=1, **options):
+    options = {"markers": 6, "marker_pixels": 60, **options}
+    return list(SyntheticArena(640, 480, seed=seed, **options).frames(count))
+
+
+def sorted_detections(corners, ids):
+    """Ids and (n, 4, 2) corners ordered by id."""
+    ids = np.asarray(ids).ravel()
+    order = np.argsort(ids)
+    return ids[order], np.asarray(corners, dtype=np.float64).reshape(-1, 4, 2)[order]
+
+
+def count_full_frame_passes(monkeypatch, pose_estimator):
+    """Count the full-frame detection passes of pose_estimator, in a list holding the running total."""
+    passes = [0]
+    detect_full_frame = pose_estimator._detect_full_frame
+
+    def spy(gray):
+        passes[0] += 1
+        return detect_full_frame(gray)
+
+    monkeypatch.setattr(pose_estimator, "_detect_full_frame", spy)
+    return passes
+
+
+def full_frame_indexes(monkeypatch, pose_estimator, frames):
+    """Detect markers in every frame and return the indexes of the frames that needed a full-frame pass."""
+    passes = count_full_frame_passes(monkeypatch, pose_estimator)
+    indexes = []
+    for index, frame in enumerate(frames):
+        before = passes[0]
+        pose_estimator.detect_markers(frame)
+        if passes[0] > before:
+            indexes.append(index)
+    return indexes
+
+
+def hide_marker(frame, corners, margin=15):
+    """Paint the floor color over one marker."""
+    x0, y0 = np.floor(corners.min(axis=0)).astype(int) - margin
+    x1, y1 = np.ceil(corners.max(axis=0)).astype(int) + margin
+    frame = frame.copy()
+    frame[max(y0, 0):y1, max(x0, 0):x1] = 170
+    return frame
+
+
+def test_roi_tracking_matches_full_frame_detection(monkeypatch):
+    full_frame = ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5))
+    tracking = ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5), tracking=True, full_scan_interval=100)
+    passes = count_full_frame_passes(monkeypatch, tracking)
+
+    for frame, ids, _ in arena_frames(12):
+        expected_ids, expected_corners = sorted_detections(*full_frame.detect_markers(frame)[:2])
+        tracked_ids, tracked_corners = sorted_detections(*tracking.detect_markers(frame)[:2])
+
+        np.testing.assert_array_equal(expected_ids, ids)
+        np.testing.assert_array_equal(tracked_ids, expected_ids)
+        np.testing.assert_allclose(tracked_corners, expected_corners, atol=1e-3)
+    # Only the first frame needed the whole image
+    assert passes == [1]
+
+
+def test_tracked_rois_merge_overlapping_markers():
+    pose_estimator = ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5), tracking=True, roi_padding=0.5)
+    square = np.array([[0.0, 0.0], [20.0, 0.0], [20.0, 20.0], [0.0, 20.0]], dtype=np.float32)
+    pose_estimator._tracked_corners = {
+        1: (square + (100, 100)).reshape(1, 4, 2),
+        2: (square + (125, 100)).reshape(1, 4, 2),
+        3: (square + (615, 455)).reshape(1, 4, 2),
+    }
+
+    rois = sorted(pose_estimator._tracked_rois((480, 640)))
+
+    # 20 px markers get 20 * 0.5 + 4 px of padding, clipped to the frame
+    assert rois == [[86, 86, 159, 134], [601, 441, 640, 480]]
+
+
+def test_lost_marker_triggers_full_frame_pass(monkeypatch):
+    # Marker 3 disappears from the third frame on
+    frames = [
+        hide_marker(frame, corners[3]) if index >= 2 else frame
+        for index, (frame, _, corners) in enumerate(arena_frames(4))
+    ]
+    pose_estimator = ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5), tracking=True, full_scan_interval=100)
+
+    # Tracking carries on with the markers still visible after the rescan
+    assert full_frame_indexes(monkeypatch, pose_estimator, frames) == [0, 2]
+    assert sorted(pose_estimator._tracked_corners) == [0, 1, 2, 4, 5]
+
+
+@pytest.mark.parametrize("full_scan_interval", [0, 1, 3])
+def test_full_frame_rescan_interval(monkeypatch, full_scan_interval):
+    pose_estimator = ArUcoRobotPoseEstimator(
+        CAMERA_MATRIX, np.zeros(5), tracking=True, full_scan_interval=full_scan_interval
+    )
+    frames = [frame for frame, _, _ in arena_frames(9)]
+
+    # full_scan_interval ROI frames between rescans
+    assert full_frame_indexes(monkeypatch, pose_estimator, frames) == list(range(0, 9, full_scan_interval + 1))
+
+
+def corner_errors(pose_estimator, frames):
+    """Recall and the mean pixel distance of every detected corner to the ground truth, per marker."""
+    errors = []
+    expected = 0
+    for frame, ids, truth in frames:
+        expected += len(ids)
+        corners, found_ids, _ = pose_estimator.detect_markers(frame)
+        if found_ids is None:
+            continue
+        for marker_corners, marker_id in zip(corners, found_ids.ravel(), strict=True):
+            errors.append(np.linalg.norm(marker_corners.reshape(4, 2) - truth[marker_id], axis=1).mean())
+    return len(errors) / expected, np.array(errors)
+
+
+@pytest.mark.parametrize("detection_scale", [0.75, 0.5, 0.35])
+def test_coarse_to_fine_detection_is_as_accurate_as_full_resolution(detection_scale):
+    frames = list(SyntheticArena(1280, 720, markers=12, marker_pixels=80, seed=2).frames(6))
+    full_recall, full_errors = corner_errors(ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5)), frames)
+
+    recall, errors = corner_errors(
+        ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5), detection_scale=detection_scale), frames
+    )
+
+    assert full_recall == recall == 1.0
+    # Full-resolution corners are not refined (about 0.6 px off), cornerSubPix brings
+    # the upscaled coarse corners closer to the truth than that
+    assert errors.mean() <= full_errors.mean()
+    assert errors.mean() < 0.35
+    assert errors.max() < 0.5
+
+
+def test_coarse_to_fine_detection_without_markers():
+    pose_estimator = ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5), detection_scale=0.5)
+
+    corners, ids, _ = pose_estimator.detect_markers(np.full((480, 640, 3), 170, dtype=np.uint8))
+
+    assert ids is None
+    assert len(corners) == 0
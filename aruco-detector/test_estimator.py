@@ -0,0 +1,151 @@
+import math
+
+import cv2
+import numpy as np
+import pytest
+from estimator import ArUcoRobotPoseEstimator, OneEuroFilter, OneEuroFilterBank
+
+CAMERA_MATRIX = np.array([[800.0, 0.0, 320.0], [0.0, 800.0, 240.0], [0.0, 0.0, 1.0]])
+DIST_COEFFS = np.array([0.08, -0.12, 0.001, -0.0005, 0.0])
+
+
+def project_markers(pose_estimator, poses):
+    """Image corners of markers at the given (rotation_vector, translation_vector) poses, in ArUco layout."""
+    corners = []
+    for rotation_vector, transition_vector in poses:
+        image_points, _ = cv2.projectPoints(
+            pose_estimator.marker_points, rotation_vector, transition_vector, CAMERA_MATRIX, DIST_COEFFS
+        )
+        corners.append(image_points.reshape(1, 4, 2).astype(np.float32))
+    return corners
+
+
+def random_poses(count, seed=0):
+    """Markers lying on a floor below the camera, at random positions and yaw, slightly tilted."""
+    rng = np.random.default_rng(seed)
+    poses = []
+    for _ in range(count):
+        yaw = rng.uniform(-math.pi, math.pi)
+        tilt = rng.normal(0.0, 0.05, size=2)
+        rotation = cv2.Rodrigues(np.array([tilt[0], tilt[1], yaw]))[0] @ cv2.Rodrigues(np.array([math.pi, 0, 0]))[0]
+        rotation_vector = cv2.Rodrigues(rotation)[0]
+        transition_vector = np.array([[rng.uniform(-0.3, 0.3)], [rng.uniform(-0.2, 0.2)], [rng.uniform(0.8, 1.5)]])
+        poses.append((rotation_vector, transition_vector))
+    return poses
+
+
+def per_marker_poses(pose_estimator, corners):
+    """The original estimate_pose loop: one iterative solvePnP per marker on the distorted corners."""
+    poses = []
+    for marker_corners in corners:
+        success, rotation_vector, transition_vector = cv2.solvePnP(
+            pose_estimator.marker_points, marker_corners[0], CAMERA_MATRIX, DIST_COEFFS
+        )
+        assert success
+        poses.append((rotation_vector, transition_vector))
+    return poses
+
+
+def yaw_difference(a, b):
+    return np.abs((np.asarray(a) - np.asarray(b) + 180.0) % 360.0 - 180.0)
+
+
+def test_estimate_poses_matches_per_marker_solve_pnp():
+    pose_estimator = ArUcoRobotPoseEstimator(CAMERA_MATRIX, DIST_COEFFS)
+    poses = random_poses(20)
+    corners = project_markers(pose_estimator, poses)
+
+    valid, rotation_vectors, transition_vectors = pose_estimator.estimate_poses(corners)
+    reference = per_marker_poses(pose_estimator, corners)
+
+    assert valid.all()
+    reference_transition_vectors = np.array([transition_vector.ravel() for _, transition_vector in reference])
+    np.testing.assert_allclose(transition_vectors, reference_transition_vectors, atol=1e-4)
+    for rotation_vector, (reference_rotation_vector, _) in zip(rotation_vectors, reference, strict=True):
+        np.testing.assert_allclose(
+            cv2.Rodrigues(rotation_vector)[0], cv2.Rodrigues(reference_rotation_vector)[0], atol=1e-3
+        )
+    reference_yaws = [pose_estimator.rotation_vector_to_yaw(rotation_vector) for rotation_vector, _ in reference]
+    assert yaw_difference(pose_estimator.rotation_vectors_to_yaw(rotation_vectors), reference_yaws).max() < 0.05
+
+
+def test_estimate_poses_face_on_marker_is_valid():
+    # A marker seen exactly face-on is the degenerate case of IPPE_SQUARE (NaN rotations on some inputs)
+    pose_estimator = ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5))
+    corners = project_markers(pose_estimator, [(np.zeros((3, 1)), np.array([[0.0], [0.0], [1.0]]))])
+
+    valid, rotation_vectors, transition_vectors = pose_estimator.estimate_poses(corners)
+
+    assert valid.all()
+    assert np.isfinite(rotation_vectors).all()
+    np.testing.assert_allclose(transition_vectors[0], [0.0, 0.0, 1.0], atol=1e-3)
+
+
+def test_estimate_poses_without_markers():
+    pose_estimator = ArUcoRobotPoseEstimator(CAMERA_MATRIX, DIST_COEFFS)
+
+    valid, rotation_vectors, transition_vectors = pose_estimator.estimate_poses([])
+
+    assert valid.shape == (0,)
+    assert rotation_vectors.shape == (0, 3)
+    assert transition_vectors.shape == (0, 3)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_rotation_vectors_to_yaw_matches_rodrigues(seed):
+    rng = np.random.default_rng(seed)
+    axes = rng.normal(size=(200, 3))
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+    angles = rng.uniform(0.0, math.pi, size=200)
+    rotation_vectors = np.vstack((axes * angles[:, None], np.zeros((1, 3)), [[0.0, 0.0, math.pi]], [[math.pi, 0, 0]]))
+
+    yaws = ArUcoRobotPoseEstimator.rotation_vectors_to_yaw(rotation_vectors)
+
+    reference = []
+    for rotation_vector in rotation_vectors:
+        R, _ = cv2.Rodrigues(rotation_vector)
+        reference.append(math.degrees(math.atan2(R[1, 0], R[0, 0])))
+    assert yaw_difference(yaws, reference).max() < 1e-6
+
+
+def filter_bank_samples(rows, frames, seed=0):
+    """Frames of (timestamp, rows, samples) where a random subset of rows is seen, yaw (degrees) wrapped."""
+    rng = np.random.default_rng(seed)
+    state = rng.uniform(-1.0, 1.0, size=(rows, 3))
+    t = 100.0
+    result = []
+    for frame in range(frames):
+        # Irregular frame times, including a repeated timestamp
+        t += 0.0 if frame == frames // 2 else rng.uniform(0.005, 0.1)
+        seen = np.flatnonzero(rng.random(rows) < 0.6)
+        state[:, :2] += rng.normal(0.0, 0.05, size=(rows, 2))
+        state[:, 2] += rng.normal(0.0, 60.0, size=rows)
+        samples = state[seen].copy()
+        samples[:, 2] = (samples[:, 2] + 180.0) % 360.0 - 180.0
+        result.append((t, seen, samples))
+    return result
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_one_euro_filter_bank_matches_independent_filters(seed):
+    params = {"min_cutoff": (1.0, 0.5, 2.0), "beta": (0.0, 0.7, 0.05), "d_cutoff": (1.0, 1.5, 0.8)}
+    bank = OneEuroFilterBank(3, angular_channels=(2,), capacity=2, **params)
+    frames = filter_bank_samples(6, 60, seed)
+
+    outputs = {}
+    for t, rows, samples in frames:
+        for row, out in zip(rows, bank(rows, samples, t), strict=True):
+            outputs.setdefault(int(row), []).append(out)
+
+    for row, filtered in outputs.items():
+        history = [(t, samples[rows == row][0]) for t, rows, samples in frames if row in rows]
+        timestamps = [t for t, _ in history]
+        raw = np.array([sample for _, sample in history])
+        # The scalar filter sees the yaw unwrapped over the row's own history
+        raw[:, 2] = np.unwrap(raw[:, 2], period=360.0)
+        for channel in range(3):
+            scalar = OneEuroFilter(*(params[name][channel] for name in ("min_cutoff", "beta", "d_cutoff")))
+            expected = np.array([scalar(x, t) for x, t in zip(raw[:, channel], timestamps, strict=True)])
+            if channel == 2:
+                expected = (expected + 180.0) % 360.0 - 180.0
+            np.testing.assert_allclose(np.array(filtered)[:, channel], expected, atol=1e-9)
@@ -0,0 +1,119 @@
+from governor import LatencyGovernor
+
+BUDGET = 0.010
+
+
+class FakeEstimator:
+    def __init__(self, detection_scale=1.0, full_scan_interval=30, tracking=True):
+        self.detection_scale = detection_scale
+        self.full_scan_interval = full_scan_interval
+        self.tracking = tracking
+
+    def set_detection_scale(self, detection_scale):
+        self.detection_scale = detection_scale
+
+
+def make_governor(estimator, **kwargs):
+    """Governor whose average is the latest sample, so levels change after exactly patience frames."""
+    return LatencyGovernor(estimator, BUDGET, smoothing=1.0, **kwargs)
+
+
+def observe(governor, seconds, frames):
+    """Feed frames of equal processing time, returning the decisions."""
+    return [governor.observe(seconds) for _ in range(frames)]
+
+
+def test_levels_with_tracking():
+    assert LatencyGovernor(FakeEstimator(), BUDGET).levels == [
+        (1.0, 30, 1), (0.75, 30, 1), (0.5, 30, 1), (0.5, 60, 1), (0.5, 120, 1), (0.5, 120, 2), (0.5, 120, 3),
+    ]
+
+
+def test_levels_without_tracking_start_at_configured_scale():
+    governor = LatencyGovernor(FakeEstimator(detection_scale=0.6, tracking=False), BUDGET, min_detection_scale=0.35)
+
+    assert governor.levels == [(0.6, 30, 1), (0.5, 30, 1), (0.35, 30, 1), (0.35, 30, 2), (0.35, 30, 3)]
+
+
+def test_lowers_after_patience_frames_over_budget():
+    estimator = FakeEstimator()
+    governor = make_governor(estimator, patience=3)
+
+    assert observe(governor, 2 * BUDGET, 3) == [0, 0, -1]
+    assert governor.level == 1
+    assert estimator.detection_scale == 0.75
+
+    observe(governor, 2 * BUDGET, 3 * 3)
+    assert governor.level == 4
+    assert (estimator.detection_scale, estimator.full_scan_interval) == (0.5, 120)
+
+    # The last level is as low as it goes
+    observe(governor, 2 * BUDGET, 3 * 10)
+    assert governor.level == len(governor.levels) - 1
+
+
+def test_raises_after_patience_frames_under_headroom():
+    estimator = FakeEstimator()
+    governor = make_governor(estimator, headroom=0.5, patience=3)
+    observe(governor, 2 * BUDGET, 6)
+    assert governor.level == 2
+
+    # Between headroom and budget nothing changes
+    assert observe(governor, 0.7 * BUDGET, 20) == [0] * 20
+    assert observe(governor, 0.2 * BUDGET, 3) == [0, 0, 1]
+    assert governor.level == 1
+    assert estimator.detection_scale == 0.75
+
+
+def test_raising_too_early_doubles_the_patience():
+    governor = make_governor(FakeEstimator(), patience=2)
+    observe(governor, 2 * BUDGET, 2)
+    observe(governor, 0.1 * BUDGET, 2)
+    assert governor.level == 0
+
+    # Over budget again right after the raise
+    observe(governor, 2 * BUDGET, 2)
+    assert governor.level == 1
+    assert observe(governor, 0.1 * BUDGET, 4) == [0, 0, 0, 1]
+
+    observe(governor, 2 * BUDGET, 2)
+    assert observe(governor, 0.1 * BUDGET, 8)[-2:] == [0, 1]
+
+
+def test_backoff_is_forgotten_once_the_raised_level_holds():
+    governor = make_governor(FakeEstimator(), patience=2)
+    observe(governor, 2 * BUDGET, 2)
+    observe(governor, 0.1 * BUDGET, 2)
+    observe(governor, 2 * BUDGET, 2)
+    observe(governor, 0.1 * BUDGET, 4)
+    assert governor.level == 0
+
+    # Holding level 0 for longer than 4 * the raised patience resets it
+    observe(governor, 0.7 * BUDGET, 4 * 4 + 1)
+    observe(governor, 2 * BUDGET, 2)
+    assert observe(governor, 0.1 * BUDGET, 2) == [0, 1]
+
+
+def test_frame_stride_levels_skip_frames():
+    estimator = FakeEstimator(tracking=False)
+    governor = make_governor(estimator, headroom=0.0, patience=1)
+    assert all(governor.should_process() for _ in range(5))
+
+    observe(governor, 2 * BUDGET, governor.levels.index((0.5, 30, 2)))
+    assert governor.frame_stride == 2
+    # Skipped frames count as free, headroom 0 keeps them from raising quality again
+    processed = [governor.should_process() for _ in range(6)]
+
+    assert processed.count(True) == 3
+    assert governor.skipped_frames == 3
+
+
+def test_smoothed_average_ignores_single_slow_frames():
+    governor = LatencyGovernor(FakeEstimator(), BUDGET, patience=2, smoothing=0.2)
+    observe(governor, 0.5 * BUDGET, 10)
+
+    for _ in range(5):
+        governor.observe(3 * BUDGET)
+        observe(governor, 0.5 * BUDGET, 5)
+
+    assert governor.level == 0
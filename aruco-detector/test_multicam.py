@@ -0,0 +1,101 @@
+import math
+
+import numpy as np
+from multicam import RESULT_DTYPE, CameraPool, CameraSpec, fuse, to_world
+
+
+def make_result(ids, positions, yaws, sequence=2, timestamp=1.0):
+    result = np.zeros((), dtype=RESULT_DTYPE)
+    result["sequence"] = sequence
+    result["timestamp"] = timestamp
+    result["count"] = len(ids)
+    result["ids"][: len(ids)] = ids
+    result["position"][: len(ids)] = positions
+    result["yaw"][: len(ids)] = yaws
+    return result
+
+
+def test_default_spec_reproduces_legacy_poses():
+    # The single-camera path publishes x = -tvec.x, y = -tvec.y and the marker yaw unchanged
+    positions = np.array([[0.12, -0.3, 1.1], [-0.4, 0.25, 1.2]])
+    yaws = np.array([35.0, -170.0])
+    spec = CameraSpec("cam", 0)
+
+    ids, xy, yaw, distance = to_world(spec, make_result([3, 7], positions, yaws))
+
+    np.testing.assert_array_equal(ids, [3, 7])
+    np.testing.assert_allclose(xy, -positions[:, :2])
+    np.testing.assert_allclose(yaw, yaws)
+    np.testing.assert_allclose(distance, np.linalg.norm(positions, axis=1))
+
+
+def rotation_z(degrees):
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    return np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+
+
+def observe(spec, world_xy, world_yaw, height=1.2):
+    """The slot a camera at spec would write for markers at world_xy with heading world_yaw."""
+    world = np.column_stack((world_xy, np.full(len(world_xy), height)))
+    camera_positions = (world - spec.translation) @ spec.rotation
+    return make_result(range(len(world_xy)), camera_positions, np.asarray(world_yaw) - spec.heading_offset)
+
+
+def test_rotated_camera_fuses_with_legacy_camera():
+    world_xy = np.array([[0.3, 0.2], [-0.5, 0.4]])
+    world_yaw = np.array([10.0, 175.0])
+    legacy = CameraSpec("legacy", 0)
+    # Mounted turned by 90 degrees about the vertical axis and shifted, yaw_offset left at 0
+    rotated = CameraSpec("rotated", 1, rotation=rotation_z(90.0) @ np.diag([-1.0, -1.0, 1.0]), translation=[1.0, 0, 0])
+
+    assert rotated.heading_offset == 90.0
+    legacy_observation = to_world(legacy, observe(legacy, world_xy, world_yaw))
+    # The camera sees the marker heading turned back by its own mounting rotation
+    np.testing.assert_allclose(observe(rotated, world_xy, world_yaw)["yaw"][:2], world_yaw - 90.0)
+    rotated_observation = to_world(rotated, observe(rotated, world_xy, world_yaw))
+
+    for _, xy, yaw, _ in (legacy_observation, rotated_observation):
+        np.testing.assert_allclose(xy, world_xy, atol=1e-12)
+        np.testing.assert_allclose(yaw, world_yaw)
+    ids, xy, yaw = fuse([legacy_observation, rotated_observation])
+    np.testing.assert_allclose(xy, world_xy, atol=1e-12)
+    np.testing.assert_allclose(yaw, world_yaw)
+
+
+def test_yaw_offset_trims_the_rotation_heading():
+    spec = CameraSpec("cam", 0, rotation=rotation_z(-90.0) @ np.diag([-1.0, -1.0, 1.0]), yaw_offset=1.5)
+
+    _, _, yaw, _ = to_world(spec, make_result([4], [[0.0, 0.0, 1.0]], [0.0]))
+
+    np.testing.assert_allclose(yaw, [-88.5])
+
+
+def test_fuse_single_camera_is_identity():
+    positions = np.array([[0.12, -0.3, 1.1], [-0.4, 0.25, 1.2]])
+    observation = to_world(CameraSpec("cam", 0), make_result([7, 3], positions, [35.0, -170.0]))
+
+    ids, xy, yaw = fuse([observation])
+
+    np.testing.assert_array_equal(ids, [3, 7])
+    np.testing.assert_allclose(xy, -positions[::-1, :2])
+    np.testing.assert_allclose(yaw, [-170.0, 35.0])
+
+
+def test_read_returns_new_results_once():
+    pool = CameraPool([CameraSpec("cam", 0)])
+    slot = make_result([1], [[0.0, 0.0, 1.0]], [0.0], sequence=2)
+    pool._slots.append(slot)
+
+    snapshot = pool.read(0)
+
+    assert snapshot is not None
+    assert int(snapshot["count"]) == 1
+    assert pool.read(0) is None
+
+
+def test_read_gives_up_on_a_slot_left_mid_write():
+    pool = CameraPool([CameraSpec("cam", 0)])
+    # A worker that died while writing leaves the sequence odd
+    pool._slots.append(make_result([1], [[0.0, 0.0, 1.0]], [0.0], sequence=3))
+
+    assert pool.read(0) is None
@@ -0,0 +1,55 @@
+import math
+
+import cv2
+import numpy as np
+from estimator import ArUcoRobotPoseEstimator
+from planar import FloorHomography
+
+CAMERA_MATRIX = np.array([[800.0, 0.0, 320.0], [0.0, 800.0, 240.0], [0.0, 0.0, 1.0]])
+
+
+def floor_markers(pose_estimator, count, seed=0):
+    """Corners and poses of markers lying flat at depth 1.2 m, facing the camera."""
+    rng = np.random.default_rng(seed)
+    corners, rotation_vectors, transition_vectors = [], [], []
+    for _ in range(count):
+        yaw = rng.uniform(-math.pi, math.pi)
+        rotation_vector = np.array([math.pi * math.cos(yaw / 2), math.pi * math.sin(yaw / 2), 0.0])
+        transition_vector = np.array([rng.uniform(-0.3, 0.3), rng.uniform(-0.2, 0.2), 1.2])
+        image_points, _ = cv2.projectPoints(
+            pose_estimator.marker_points, rotation_vector, transition_vector, CAMERA_MATRIX, np.zeros(5)
+        )
+        corners.append(image_points.reshape(4, 2))
+        rotation_vectors.append(rotation_vector)
+        transition_vectors.append(transition_vector)
+    return np.array(corners), np.array(rotation_vectors), np.array(transition_vectors)
+
+
+def test_fit_then_estimate_poses_recovers_floor_poses():
+    pose_estimator = ArUcoRobotPoseEstimator(CAMERA_MATRIX, np.zeros(5))
+    corners, rotation_vectors, transition_vectors = floor_markers(pose_estimator, 12)
+
+    floor = FloorHomography.fit(pose_estimator.marker_points, corners, rotation_vectors, transition_vectors)
+    valid, estimated_rotation_vectors, estimated_transition_vectors = floor.estimate_poses(corners)
+
+    assert valid.all()
+    np.testing.assert_allclose(estimated_transition_vectors, transition_vectors, atol=1e-6)
+    yaw_error = (
+        ArUcoRobotPoseEstimator.rotation_vectors_to_yaw(estimated_rotation_vectors)
+        - ArUcoRobotPoseEstimator.rotation_vectors_to_yaw(rotation_vectors)
+        + 180.0
+    ) % 360.0 - 180.0
+    assert np.abs(yaw_error).max() < 1e-3
+
+
+def test_save_keeps_the_given_path(tmp_path):
+    floor = FloorHomography(np.diag([0.001, 0.001, 1.0]), 1.2)
+    path = tmp_path / "floor.homography"
+
+    floor.save(path)
+
+    assert path.exists()
+    assert not (tmp_path / "floor.homography.npz").exists()
+    loaded = FloorHomography.load(path)
+    np.testing.assert_array_equal(loaded.homography, floor.homography)
+    assert loaded.depth == floor.depth
@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+from predictor import ConstantVelocityKalman, PredictivePublisher
+
+
+class RecordingPublisher:
+    published_messages = 0
+
+    def __init__(self):
+        self.calls = []
+
+    def publish(self, ids, x, y, orientation, timestamp=None, prediction_time=None):
+        self.calls.append((np.array(ids), np.array(x), np.array(timestamp), prediction_time))
+        return True
+
+
+def test_kalman_tracks_constant_velocity():
+    kalman = ConstantVelocityKalman()
+    for step in range(30):
+        t = step / 30
+        kalman.update([3], [[0.5 * t, -0.2 * t, 0.1]], t)
+
+    predicted = kalman.predict([3], 1.0 + 0.1)
+
+    np.testing.assert_allclose(predicted[0], [0.55, -0.22, 0.1], atol=1e-3)
+
+
+def test_kalman_skips_poses_already_fused_at_their_timestamp():
+    kalman = ConstantVelocityKalman()
+    kalman.update([1, 2], [[0.0, 0.0, 0.0], [1.0, 1.0, 0.0]], 1.0)
+    kalman.update([1, 2], [[0.1, 0.0, 0.0], [1.0, 1.0, 0.0]], 1.1)
+    state = (kalman.position.copy(), kalman.velocity.copy(), kalman.p00.copy())
+
+    # Marker 2 is held from the frame at 1.1, only marker 1 is a new measurement
+    kalman.update([1, 2], [[0.2, 0.0, 0.0], [1.0, 1.0, 0.0]], np.array([1.2, 1.1]))
+
+    np.testing.assert_array_equal(kalman.position[2], state[0][2])
+    np.testing.assert_array_equal(kalman.velocity[2], state[1][2])
+    np.testing.assert_array_equal(kalman.p00[2], state[2][2])
+    assert kalman.t_last[1] == 1.2
+    assert kalman.t_last[2] == 1.1
+    assert not np.array_equal(kalman.position[1], state[0][1])
+
+
+def test_predictive_publisher_keeps_capture_timestamps():
+    publisher = RecordingPublisher()
+    predictive = PredictivePublisher(publisher, rate=200.0, max_horizon=1.0)
+    capture_time = time.time()
+    predictive.publish([1, 2], [0.0, 1.0], [0.0, 1.0], [0.0, 0.0], timestamp=np.array([capture_time - 0.01, capture_time]))
+    predictive.start()
+    time.sleep(0.05)
+    predictive.stop()
+    predictive.join(timeout=1.0)
+
+    assert publisher.calls
+    ids, _, timestamps, prediction_time = publisher.calls[-1]
+    assert ids.tolist() == [1, 2]
+    np.testing.assert_array_equal(timestamps, [capture_time - 0.01, capture_time])
+    assert prediction_time > capture_time
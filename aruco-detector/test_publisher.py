@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+from publisher import FRAME_TOPIC, PosePublisher, decode_frame, encode_frame_binary, encode_frame_json
+
+
+class RecordingClient:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload, qos=0):
+        self.messages.append((topic, payload))
+
+
+def frames(client):
+    return [decode_frame(payload) for topic, payload in client.messages if topic == FRAME_TOPIC]
+
+
+@pytest.mark.parametrize("encode", [encode_frame_binary, encode_frame_json])
+@pytest.mark.parametrize("keyframe", [True, False])
+def test_frame_round_trip(encode, keyframe):
+    ids = np.array([0, 7, 49])
+    x = np.array([0.125, -1.5, 2.25])
+    y = np.array([0.5, 0.75, -0.25])
+    orientation = np.array([0.0, 3.0, -1.25])
+
+    frame = decode_frame(encode(2**32 + 5, 1792329353.872252, ids, x, y, orientation, keyframe=keyframe))
+
+    assert frame["seq"] == (5 if encode is encode_frame_binary else 2**32 + 5)
+    assert frame["timestamp"] == 1792329353.872252
+    assert frame["keyframe"] is keyframe
+    assert [robot["robot_id"] for robot in frame["robots"]] == [0, 7, 49]
+    np.testing.assert_allclose([robot["x"] for robot in frame["robots"]], x)
+    np.testing.assert_allclose([robot["y"] for robot in frame["robots"]], y)
+    np.testing.assert_allclose([robot["orientation"] for robot in frame["robots"]], orientation, rtol=1e-7)
+
+
+def test_empty_frame_round_trip():
+    frame = decode_frame(encode_frame_binary(0, 1.0, [], [], [], [], keyframe=True))
+
+    assert frame["robots"] == []
+    assert frame["keyframe"]
+
+
+def test_frame_mode_sends_keyframes_then_only_changes():
+    client = RecordingClient()
+    publisher = PosePublisher(client, mode="frame", position_threshold=0.01, keyframe_interval=3600.0)
+    ids = np.array([1, 2])
+
+    publisher.publish(ids, [0.0, 1.0], [0.0, 1.0], [0.0, 0.0], timestamp=1.0)
+    publisher.publish(ids, [0.001, 1.2], [0.0, 1.0], [0.0, 0.0], timestamp=2.0)
+    assert not publisher.publish(ids, [0.001, 1.2], [0.0, 1.0], [0.0, 0.0], timestamp=3.0)
+
+    keyframe, delta = frames(client)
+    assert keyframe["keyframe"]
+    assert [robot["robot_id"] for robot in keyframe["robots"]] == [1, 2]
+    assert not delta["keyframe"]
+    assert [robot["robot_id"] for robot in delta["robots"]] == [2]
+    assert (keyframe["seq"], delta["seq"]) == (0, 1)
+    assert publisher.published_messages == 2
+
+
+def test_frame_mode_sends_periodic_keyframes():
+    client = RecordingClient()
+    publisher = PosePublisher(client, mode="frame", keyframe_interval=0.0)
+
+    for _ in range(3):
+        publisher.publish([4], [0.5], [0.5], [0.0], timestamp=1.0)
+
+    assert [frame["keyframe"] for frame in frames(client)] == [True, True, True]
+
+
+def test_legacy_messages_carry_per_robot_timestamps():
+    client = RecordingClient()
+    publisher = PosePublisher(client)
+
+    publisher.publish([3, 8], [0.1, 0.2], [0.3, 0.4], [0.5, 0.6], timestamp=np.array([1.0, 2.0]), prediction_time=2.5)
+
+    messages = {topic: json.loads(payload) for topic, payload in client.messages}
+    assert messages["robots/3/position"]["timestamp"] == 1.0
+    assert messages["robots/8/position"]["timestamp"] == 2.0
+    assert messages["robots/8/position"]["prediction_time"] == 2.5
@@ -0,0 +1,75 @@
+import numpy as np
+from tracker import MarkerTracker
+
+
+def frame(tracker, ids, timestamp):
+    """Feed one frame where every marker in ids is seen at x = id, and return the confirmed ids."""
+    ids = np.asarray(ids, dtype=np.int64)
+    tracker.update(ids, ids.astype(float), np.zeros(len(ids)), np.zeros(len(ids)), timestamp=timestamp)
+    return tracker.confirmed()[0].tolist()
+
+
+def test_marker_is_confirmed_after_confirm_hits():
+    tracker = MarkerTracker(10, confirm_hits=3, drop_misses=2)
+
+    assert frame(tracker, [4], 1.0) == []
+    assert frame(tracker, [4], 2.0) == []
+    assert frame(tracker, [4], 3.0) == [4]
+
+
+def test_tentative_marker_starts_over_on_a_miss():
+    tracker = MarkerTracker(10, confirm_hits=3, drop_misses=2)
+
+    frame(tracker, [4], 1.0)
+    frame(tracker, [4], 2.0)
+    frame(tracker, [], 3.0)
+
+    assert frame(tracker, [4], 4.0) == []
+    assert frame(tracker, [4], 5.0) == []
+    assert frame(tracker, [4], 6.0) == [4]
+
+
+def test_confirmed_marker_is_held_for_drop_misses_frames():
+    tracker = MarkerTracker(10, confirm_hits=1, drop_misses=3)
+
+    assert frame(tracker, [4], 1.0) == [4]
+    assert frame(tracker, [], 2.0) == [4]
+    assert frame(tracker, [], 3.0) == [4]
+    assert frame(tracker, [], 4.0) == [4]
+    assert frame(tracker, [], 5.0) == []
+    # Dropped markers have to be confirmed again
+    tracker.confirm_hits = 2
+    assert frame(tracker, [4], 6.0) == []
+    assert frame(tracker, [4], 7.0) == [4]
+
+
+def test_miss_streak_resets_when_seen_again():
+    tracker = MarkerTracker(10, confirm_hits=1, drop_misses=1)
+
+    frame(tracker, [4], 1.0)
+    frame(tracker, [], 2.0)
+    frame(tracker, [4], 3.0)
+
+    assert frame(tracker, [], 4.0) == [4]
+    assert frame(tracker, [], 5.0) == []
+
+
+def test_drop_misses_zero_drops_on_any_miss():
+    tracker = MarkerTracker(10, confirm_hits=1, drop_misses=0)
+
+    assert frame(tracker, [4], 1.0) == [4]
+    assert frame(tracker, [], 2.0) == []
+
+
+def test_held_poses_keep_their_last_seen_time():
+    tracker = MarkerTracker(10, confirm_hits=1, drop_misses=2)
+    tracker.update([2, 5], [0.1, 0.5], [0.2, 0.6], [0.3, 0.7], timestamp=1.0)
+    tracker.update([5], [0.55], [0.65], [0.75], timestamp=2.0)
+
+    ids, x, y, orientation, last_seen = tracker.confirmed()
+
+    assert ids.tolist() == [2, 5]
+    np.testing.assert_allclose(x, [0.1, 0.55])
+    np.testing.assert_allclose(y, [0.2, 0.65])
+    np.testing.assert_allclose(orientation, [0.3, 0.75])
+    np.testing.assert_allclose(last_seen, [1.0, 2.0])
@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+
+
+class MarkerTracker:
+    """Confirms and drops markers with hit/miss counters in one fixed slot per marker id.
+
+    A marker is confirmed after confirm_hits consecutive detections. Its last
+    pose is held through up to drop_misses consecutive frames without it and it
+    is dropped on the next miss, so a single missed detection no longer makes
+    the robot vanish downstream. A held pose keeps the time it was last seen,
+    so it is never passed off as a fresh measurement. A marker that is not
+    confirmed yet starts over on any miss.
+
+    All state lives in arrays indexed by marker id (the dictionary bounds the id
+    space) and confirmed() compacts into preallocated buffers, so a frame costs
+    a few vectorized operations and no per-marker objects.
+    """
+
+    def __init__(self, capacity=50, confirm_hits=6, drop_misses=5):
+        """
+        Args:
+            capacity: Number of marker ids (size of the ArUco dictionary)
+            confirm_hits: Consecutive detections before a marker is published
+            drop_misses: Consecutive missed frames a confirmed marker is held for before it is dropped
+        """
+        self.confirm_hits = confirm_hits
+        self.drop_misses = drop_misses
+        self.hits = np.zeros(capacity, dtype=np.int64)
+        self.misses = np.zeros(capacity, dtype=np.int64)
+        self.confirmed_mask = np.zeros(capacity, dtype=bool)
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.orientation = np.zeros(capacity)
+        self.last_seen = np.zeros(capacity)
+        # Per-frame masks, reused
+        self._seen = np.zeros(capacity, dtype=bool)
+        self._unseen = np.zeros(capacity, dtype=bool)
+        self._scratch = np.zeros(capacity, dtype=bool)
+        self._ids = np.arange(capacity, dtype=np.int32)
+        # Compaction targets of confirmed()
+        self._out_ids = np.empty(capacity, dtype=np.int32)
+        self._out_x = np.empty(capacity)
+        self._out_y = np.empty(capacity)
+        self._out_orientation = np.empty(capacity)
+        self._out_last_seen = np.empty(capacity)
+
+    def update(self, ids, x, y, orientation, timestamp=None):
+        """
+        Record the markers detected in one frame.
+
+        Args:
+            ids: Detected marker ids, shape (n,)
+            x, y: Positions, shape (n,)
+            orientation: Orientations, shape (n,)
+            timestamp: Capture timestamp of the frame (defaults to now)
+        """
+        seen = self._seen
+        unseen = self._unseen
+        scratch = self._scratch
+        seen[:] = False
+        seen[ids] = True
+        np.logical_not(seen, out=unseen)
+        self.x[ids] = x
+        self.y[ids] = y
+        self.orientation[ids] = orientation
+        self.last_seen[ids] = time.time() if timestamp is None else timestamp
+        np.add(self.hits, 1, out=self.hits, where=seen)
+        np.copyto(self.misses, 0, where=seen)
+        np.add(self.misses, 1, out=self.misses, where=unseen)
+        # Tentative markers need consecutive hits, confirmed ones are held through drop_misses misses
+        np.logical_and(unseen, np.logical_not(self.confirmed_mask, out=scratch), out=scratch)
+        np.copyto(self.hits, 0, where=scratch)
+        np.greater_equal(self.hits, self.confirm_hits, out=scratch)
+        np.logical_or(self.confirmed_mask, scratch, out=self.confirmed_mask)
+        np.greater(self.misses, self.drop_misses, out=scratch)
+        np.copyto(self.confirmed_mask, False, where=scratch)
+        np.copyto(self.hits, 0, where=scratch)
+
+    def confirmed(self):
+        """
+        Return the confirmed markers as views into reused buffers (valid until the next call).
+
+        Returns:
+            ids, x, y, orientation and the capture timestamp each pose was last seen at, each shape (m,)
+        """
+        mask = self.confirmed_mask
+        count = int(np.count_nonzero(mask))
+        ids = np.compress(mask, self._ids, out=self._out_ids[:count])
+        x = np.compress(mask, self.x, out=self._out_x[:count])
+        y = np.compress(mask, self.y, out=self._out_y[:count])
+        orientation = np.compress(mask, self.orientation, out=self._out_orientation[:count])
+        last_seen = np.compress(mask, self.last_seen, out=self._out_last_seen[:count])
+        return ids, x, y, orientation, last_seen
+
+    def reset(self):
+        self.hits[:] = 0
+        self.misses[:] = 0
+        self.confirmed_mask[:] = False
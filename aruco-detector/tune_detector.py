@@ -0,0 +1,201 @@
+"""Search ArUco DetectorParameters for the fastest profile that still finds the markers.
+
+Every candidate profile detects markers on the same frames and is scored on
+detection rate, corner error and time per frame. Synthetic frames are scored
+against their exact ground truth; on a recording the detections of OpenCV's
+default parameters are taken as the reference. The fastest candidate whose
+detection rate reaches the target (without more false detections than the
+defaults) is saved as a JSON profile for main.py --detector-profile.
+
+Examples:
+    python tune_detector.py --output detector_profile.json
+    python tune_detector.py --recording recordings/arena --trials 120 --target 0.995
+"""
+
+import argparse
+import itertools
+import json
+import random
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from camera_calibration import calibrate_camera
+from estimator import ArUcoRobotPoseEstimator
+from recording import ReplaySource
+from synthetic import SyntheticArena
+
+# Values tried per DetectorParameters attribute; tuples set several attributes together
+SEARCH_SPACE = {
+    ("adaptiveThreshWinSizeMin", "adaptiveThreshWinSizeMax", "adaptiveThreshWinSizeStep"): [
+        (3, 23, 10), (3, 13, 10), (5, 15, 10), (3, 3, 10), (5, 5, 10), (7, 7, 10), (11, 11, 10), (7, 21, 14),
+    ],
+    ("cornerRefinementMethod",): [(cv2.aruco.CORNER_REFINE_NONE,), (cv2.aruco.CORNER_REFINE_SUBPIX,)],
+    ("polygonalApproxAccuracyRate",): [(0.03,), (0.05,)],
+    ("minMarkerPerimeterRate", "maxMarkerPerimeterRate"): [(0.03, 4.0), (0.05, 1.0), (0.08, 0.5)],
+    ("perspectiveRemovePixelPerCell",): [(4,), (2,)],
+    ("useAruco3Detection", "minMarkerLengthRatioOriginalImg"): [(False, 0.0), (True, 0.01), (True, 0.02)],
+}
+
+
+def candidate_profiles(trials, seed=0):
+    """Default parameters first, then up to trials - 1 random picks from SEARCH_SPACE."""
+    keys = list(SEARCH_SPACE)
+    combinations = list(itertools.product(*(SEARCH_SPACE[key] for key in keys)))
+    random.Random(seed).shuffle(combinations)
+    profiles = [{}]
+    for combination in combinations[: max(0, trials - 1)]:
+        profile = {}
+        for names, values in zip(keys, combination, strict=True):
+            profile.update(zip(names, values, strict=True))
+        profiles.append(profile)
+    return profiles
+
+
+def synthetic_frames(count, **arena_options):
+    """Render count synthetic frames with their ground truth: [(frame, {id: corners (4, 2)})]."""
+    arena = SyntheticArena(**arena_options)
+    return [
+        (frame, {int(marker_id): marker_corners for marker_id, marker_corners in zip(ids, corners, strict=True)})
+        for frame, ids, corners in arena.frames(count)
+    ]
+
+
+def recorded_frames(path, count, reference_estimator):
+    """Read up to count frames of a recording, with the default detector's markers as ground truth."""
+    source = ReplaySource(path)
+    frames = []
+    for _ in range(min(count, len(source.recording))):
+        ret, frame = source.read()
+        if not ret:
+            break
+        corners, ids, _ = reference_estimator.detect_markers(frame)
+        truth = {} if ids is None else {
+            int(marker_id): marker_corners.reshape(4, 2) for marker_id, marker_corners in zip(ids.ravel(), corners, strict=True)
+        }
+        frames.append((frame, truth))
+    return frames
+
+
+def evaluate(pose_estimator, frames, repeats=2):
+    """
+    Score one estimator on frames.
+
+    Returns:
+        dict with detection_rate, false_detections, corner_error_px (mean) and ms_per_frame (median)
+    """
+    durations = []
+    expected = found = false_detections = 0
+    errors = []
+    for frame, truth in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        for _ in range(repeats):
+            started = time.perf_counter()
+            corners, ids, _ = pose_estimator.detect_markers(gray)
+            durations.append(time.perf_counter() - started)
+        expected += len(truth)
+        if ids is None:
+            continue
+        for marker_id, marker_corners in zip(ids.ravel(), corners, strict=True):
+            reference = truth.get(int(marker_id))
+            if reference is None:
+                false_detections += 1
+                continue
+            found += 1
+            errors.extend(np.linalg.norm(marker_corners.reshape(4, 2) - reference, axis=1))
+    return {
+        "detection_rate": found / expected if expected else 1.0,
+        "false_detections": false_detections,
+        "corner_error_px": float(np.mean(errors)) if errors else float("nan"),
+        "ms_per_frame": float(np.median(durations)) * 1000.0,
+    }
+
+
+def tune(frames, camera_matrix, distortion_coefficients, trials=60, target=0.99, max_corner_error=None,
+         detection_scale=1.0, seed=0):
+    """
+    Evaluate candidate profiles and pick the fastest acceptable one.
+
+    Args:
+        frames: [(frame, {marker_id: corners (4, 2)})] to score on
+        camera_matrix, distortion_coefficients: Calibration for the estimators
+        trials: Number of profiles evaluated, the defaults included
+        target: Minimum detection rate
+        max_corner_error: Maximum mean corner error in pixels, None for no limit
+        detection_scale: Coarse-to-fine detection scale the profile is tuned for
+        seed: Seed of the random search
+
+    Returns:
+        (best, baseline, results): best and baseline are {"parameters": ..., **scores}
+    """
+    results = []
+    for index, profile in enumerate(candidate_profiles(trials, seed)):
+        pose_estimator = ArUcoRobotPoseEstimator(
+            camera_matrix, distortion_coefficients, detection_scale=detection_scale, detector_profile=profile
+        )
+        scores = evaluate(pose_estimator, frames)
+        results.append({"parameters": profile, **scores})
+        print(
+            f"\r[{index + 1}/{trials}] {scores['ms_per_frame']:.2f} ms  rate {scores['detection_rate'] * 100:.1f}%  "
+            f"error {scores['corner_error_px']:.3f} px",
+            end="",
+        )
+    print()
+    baseline = results[0]
+    acceptable = [
+        result for result in results
+        if result["detection_rate"] >= target
+        and result["false_detections"] <= baseline["false_detections"]
+        and (max_corner_error is None or result["corner_error_px"] <= max_corner_error)
+    ]
+    best = min(acceptable, key=lambda result: result["ms_per_frame"]) if acceptable else None
+    return best, baseline, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ArUco detector parameter tuner")
+    parser.add_argument("--recording", metavar="DIR", help="Recording made with main.py --record")
+    parser.add_argument("--frames", type=int, default=20, help="Frames to score every profile on")
+    parser.add_argument("--markers", type=int, default=12, help="Markers in synthetic frames")
+    parser.add_argument("--width", type=int, default=1920, help="Synthetic frame width")
+    parser.add_argument("--height", type=int, default=1080, help="Synthetic frame height")
+    parser.add_argument("--trials", type=int, default=60, help="Profiles to evaluate, the defaults included")
+    parser.add_argument("--target", type=float, default=0.99, help="Minimum detection rate of the saved profile")
+    parser.add_argument("--max-corner-error", type=float, help="Maximum mean corner error in pixels")
+    parser.add_argument("--detection-scale", type=float, default=1.0, help="Coarse-to-fine detection scale to tune for")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random search")
+    parser.add_argument("--output", default="detector_profile.json", help="Where the profile is written")
+    args = parser.parse_args()
+
+    camera_matrix, distortion_coefficients = calibrate_camera()
+    if args.recording is not None:
+        reference_estimator = ArUcoRobotPoseEstimator(camera_matrix, distortion_coefficients)
+        frames = recorded_frames(args.recording, args.frames, reference_estimator)
+    else:
+        print(f"Rendering {args.frames} synthetic {args.width}x{args.height} frames...")
+        frames = synthetic_frames(args.frames, width=args.width, height=args.height, markers=args.markers)
+
+    best, baseline, _ = tune(
+        frames, camera_matrix, distortion_coefficients, trials=args.trials, target=args.target,
+        max_corner_error=args.max_corner_error, detection_scale=args.detection_scale, seed=args.seed,
+    )
+    print(
+        f"Defaults: {baseline['ms_per_frame']:.2f} ms/frame  rate {baseline['detection_rate'] * 100:.1f}%  "
+        f"error {baseline['corner_error_px']:.3f} px"
+    )
+    if best is None:
+        print(f"No profile reached a detection rate of {args.target * 100:.1f}%, nothing written")
+        return
+    print(
+        f"Best:     {best['ms_per_frame']:.2f} ms/frame  rate {best['detection_rate'] * 100:.1f}%  "
+        f"error {best['corner_error_px']:.3f} px"
+    )
+    print(f"Parameters: {best['parameters']}")
+    with Path(args.output).open("w") as f:
+        json.dump({**best, "baseline": baseline, "config": vars(args)}, f, indent=2)
+    print(f"Profile written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import secrets
+import time
+
+import metrics
+
+SNAPSHOT_TOPIC = 'neighborhood/snapshot'
+DELTA_TOPIC = 'neighborhood/delta'
+
+
+def diff_graphs(before, after):
+    """
+    Compare two robot_id -> frozenset of neighbor ids graphs.
+
+    Returns:
+        (added, removed, robots_added, robots_removed): added and removed are lists of
+        directed edges [robot, neighbor]; the edges of removed robots count as removed
+    """
+    added = []
+    removed = []
+    for robot_id, neighbors in after.items():
+        previous = before.get(robot_id, frozenset())
+        if neighbors == previous:
+            continue
+        added.extend([robot_id, neighbor] for neighbor in sorted(neighbors - previous))
+        removed.extend([robot_id, neighbor] for neighbor in sorted(previous - neighbors))
+    robots_added = sorted(after.keys() - before.keys())
+    robots_removed = sorted(before.keys() - after.keys())
+    for robot_id in robots_removed:
+        removed.extend([robot_id, neighbor] for neighbor in sorted(before[robot_id]))
+    return added, removed, robots_added, robots_removed
+
+
+class GraphPublisher:
+    """Publishes the whole neighbor graph as versioned snapshots plus edge deltas.
+
+    Every message carries a version number that increments by one per message.
+    A snapshot holds every robot's neighbor list; a delta holds the directed
+    edges [robot, neighbor] added and removed since the previous version, plus
+    robots that appeared or disappeared. A consumer applies deltas whose "base"
+    equals its current version and otherwise waits for the next snapshot, which
+    is sent every snapshot_interval seconds (and as the very first message).
+
+    Snapshot:
+        {"version": 7, "timestamp": ..., "type": "RADIUS", "neighbors": {"1": [2, 3], "2": [1], "3": [1]}}
+    Delta:
+        {"version": 8, "base": 7, "timestamp": ..., "added": [[2, 3]], "removed": [[1, 3]],
+         "robots_added": [], "robots_removed": [3]}
+    """
+
+    def __init__(self, snapshot_interval=5.0):
+        self.snapshot_interval = snapshot_interval
+        self.version = 0
+        self.published = {}  # robot_id (int) -> frozenset of neighbor ids, as last published
+        self._last_snapshot = None
+
+    def flush(self, client, neighborhoods, neighborhood_type=None, now=None):
+        """
+        Publish the changes between the last published graph and neighborhoods.
+
+        Args:
+            client: Anything with a publish(topic, payload) method
+            neighborhoods: robot_id -> list of neighbor ids, for every known robot
+            neighborhood_type: Reported in snapshots
+            now: Current monotonic time (defaults to time.monotonic())
+
+        Returns:
+            'snapshot', 'delta', or None when nothing changed
+        """
+        if now is None:
+            now = time.monotonic()
+        graph = {int(robot_id): frozenset(neighbors) for robot_id, neighbors in neighborhoods.items()}
+        if self._last_snapshot is None or now - self._last_snapshot >= self.snapshot_interval:
+            self.version += 1
+            client.publish(SNAPSHOT_TOPIC, json.dumps({
+                'version': self.version,
+                'timestamp': time.time(),
+                'type': neighborhood_type,
+                'neighbors': {str(robot_id): sorted(neighbors) for robot_id, neighbors in sorted(graph.items())},
+            }))
+            metrics.GRAPH_SNAPSHOTS_PUBLISHED.inc()
+            self.published = graph
+            self._last_snapshot = now
+            return 'snapshot'
+
+        added, removed, robots_added, robots_removed = diff_graphs(self.published, graph)
+        if not (added or removed or robots_added or robots_removed):
+            return None
+        self.version += 1
+        client.publish(DELTA_TOPIC, json.dumps({
+            'version': self.version,
+            'base': self.version - 1,
+            'timestamp': time.time(),
+            'added': added,
+            'removed': removed,
+            'robots_added': robots_added,
+            'robots_removed': robots_removed,
+        }))
+        metrics.GRAPH_DELTAS_PUBLISHED.inc()
+        self.published = graph
+        return 'delta'
+
+
+def apply_message(graph, version, message):
+    """
+    Apply a snapshot or delta message to a consumer-side graph.
+
+    Args:
+        graph: robot_id -> set of neighbor ids, updated in place
+        version: Version of graph, or None before the first snapshot
+        message: Decoded snapshot or delta message
+
+    Returns:
+        The new version, or None if a delta was missed and the next snapshot must be awaited
+    """
+    if 'neighbors' in message:
+        graph.clear()
+        graph.update({int(robot_id): set(neighbors) for robot_id, neighbors in message['neighbors'].items()})
+        return message['version']
+    if version is None or message['base'] != version:
+        return None
+    for robot_id in message['robots_added']:
+        graph.setdefault(robot_id, set())
+    for robot_id, neighbor in message['removed']:
+        graph.get(robot_id, set()).discard(neighbor)
+    for robot_id in message['robots_removed']:
+        graph.pop(robot_id, None)
+    for robot_id, neighbor in message['added']:
+        graph.setdefault(robot_id, set()).add(neighbor)
+    return message['version']
+
+
+class GraphView:
+    """Cached, versioned snapshot of robot positions and adjacency for HTTP clients.
+
+    update() compares the current state with the last snapshot and, only when
+    something changed, bumps the version, serializes the snapshot once and
+    queues one pre-encoded server-sent event with the delta for every stream
+    subscriber. Requests then just return the cached bytes. Versions restart at
+    0 with the process, so the ETag and the event ids are "<epoch>-<version>"
+    with a random epoch per GraphView: a cached ETag or Last-Event-ID from
+    before a restart never matches. Positions are rounded to the millimeter
+    (and milliradian) so sensor noise alone does not create new versions.
+
+    Snapshot:
+        {"epoch": "9f3c2a1b", "version": 7, "timestamp": ..., "type": "RADIUS",
+         "positions": {"1": {"x": 0.1, "y": 0.2, "orientation": 1.571}, ...}, "neighbors": {"1": [2, 3], ...}}
+    Delta event data (like the MQTT delta, plus moved robots):
+        {"epoch": "9f3c2a1b", "version": 8, "base": 7, "timestamp": ..., "type": "RADIUS", "added": [[2, 3]],
+         "removed": [], "robots_added": [], "robots_removed": [],
+         "positions": {"2": {"x": 0.3, "y": 0.2, "orientation": 0.0}}}
+    """
+
+    def __init__(self, max_queued=64):
+        """
+        Args:
+            max_queued: Events buffered per stream subscriber; a subscriber that falls
+                further behind is sent a fresh snapshot instead
+        """
+        self.max_queued = max_queued
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self.graph = {}
+        self.positions = {}
+        self.neighborhood_type = None
+        self.subscribers = set()
+        self.closed = False
+        self._build_snapshot()
+
+    @property
+    def event_id(self):
+        """Id of the current version, unique across restarts."""
+        return f'{self.epoch}-{self.version}'
+
+    @property
+    def etag(self):
+        return f'"{self.event_id}"'
+
+    def _build_snapshot(self):
+        self.snapshot = json.dumps({
+            'epoch': self.epoch,
+            'version': self.version,
+            'timestamp': time.time(),
+            'type': self.neighborhood_type,
+            'positions': {str(robot_id): _position_json(position) for robot_id, position in sorted(self.positions.items())},
+            'neighbors': {str(robot_id): sorted(neighbors) for robot_id, neighbors in sorted(self.graph.items())},
+        }).encode()
+        metrics.GRAPH_VIEW_SNAPSHOTS_BUILT.inc()
+
+    def snapshot_event(self):
+        """The current snapshot as a server-sent event."""
+        return b'id: %s\nevent: snapshot\ndata: %s\n\n' % (self.event_id.encode(), self.snapshot)
+
+    def update(self, positions, neighborhoods, neighborhood_type):
+        """
+        Refresh the view from the service state.
+
+        Args:
+            positions: robot_id -> position message ({'x': ..., 'y': ..., 'orientation': ...})
+            neighborhoods: robot_id -> list of neighbor ids
+            neighborhood_type: Current neighborhood type
+
+        Returns:
+            True when a new version was created
+        """
+        graph = {int(robot_id): frozenset(neighbors) for robot_id, neighbors in neighborhoods.items()}
+        rounded = {
+            int(robot_id): (
+                round(position['x'], 3), round(position['y'], 3), round(position.get('orientation', 0.0), 3)
+            )
+            for robot_id, position in positions.items()
+        }
+        if graph == self.graph and rounded == self.positions and neighborhood_type == self.neighborhood_type:
+            return False
+        added, removed, robots_added, robots_removed = diff_graphs(self.graph, graph)
+        moved = {robot_id: position for robot_id, position in rounded.items() if self.positions.get(robot_id) != position}
+        self.version += 1
+        self.graph = graph
+        self.positions = rounded
+        self.neighborhood_type = neighborhood_type
+        self._build_snapshot()
+        if self.subscribers:
+            delta = json.dumps({
+                'epoch': self.epoch,
+                'version': self.version,
+                'base': self.version - 1,
+                'timestamp': time.time(),
+                'type': neighborhood_type,
+                'added': added,
+                'removed': removed,
+                'robots_added': robots_added,
+                'robots_removed': robots_removed,
+                'positions': {str(robot_id): _position_json(position) for robot_id, position in sorted(moved.items())},
+            }).encode()
+            event = b'id: %s\nevent: delta\ndata: %s\n\n' % (self.event_id.encode(), delta)
+            for queue in self.subscribers:
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # Too far behind, replace the backlog with a resync
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+        return True
+
+    def subscribe(self):
+        """
+        Register a stream subscriber.
+
+        Returns:
+            asyncio.Queue of encoded events; None means "send a fresh snapshot"
+        """
+        queue = asyncio.Queue(self.max_queued)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def close(self):
+        """Wake every subscriber so streams can end, e.g. on shutdown."""
+        self.closed = True
+        for queue in self.subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+def _position_json(position):
+    x, y, orientation = position
+    return {'x': x, 'y': y, 'orientation': orientation}
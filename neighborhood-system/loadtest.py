@@ -0,0 +1,189 @@
+"""Swarm load generator and scaling benchmark for the neighborhood service.
+
+Simulated robots random-walk in a square arena and their position messages are
+fed straight into main.on_message with an in-process fake MQTT client, so neither
+a broker nor the event loop is needed. Every configuration runs for a fixed wall-clock budget and the
+results are written as JSON.
+
+Example:
+    python loadtest.py --sizes 10 100 1000 10000 --modes FULL RADIUS --output results.json
+"""
+import argparse
+import json
+import math
+import random
+import time
+from pathlib import Path
+
+import main
+import numpy as np
+
+
+class FakeClient:
+    """Stands in for the paho client: records publish volume and position-to-neighbors latency."""
+
+    def __init__(self):
+        self.pending = {}  # robot_id -> perf_counter time its last position arrived
+        self.latencies = []
+        self.messages = 0
+        self.bytes = 0
+
+    def publish(self, topic, payload, qos=0):
+        self.messages += 1
+        self.bytes += len(payload)
+        received = self.pending.pop(topic.split('/')[1], None)
+        if received is not None:
+            self.latencies.append(time.perf_counter() - received)
+
+    def subscribe(self, topic):
+        pass
+
+
+class Swarm:
+    """N robots doing a random walk at constant density."""
+
+    def __init__(self, size, density=0.5, step=0.05, seed=0):
+        self.rng = random.Random(seed)
+        self.side = math.sqrt(size / density)
+        self.positions = [[self.rng.uniform(0, self.side), self.rng.uniform(0, self.side)] for _ in range(size)]
+        self.step = step
+
+    def move(self, robot_id):
+        position = self.positions[robot_id]
+        position[0] = min(max(position[0] + self.rng.gauss(0, self.step), 0.0), self.side)
+        position[1] = min(max(position[1] + self.rng.gauss(0, self.step), 0.0), self.side)
+        return position
+
+
+def reset_service(mode, radius, tick_rate, k=6, neighbor_output='lists'):
+    main.robot_positions.clear()
+    main.last_neighbors_sent.clear()
+    main.update_counter.clear()
+    main.current_neighbors.clear()
+    main.last_seen.clear()
+    main.NEIGHBOR_OUTPUT = neighbor_output
+    main.graph_publisher = main.GraphPublisher(main.GRAPH_SNAPSHOT_INTERVAL)
+    main.neighborhood_type = mode
+    main.radius_value = radius
+    main.k_value = k
+    main.TICK_RATE = tick_rate
+    main.rebuild_spatial_index()
+
+
+def percentiles(samples):
+    if not samples:
+        return {'mean': None, 'p50': None, 'p99': None}
+    values = np.array(samples) * 1000.0
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p99': float(np.percentile(values, 99)),
+    }
+
+
+def run(size, mode, radius=1.0, rate=10.0, tick_rate=0.0, duration=2.0, density=0.5, seed=0, k=6,
+        neighbor_output='lists'):
+    """
+    Drive one configuration for duration seconds of wall-clock time.
+
+    Robots publish in rounds (one message per robot per round, i.e. 1/rate
+    simulated seconds). In tick mode the batched computation runs every
+    rate/tick_rate rounds. Graph output is flushed after every tick, or once
+    per round in per-message mode.
+
+    Returns:
+        dict of throughput, compute time, publish volume and latency figures
+    """
+    reset_service(mode, radius, tick_rate, k=k, neighbor_output=neighbor_output)
+    publish_graph = neighbor_output != 'lists'
+    swarm = Swarm(size, density=density, seed=seed)
+    client = FakeClient()
+    update_times = []
+    tick_times = []
+    messages = 0
+    rounds = 0
+    rounds_per_tick = max(1, round(rate / tick_rate)) if tick_rate > 0 else 0
+    started = time.perf_counter()
+    deadline = started + duration
+    while time.perf_counter() < deadline:
+        for robot_id in range(size):
+            x, y = swarm.move(robot_id)
+            payload = json.dumps({'x': x, 'y': y, 'orientation': 0.0, 'robot_id': robot_id}).encode()
+            t0 = time.perf_counter()
+            client.pending[str(robot_id)] = t0
+            main.on_message(client, f'robots/{robot_id}/position', payload)
+            update_times.append(time.perf_counter() - t0)
+            messages += 1
+            if time.perf_counter() >= deadline:
+                break
+        rounds += 1
+        if rounds_per_tick and rounds % rounds_per_tick == 0:
+            t0 = time.perf_counter()
+            main.publish_changed_neighbors(client, main.compute_all_neighbors(main.robot_positions))
+            if publish_graph:
+                main.graph_publisher.flush(client, main.current_neighbors, mode)
+            tick_times.append(time.perf_counter() - t0)
+        elif publish_graph and not rounds_per_tick:
+            main.graph_publisher.flush(client, main.current_neighbors, mode)
+    elapsed = time.perf_counter() - started
+    throughput = messages / elapsed
+    offered = size * rate
+    return {
+        'robots': size,
+        'mode': mode,
+        'radius': radius,
+        'k': k,
+        'neighbor_output': neighbor_output,
+        'rate_hz': rate,
+        'tick_rate_hz': tick_rate,
+        'messages': messages,
+        'elapsed_s': elapsed,
+        'messages_per_s': throughput,
+        'offered_messages_per_s': offered,
+        'keeps_up': throughput >= offered,
+        'update_ms': percentiles(update_times),
+        'tick_ms': percentiles(tick_times),
+        'published_messages': client.messages,
+        'published_bytes': client.bytes,
+        'published_per_update': client.messages / messages if messages else 0.0,
+        'latency_ms': percentiles(client.latencies),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Neighborhood service load test')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000], help='Swarm sizes to sweep')
+    parser.add_argument('--modes', nargs='+', default=['FULL', 'RADIUS'], choices=main.NEIGHBORHOOD_TYPES,
+                        help='Neighborhood types to test')
+    parser.add_argument('--radius', type=float, default=1.0, help='Radius for RADIUS mode')
+    parser.add_argument('--k', type=int, default=6, help='Neighbors per robot in KNN mode')
+    parser.add_argument('--rate', type=float, default=10.0, help='Position messages per robot per second')
+    parser.add_argument('--tick-rate', type=float, default=0.0, help='Batched tick rate (0 = per-message mode)')
+    parser.add_argument('--neighbor-output', choices=['lists', 'graph', 'both'], default='lists',
+                        help='Per-robot neighbor lists, graph snapshots/deltas, or both')
+    parser.add_argument('--density', type=float, default=0.5, help='Robots per square meter')
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds spent on each configuration')
+    parser.add_argument('--output', default='loadtest_results.json', help='JSON file for the results')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'mode':<8}{'robots':>8}{'msg/s':>12}{'offered':>12}{'update p99':>12}{'latency p99':>13}{'pub/upd':>9}")
+    for mode in args.modes:
+        for size in args.sizes:
+            result = run(size, mode, radius=args.radius, rate=args.rate, tick_rate=args.tick_rate,
+                         duration=args.duration, density=args.density, k=args.k,
+                         neighbor_output=args.neighbor_output)
+            results.append(result)
+            latency = result['latency_ms']['p99']
+            print(
+                f"{mode:<8}{size:>8}{result['messages_per_s']:>12.0f}{result['offered_messages_per_s']:>12.0f}"
+                f"{result['update_ms']['p99']:>12.3f}{latency if latency is not None else float('nan'):>13.3f}"
+                f"{result['published_per_update']:>9.2f}"
+            )
+    with Path(args.output).open('w') as f:
+        json.dump({'config': vars(args), 'results': results}, f, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main_cli()
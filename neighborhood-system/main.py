@@ -1,50 +1,143 @@
-import threading
+import asyncio
+import itertools
 import json
+import math
 import os
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import paho.mqtt.client as mqtt
 import time
-app = Flask(__name__)
-CORS(app)
+from collections import OrderedDict
+from pathlib import Path
 
+import aiomqtt
+import metrics
+import numpy as np
+from aiohttp import web
+from graph import DELTA_TOPIC, SNAPSHOT_TOPIC, GraphPublisher, GraphView
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from spatial import GridIndex, gabriel_neighbors, knn_neighbors, radius_neighbors
 
-# Global state
-neighborhood_type = 'FULL'  # Default type "FULL" or "RADIUS"
+# Global state, only ever touched from the event loop so no locking is needed
+neighborhood_type = 'FULL'  # Default type, one of NEIGHBORHOOD_TYPES
 radius_value = 1.0            # Default radius
+k_value = 6                   # Neighbors per robot in KNN mode
 robot_positions = {}
 last_neighbors_sent = {}
 update_counter = {}
+current_neighbors = {}  # robot_id -> latest computed neighbor list, whatever the output mode
+spatial_index = GridIndex(radius_value)  # Grid over robot_positions, cell size = radius_value
+last_seen = OrderedDict()  # robot_id -> time of last position, oldest first
+metrics.ROBOTS_TRACKED.set_function(lambda: len(robot_positions))
 
 # Read MQTT broker URL and port from environment variables
 MQTT_BROKER = os.environ.get('MQTT_BROKER', 'localhost')
 MQTT_PORT = int(os.environ.get('MQTT_PORT', '1883'))
+HTTP_PORT = int(os.environ.get('HTTP_PORT', '5000'))
+# Neighborhood computation rate in Hz; 0 recomputes on every position message
+TICK_RATE = float(os.environ.get('NEIGHBORHOOD_TICK_RATE', '0'))
+# Seconds without a position message after which a robot is forgotten
+ROBOT_TTL = float(os.environ.get('ROBOT_TTL', '2.0'))
+# Nearest robots tested per robot in GABRIEL mode, i.e. its maximum degree
+GABRIEL_CANDIDATES = int(os.environ.get('GABRIEL_CANDIDATES', '16'))
+NEIGHBORHOOD_TYPES = ('FULL', 'RADIUS', 'KNN', 'GABRIEL')
+# "lists": one robots/<id>/neighbors message per robot, "graph": snapshots and deltas of the whole graph, "both"
+NEIGHBOR_OUTPUT = os.environ.get('NEIGHBOR_OUTPUT', 'lists')
+# Graph deltas per second in per-message mode (tick mode sends one per tick)
+GRAPH_RATE = float(os.environ.get('GRAPH_RATE', '10'))
+# Seconds between full graph snapshots
+GRAPH_SNAPSHOT_INTERVAL = float(os.environ.get('GRAPH_SNAPSHOT_INTERVAL', '5'))
+# Refreshes per second of the HTTP graph snapshot and event stream
+GRAPH_VIEW_RATE = float(os.environ.get('GRAPH_VIEW_RATE', '10'))
+# Seconds between keep-alive comments on idle graph event streams
+STREAM_KEEPALIVE = 15.0
 POSITION_TOPIC = 'robots/+/position'
 NEIGHBORS_TOPIC = 'robots/{}/neighbors'
+GRAPH_TOPICS = (SNAPSHOT_TOPIC, DELTA_TOPIC)
+RECONNECT_DELAY = 2.0
+graph_publisher = GraphPublisher(GRAPH_SNAPSHOT_INTERVAL)
+graph_view = GraphView()
 
 STATE_FILE = "neighborhood_state.json"
 
-# --- MQTT Logic ---
-def on_connect(client, userdata, flags, rc):
-    print('Connected to MQTT broker')
-    client.subscribe(POSITION_TOPIC)
 
-def on_message(client, userdata, msg):
-    topic = msg.topic
-    payload = msg.payload.decode()
+class Outbox:
+    """Synchronous publish() front for the async MQTT client.
+
+    Neighborhood code runs as plain functions on the event loop and queues its
+    messages here; send() drains them to the broker in order. A robot's
+    neighbor list only matters in its latest version, so a newer list replaces
+    an unsent one in its queue position and the lists never back up beyond one
+    per robot. Graph snapshots and deltas form a chain and are sent unchanged
+    and in order, except that a new snapshot supersedes every graph message
+    still queued, which bounds them to one snapshot interval. A message whose
+    send is interrupted goes back to the front, unless a newer list for its
+    topic arrived meanwhile.
+    """
+
+    def __init__(self):
+        # Neighbor list topic, or a sequence number for graph messages -> (topic, payload, qos), oldest first
+        self.pending = OrderedDict()
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+
+    def publish(self, topic, payload, qos=0):
+        if topic == SNAPSHOT_TOPIC:
+            for key in [key for key, (queued, _, _) in self.pending.items() if queued in GRAPH_TOPICS]:
+                del self.pending[key]
+        key = next(self._sequence) if topic in GRAPH_TOPICS else topic
+        self.pending[key] = (topic, payload, qos)
+        self._ready.set()
+
+    async def send(self, client):
+        while True:
+            if not self.pending:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            key, (topic, payload, qos) = self.pending.popitem(last=False)
+            try:
+                await client.publish(topic, payload, qos=qos)
+            except (asyncio.CancelledError, aiomqtt.MqttError):
+                # Keep the in-flight message for the next connection
+                if key not in self.pending:
+                    self.pending[key] = (topic, payload, qos)
+                    self.pending.move_to_end(key, last=False)
+                raise
+
+
+# --- MQTT Logic ---
+def on_message(client, topic, payload):
+    """Handle one position message; client is anything with a publish(topic, payload) method."""
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode()
     # Extract robot id from topic
     try:
         robot_id = topic.split('/')[1]
         position = json.loads(payload)
+        metrics.MESSAGES_RECEIVED.inc()
+        # Validate before touching any state, so a bad message cannot leave a robot half registered
+        x = float(position['x'])
+        y = float(position['y'])
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError(f'non-finite position ({x}, {y})')
+        timestamp = position.get('timestamp')
+        if timestamp is not None and (isinstance(timestamp, bool) or not isinstance(timestamp, (int, float))):
+            raise ValueError(f'invalid timestamp {timestamp!r}')
+        if timestamp is not None:
+            metrics.MESSAGE_AGE.observe(time.time() - timestamp)
+        position['x'], position['y'] = x, y
         robot_positions[robot_id] = position
+        spatial_index.update(robot_id, x, y)
+        last_seen[robot_id] = time.monotonic()
+        last_seen.move_to_end(robot_id)
         # Track update count
         update_counter[robot_id] = update_counter.get(robot_id, 0) + 1
-        compute_and_publish_neighbors(client, robot_id)
+        # In tick mode the tick task computes neighborhoods for everyone
+        if TICK_RATE <= 0:
+            with metrics.MESSAGE_COMPUTE_LATENCY.time():
+                compute_and_publish_neighbors(client, robot_id)
     except Exception as e:
         print(f'Error processing message: {e}')
 
 def compute_and_publish_neighbors(client, robot_id):
-    global neighborhood_type, radius_value
     pos1 = robot_positions.get(robot_id)
     if pos1 is None:
         return
@@ -52,74 +145,278 @@ def compute_and_publish_neighbors(client, robot_id):
     if neighborhood_type == 'FULL':
         neighbors = [int(id2) for id2 in robot_positions if id2 != robot_id]
     elif neighborhood_type == 'RADIUS':
-        for id2, pos2 in robot_positions.items():
-            if robot_id == id2:
-                continue
-            dist = ((pos1['x']-pos2['x'])**2 + (pos1['y']-pos2['y'])**2)**0.5
-            if dist <= radius_value:
+        for id2 in spatial_index.query(pos1['x'], pos1['y'], radius_value):
+            if robot_id != id2:
                 neighbors.append(int(id2))
-    # Only publish if changed or after 10 updates
+    elif neighborhood_type in ('KNN', 'GABRIEL'):
+        ids, int_ids, xy = position_array(robot_positions)
+        row = [ids.index(robot_id)]
+        if neighborhood_type == 'KNN':
+            neighbor_indexes = knn_neighbors(xy, k_value, rows=row)[0]
+        else:
+            neighbor_indexes = gabriel_neighbors(xy, GABRIEL_CANDIDATES, rows=row)[0]
+        neighbors = [int_ids[j] for j in neighbor_indexes]
     neighbors_sorted = sorted(neighbors)
+    current_neighbors[robot_id] = neighbors_sorted
+    if NEIGHBOR_OUTPUT == 'graph':
+        return
+    # Only publish if changed or after 10 updates
     last_sent = last_neighbors_sent.get(robot_id)
     count = update_counter.get(robot_id, 0)
     if neighbors_sorted != last_sent or count >= 10:
         topic = NEIGHBORS_TOPIC.format(robot_id)
         client.publish(topic, json.dumps(neighbors_sorted))
+        metrics.NEIGHBORS_PUBLISHED.inc()
         last_neighbors_sent[robot_id] = neighbors_sorted
         update_counter[robot_id] = 0
 
-mqtt_client = mqtt.Client()
-mqtt_client.on_connect = on_connect
-mqtt_client.on_message = on_message
+def position_array(positions):
+    """Robot ids sorted numerically, the same ids as ints, and their positions as an (n, 2) array."""
+    ids = sorted(positions, key=int)
+    int_ids = [int(robot_id) for robot_id in ids]
+    xy = np.array([(positions[robot_id]['x'], positions[robot_id]['y']) for robot_id in ids], dtype=np.float64)
+    return ids, int_ids, xy.reshape(-1, 2)
+
+def compute_all_neighbors(positions):
+    """Compute the neighborhood of every robot in one batched pass.
 
-def mqtt_thread():
-    mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    mqtt_client.loop_forever()
+    Returns a robot_id -> sorted list of neighbor ids mapping.
+    """
+    ids, int_ids, xy = position_array(positions)
+    if neighborhood_type in ('RADIUS', 'KNN', 'GABRIEL'):
+        if neighborhood_type == 'RADIUS':
+            neighborhoods = radius_neighbors(xy, radius_value)
+        elif neighborhood_type == 'KNN':
+            neighborhoods = knn_neighbors(xy, k_value)
+        else:
+            neighborhoods = gabriel_neighbors(xy, GABRIEL_CANDIDATES)
+        return {
+            robot_id: [int_ids[j] for j in neighbor_indexes]
+            for robot_id, neighbor_indexes in zip(ids, neighborhoods, strict=True)
+        }
+    if neighborhood_type == 'FULL':
+        return {robot_id: int_ids[:i] + int_ids[i + 1:] for i, robot_id in enumerate(ids)}
+    return {robot_id: [] for robot_id in ids}
 
-# --- Flask HTTP Endpoint ---
+def publish_changed_neighbors(client, neighborhoods):
+    """Publish only the neighbor lists that differ from the last one sent."""
+    for robot_id, neighbors in neighborhoods.items():
+        # Skip robots evicted since the snapshot was taken
+        if robot_id not in robot_positions:
+            continue
+        current_neighbors[robot_id] = neighbors
+        if NEIGHBOR_OUTPUT == 'graph':
+            continue
+        if neighbors != last_neighbors_sent.get(robot_id):
+            client.publish(NEIGHBORS_TOPIC.format(robot_id), json.dumps(neighbors))
+            metrics.NEIGHBORS_PUBLISHED.inc()
+            last_neighbors_sent[robot_id] = neighbors
+            update_counter[robot_id] = 0
+
+async def tick_loop(client):
+    """Recompute all neighborhoods at TICK_RATE."""
+    period = 1.0 / TICK_RATE
+    while True:
+        started = time.monotonic()
+        try:
+            with metrics.TICK_COMPUTE_LATENCY.time():
+                publish_changed_neighbors(client, compute_all_neighbors(robot_positions))
+                if NEIGHBOR_OUTPUT != 'lists':
+                    graph_publisher.flush(client, current_neighbors, neighborhood_type)
+        except Exception as e:
+            print(f'Error computing neighborhoods: {e}')
+        await asyncio.sleep(max(0.0, period - (time.monotonic() - started)))
+
+async def graph_loop(client):
+    """Publish the neighbor graph changes accumulated by per-message computation at GRAPH_RATE."""
+    period = 1.0 / GRAPH_RATE
+    while True:
+        try:
+            graph_publisher.flush(client, current_neighbors, neighborhood_type)
+        except Exception as e:
+            print(f'Error publishing neighbor graph: {e}')
+        await asyncio.sleep(period)
+
+async def graph_view_loop():
+    """Rebuild the HTTP graph snapshot at GRAPH_VIEW_RATE, whenever positions or neighborhoods changed."""
+    period = 1.0 / GRAPH_VIEW_RATE
+    while True:
+        try:
+            graph_view.update(robot_positions, current_neighbors, neighborhood_type)
+        except Exception as e:
+            print(f'Error updating graph view: {e}')
+        await asyncio.sleep(period)
+
+def rebuild_spatial_index():
+    """Rebuild the grid so its cell size matches the current radius."""
+    global spatial_index
+    spatial_index = GridIndex.from_positions(radius_value, robot_positions)
+
+async def mqtt_loop(outbox):
+    """Receive positions and send queued neighbor lists, reconnecting when the broker goes away."""
+    while True:
+        try:
+            async with aiomqtt.Client(MQTT_BROKER, MQTT_PORT, keepalive=60) as client:
+                print('Connected to MQTT broker')
+                await client.subscribe(POSITION_TOPIC)
+                sender = asyncio.create_task(outbox.send(client))
+                try:
+                    async for message in client.messages:
+                        on_message(outbox, message.topic.value, message.payload)
+                finally:
+                    sender.cancel()
+        except aiomqtt.MqttError as e:
+            print(f'MQTT connection lost ({e}), reconnecting in {RECONNECT_DELAY}s')
+            await asyncio.sleep(RECONNECT_DELAY)
+
+# --- HTTP Endpoint ---
+routes = web.RouteTableDef()
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status)
+
+def parse_radius(value):
+    """Radius from a request, raising ValueError unless it is a positive finite number."""
+    radius = float(value)
+    if not (math.isfinite(radius) and radius > 0):
+        raise ValueError(f'radius must be positive, got {value!r}')
+    return radius
 
 # Set neighborhood type and radius via HTTP
-@app.route('/neighborhood', methods=['GET', 'POST'])
-def neighborhood():
-    global neighborhood_type, radius_value
+@routes.route('*', '/neighborhood')
+async def neighborhood(request):
+    global neighborhood_type, radius_value, k_value
     if request.method == 'POST':
-        data = request.get_json()
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            data = None
         if not data or 'type' not in data:
-            return jsonify({'error': 'Missing type'}), 400
-        neighborhood_type = data['type']
+            return json_response({'error': 'Missing type'}, 400)
+        if data['type'] not in NEIGHBORHOOD_TYPES:
+            return json_response({'error': f"Unknown type, expected one of {', '.join(NEIGHBORHOOD_TYPES)}"}, 400)
+        radius = radius_value
         if 'radius' in data:
             try:
-                radius_value = float(data['radius'])
+                radius = parse_radius(data['radius'])
             except Exception:
-                return jsonify({'error': 'Invalid radius value'}), 400
-        save_state()  # <-- Add this
-        return jsonify({'status': 'ok', 'type': neighborhood_type, 'radius': radius_value})
-    else:  # GET
-        return jsonify({'type': neighborhood_type, 'radius': radius_value})
+                return json_response({'error': 'Invalid radius value'}, 400)
+        k = k_value
+        if 'k' in data:
+            try:
+                k = int(data['k'])
+            except Exception:
+                k = 0
+            if k < 1:
+                return json_response({'error': 'Invalid k value'}, 400)
+        neighborhood_type, radius_value, k_value = data['type'], radius, k
+        rebuild_spatial_index()
+        save_state()
+        return json_response({'status': 'ok', 'type': neighborhood_type, 'radius': radius_value, 'k': k_value})
+    if request.method == 'GET':
+        return json_response({'type': neighborhood_type, 'radius': radius_value, 'k': k_value})
+    raise web.HTTPMethodNotAllowed(request.method, ['GET', 'POST'])
+
+
+# Prometheus metrics
+@routes.get('/metrics')
+async def prometheus_metrics(request):
+    return web.Response(body=generate_latest(), headers={'Content-Type': CONTENT_TYPE_LATEST})
+
+
+# Graph snapshot, cached per version; conditional requests with the ETag get 304 while unchanged
+@routes.get('/graph')
+async def graph_snapshot(request):
+    headers = {'ETag': graph_view.etag, 'Cache-Control': 'no-cache'}
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        if graph_view.etag in tags or '*' in tags:
+            metrics.GRAPH_HTTP_REQUESTS.labels('304').inc()
+            return web.Response(status=304, headers=headers)
+    metrics.GRAPH_HTTP_REQUESTS.labels('200').inc()
+    return web.Response(body=graph_view.snapshot, content_type='application/json', headers=headers)
+
+
+# Graph changes as server-sent events: a snapshot first, then one delta per version
+@routes.get('/graph/stream')
+async def graph_stream(request):
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'Access-Control-Allow-Origin': '*',
+    })
+    await response.prepare(request)
+    queue = graph_view.subscribe()
+    metrics.GRAPH_STREAM_CLIENTS.inc()
+    try:
+        # A client reconnecting at the current version does not need the snapshot again
+        if request.headers.get('Last-Event-ID') != graph_view.event_id:
+            await response.write(graph_view.snapshot_event())
+        while not graph_view.closed:
+            try:
+                event = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE)
+            except TimeoutError:
+                await response.write(b': keep-alive\n\n')
+                continue
+            if graph_view.closed:
+                break
+            if event is None:
+                # The resync snapshot already contains every event still queued
+                while not queue.empty():
+                    queue.get_nowait()
+                event = graph_view.snapshot_event()
+            await response.write(event)
+    except ConnectionResetError:
+        pass
+    finally:
+        graph_view.unsubscribe(queue)
+        metrics.GRAPH_STREAM_CLIENTS.dec()
+    return response
 
 
 # Default page: show current neighborhood type and radius
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    global neighborhood_type, radius_value
+@routes.route('*', '/')
+async def index(request):
+    global neighborhood_type, radius_value, k_value
+    if request.method not in ('GET', 'POST'):
+        raise web.HTTPMethodNotAllowed(request.method, ['GET', 'POST'])
     message = ""
     if request.method == 'POST':
-        ntype = request.form.get('type')
-        radius = request.form.get('radius')
-        if ntype:
+        form = await request.post()
+        ntype = form.get('type')
+        radius = form.get('radius')
+        k = form.get('k')
+        if ntype and ntype not in NEIGHBORHOOD_TYPES:
+            message = f"Unknown neighborhood type {ntype}!"
+        elif ntype:
             neighborhood_type = ntype
             if ntype == "RADIUS" and radius:
                 try:
-                    radius_value = float(radius)
+                    radius_value = parse_radius(radius)
                 except Exception:
                     message = "Invalid radius value!"
-            message = f"Neighborhood set to {neighborhood_type} (radius={radius_value})"
-            save_state()  # <-- Add this
+            if ntype == "KNN" and k:
+                try:
+                    k_value = max(1, int(k))
+                except Exception:
+                    message = "Invalid k value!"
+            message = f"Neighborhood set to {neighborhood_type} (radius={radius_value}, k={k_value})"
+            rebuild_spatial_index()
+            save_state()
+        elif k is not None and neighborhood_type == "KNN":
+            try:
+                k_value = max(1, int(k))
+                message = f"k updated to {k_value}"
+                save_state()
+            except Exception:
+                message = "Invalid k value!"
         elif radius is not None and neighborhood_type == "RADIUS":
             try:
-                radius_value = float(radius)
+                radius_value = parse_radius(radius)
                 message = f"Radius updated to {radius_value}"
-                save_state()  # <-- Add this
+                rebuild_spatial_index()
+                save_state()
             except Exception:
                 message = "Invalid radius value!"
 
@@ -148,41 +445,178 @@ def index():
             <button type="submit">Update Radius</button>
         </form>
         """
+    if neighborhood_type != "KNN":
+        # Show input and button to switch to KNN
+        form_html += f"""
+        <form method="post">
+            <input type="number" step="1" min="1" name="k" value="{k_value}" />
+            <button name="type" value="KNN" type="submit">Set KNN Neighborhood</button>
+        </form>
+        """
+    if neighborhood_type == "KNN":
+        # Show input and button to update k only
+        form_html += f"""
+        <form method="post">
+            <input type="number" step="1" min="1" name="k" value="{k_value}" />
+            <button type="submit">Update k</button>
+        </form>
+        """
+    if neighborhood_type != "GABRIEL":
+        # Show button to switch to GABRIEL
+        form_html += """
+        <form method="post">
+            <button name="type" value="GABRIEL" type="submit">Set GABRIEL Neighborhood</button>
+        </form>
+        """
 
     html = f"""
     <h2>Neighborhood System</h2>
     <p>Type: <b>{neighborhood_type}</b></p>
     <p>Radius: <b>{radius_value}</b></p>
+    <p>k: <b>{k_value}</b></p>
     {form_html}
     <p style="color: red;">{message}</p>
     """
-    return html, 200
+    return web.Response(text=html, content_type='text/html')
+
+@web.middleware
+async def cors(request, handler):
+    """Allow any origin, like flask_cors did, so the dashboard can call the API."""
+    if request.method == 'OPTIONS':
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', 'Content-Type'
+        )
+    else:
+        response = await handler(request)
+    # Streamed responses set their headers before they started sending
+    if not response.prepared:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+async def close_streams(app):
+    graph_view.close()
+
+def create_app():
+    app = web.Application(middlewares=[cors])
+    app.add_routes(routes)
+    app.on_shutdown.append(close_streams)
+    return app
+
+def evict_stale_robots(client, now=None):
+    """Forget robots not seen for ROBOT_TTL seconds, clear their own lists and republish those they were part of."""
+    if now is None:
+        now = time.monotonic()
+    evicted = set()
+    while last_seen:
+        robot_id, seen = next(iter(last_seen.items()))
+        if now - seen < ROBOT_TTL:
+            break
+        last_seen.popitem(last=False)
+        robot_positions.pop(robot_id, None)
+        if last_neighbors_sent.pop(robot_id, None):
+            # Subscribers keep the last list they got, so tell them the robot has no neighbors anymore
+            client.publish(NEIGHBORS_TOPIC.format(robot_id), json.dumps([]))
+            metrics.NEIGHBORS_PUBLISHED.inc()
+        current_neighbors.pop(robot_id, None)
+        update_counter.pop(robot_id, None)
+        spatial_index.remove(robot_id)
+        evicted.add(int(robot_id))
+        metrics.ROBOTS_EVICTED.inc()
+    if not evicted:
+        return evicted
+    affected = [
+        robot_id for robot_id, neighbors in current_neighbors.items()
+        if not evicted.isdisjoint(neighbors)
+    ]
+    for robot_id in affected:
+        compute_and_publish_neighbors(client, robot_id)
+    return evicted
 
-def clean_up():
+async def clean_up(client):
     while True:
-        robot_positions = {}
-        last_neighbors_sent = {}
-        update_counter = {}
-        time.sleep(1)
+        try:
+            evict_stale_robots(client)
+        except Exception as e:
+            print(f'Error evicting stale robots: {e}')
+        await asyncio.sleep(min(1.0, ROBOT_TTL / 2))
+
+# --- State persistence ---
+_save_task = None
+_save_pending = False
+
+def write_state(state):
+    """Atomically replace STATE_FILE with state (runs on a worker thread)."""
+    path = Path(STATE_FILE)
+    tmp = path.with_name(path.name + '.tmp')
+    with tmp.open('w') as f:
+        json.dump(state, f)
+    tmp.replace(path)
+
+async def _save_worker():
+    global _save_pending, _save_task
+    try:
+        # Changes made while a write is in flight are coalesced into one more write
+        while _save_pending:
+            _save_pending = False
+            state = {"type": neighborhood_type, "radius": radius_value, "k": k_value}
+            try:
+                await asyncio.to_thread(write_state, state)
+            except OSError as e:
+                print(f'Error saving state: {e}')
+    finally:
+        _save_task = None
 
 def save_state():
-    with open(STATE_FILE, "w") as f:
-        json.dump({"type": neighborhood_type, "radius": radius_value}, f)
+    """Persist the settings without blocking the event loop (writes synchronously outside of it)."""
+    global _save_pending, _save_task
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        write_state({"type": neighborhood_type, "radius": radius_value, "k": k_value})
+        return
+    _save_pending = True
+    if _save_task is None:
+        _save_task = asyncio.create_task(_save_worker())
 
 def load_state():
-    global neighborhood_type, radius_value
+    global neighborhood_type, radius_value, k_value
     try:
-        with open(STATE_FILE, "r") as f:
+        with Path(STATE_FILE).open() as f:
             data = json.load(f)
             neighborhood_type = data.get("type", "FULL")
             radius_value = data.get("radius", 1.0)
+            k_value = data.get("k", 6)
     except Exception:
         pass
+    rebuild_spatial_index()
 
 # Call load_state() at startup
 load_state()
 
+async def serve():
+    """Run the HTTP API, the MQTT client and the periodic tasks on one event loop."""
+    outbox = Outbox()
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', HTTP_PORT).start()
+    print(f'HTTP API listening on port {HTTP_PORT}')
+    tasks = [
+        asyncio.create_task(mqtt_loop(outbox)),
+        asyncio.create_task(clean_up(outbox)),
+        asyncio.create_task(graph_view_loop()),
+    ]
+    if TICK_RATE > 0:
+        tasks.append(asyncio.create_task(tick_loop(outbox)))
+    elif NEIGHBOR_OUTPUT != 'lists':
+        tasks.append(asyncio.create_task(graph_loop(outbox)))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await runner.cleanup()
+
 if __name__ == '__main__':
-    threading.Thread(target=mqtt_thread, daemon=True).start()
-    threading.Thread(target=clean_up, daemon=True).start()
-    app.run(host='0.0.0.0', port=5000)
+    asyncio.run(serve())
@@ -0,0 +1,34 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+MESSAGE_AGE = Histogram(
+    'neighborhood_position_age_seconds',
+    'Age of a position message on arrival, measured from the detector capture timestamp',
+    buckets=LATENCY_BUCKETS,
+)
+COMPUTE_LATENCY = Histogram(
+    'neighborhood_compute_seconds',
+    'Time spent computing and publishing neighborhoods, per message or per tick',
+    ['trigger'],
+    buckets=LATENCY_BUCKETS,
+)
+MESSAGES_RECEIVED = Counter('neighborhood_position_messages_total', 'Position messages received')
+NEIGHBORS_PUBLISHED = Counter('neighborhood_neighbor_messages_total', 'Neighbor lists published')
+GRAPH_MESSAGES_PUBLISHED = Counter(
+    'neighborhood_graph_messages_total', 'Neighbor graph messages published', ['kind']
+)
+GRAPH_VIEW_SNAPSHOTS_BUILT = Counter(
+    'neighborhood_graph_view_snapshots_total', 'Graph snapshots serialized for the HTTP API (one per change)'
+)
+GRAPH_HTTP_REQUESTS = Counter(
+    'neighborhood_graph_http_requests_total', 'Graph snapshot requests, by response status', ['status']
+)
+GRAPH_STREAM_CLIENTS = Gauge('neighborhood_graph_stream_clients', 'Connected graph event stream clients')
+ROBOTS_EVICTED = Counter('neighborhood_robots_evicted_total', 'Robots dropped after ROBOT_TTL without updates')
+ROBOTS_TRACKED = Gauge('neighborhood_robots_tracked', 'Robots currently known to the service')
+
+MESSAGE_COMPUTE_LATENCY = COMPUTE_LATENCY.labels('message')
+TICK_COMPUTE_LATENCY = COMPUTE_LATENCY.labels('tick')
+GRAPH_SNAPSHOTS_PUBLISHED = GRAPH_MESSAGES_PUBLISHED.labels('snapshot')
+GRAPH_DELTAS_PUBLISHED = GRAPH_MESSAGES_PUBLISHED.labels('delta')
@@ -0,0 +1,214 @@
+import math
+
+import numpy as np
+
+
+class GridIndex:
+    """Uniform grid hash over robot positions for radius queries.
+
+    The cell size equals the query radius, so a radius query only has to look at
+    the 3x3 block of cells around the query point. Updates move a robot between
+    cells in place.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.cells = {}      # (cx, cy) -> {robot_id: (x, y)}
+        self.locations = {}  # robot_id -> (cx, cy)
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def update(self, robot_id, x, y):
+        cell = self._cell(x, y)
+        old_cell = self.locations.get(robot_id)
+        if old_cell is not None and old_cell != cell:
+            bucket = self.cells[old_cell]
+            del bucket[robot_id]
+            if not bucket:
+                del self.cells[old_cell]
+        self.cells.setdefault(cell, {})[robot_id] = (x, y)
+        self.locations[robot_id] = cell
+
+    def remove(self, robot_id):
+        cell = self.locations.pop(robot_id, None)
+        if cell is None:
+            return
+        bucket = self.cells[cell]
+        del bucket[robot_id]
+        if not bucket:
+            del self.cells[cell]
+
+    def query(self, x, y, radius):
+        """Return the ids of all robots within radius of (x, y)."""
+        if radius < 0:
+            return []
+        reach = max(1, math.ceil(radius / self.cell_size))
+        cx, cy = self._cell(x, y)
+        radius_sq = radius * radius
+        found = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                bucket = self.cells.get((gx, gy))
+                if not bucket:
+                    continue
+                for robot_id, (px, py) in bucket.items():
+                    if (px - x) ** 2 + (py - y) ** 2 <= radius_sq:
+                        found.append(robot_id)
+        return found
+
+    def __len__(self):
+        return len(self.locations)
+
+    @classmethod
+    def from_positions(cls, cell_size, positions):
+        """Build an index from a robot_id -> {'x': ..., 'y': ...} mapping."""
+        index = cls(cell_size)
+        for robot_id, position in positions.items():
+            index.update(robot_id, position['x'], position['y'])
+        return index
+
+
+def radius_neighbors(xy, radius, chunk_elements=1 << 22):
+    """
+    Compute every robot's radius neighborhood with vectorized pairwise distances.
+
+    Rows are processed in chunks so the distance matrix never exceeds
+    chunk_elements entries, which keeps memory bounded for large swarms.
+
+    Args:
+        xy: Robot positions, shape (n, 2)
+        radius: Neighborhood radius
+        chunk_elements: Maximum number of pairwise distances held at once
+
+    Returns:
+        List of index arrays, the neighbors of each robot (excluding itself), in ascending order
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    count = len(xy)
+    # A negative radius contains nothing, not even coincident robots
+    radius_sq = radius * radius if radius >= 0 else -1.0
+    rows_per_chunk = max(1, chunk_elements // max(count, 1))
+    neighbors = []
+    for start in range(0, count, rows_per_chunk):
+        block = xy[start:start + rows_per_chunk]
+        diff_x = block[:, 0:1] - xy[:, 0]
+        diff_y = block[:, 1:2] - xy[:, 1]
+        within = diff_x * diff_x + diff_y * diff_y <= radius_sq
+        # A robot is not its own neighbor
+        within[np.arange(len(block)), np.arange(start, start + len(block))] = False
+        neighbors.extend(np.flatnonzero(row) for row in within)
+    return neighbors
+
+
+def _nearest(xy, k, rows, chunk_elements):
+    """
+    Yield (row indexes, neighbor indexes, squared distances) for chunks of rows.
+
+    Neighbor indexes and distances have shape (c, k) and are sorted by distance.
+    """
+    count = len(xy)
+    rows_per_chunk = max(1, chunk_elements // max(count, 1))
+    for start in range(0, len(rows), rows_per_chunk):
+        chunk = rows[start:start + rows_per_chunk]
+        block = xy[chunk]
+        diff_x = block[:, 0:1] - xy[:, 0]
+        diff_y = block[:, 1:2] - xy[:, 1]
+        dist_sq = diff_x * diff_x + diff_y * diff_y
+        # A robot is not its own neighbor
+        dist_sq[np.arange(len(chunk)), chunk] = np.inf
+        nearest = np.argpartition(dist_sq, k - 1, axis=1)[:, :k] if k < count else np.argsort(dist_sq, axis=1)[:, :k]
+        nearest_sq = np.take_along_axis(dist_sq, nearest, axis=1)
+        order = np.argsort(nearest_sq, axis=1, kind='stable')
+        yield chunk, np.take_along_axis(nearest, order, axis=1), np.take_along_axis(nearest_sq, order, axis=1)
+
+
+def knn_neighbors(xy, k, rows=None, chunk_elements=1 << 22):
+    """
+    Compute the k nearest neighbors of every robot (or of the given rows only).
+
+    The relation is not symmetric: j being one of i's k nearest does not make
+    i one of j's.
+
+    Args:
+        xy: Robot positions, shape (n, 2)
+        k: Neighbors per robot, capped at n - 1
+        rows: Indexes of the robots to compute, all robots when None
+        chunk_elements: Maximum number of pairwise distances held at once
+
+    Returns:
+        List of index arrays, the neighbors of each requested robot, in ascending order
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    rows = np.arange(len(xy)) if rows is None else np.asarray(rows, dtype=np.intp)
+    k = min(int(k), len(xy) - 1)
+    if k <= 0:
+        return [np.empty(0, dtype=np.intp) for _ in rows]
+    neighbors = []
+    for _, nearest, _ in _nearest(xy, k, rows, chunk_elements):
+        neighbors.extend(np.sort(nearest, axis=1))
+    return neighbors
+
+
+def _gabriel_candidates(xy, k, rows, chunk_elements):
+    """Gabriel neighbors of each of rows among its k nearest robots, as sorted index arrays."""
+    neighbors = []
+    # Keep the (c, k, k) candidate distance block within the same memory budget
+    chunk_elements = max(len(xy), chunk_elements // max(k, 1))
+    for _, nearest, nearest_sq in _nearest(xy, k, rows, chunk_elements):
+        points = xy[nearest]  # (c, k, 2)
+        between = points[:, :, None, :] - points[:, None, :, :]
+        between_sq = (between * between).sum(axis=3)  # (c, k, k), candidate to candidate
+        # Candidate a is blocked when some witness b has |ib|^2 + |ab|^2 < |ia|^2
+        blocked = (nearest_sq[:, None, :] + between_sq < nearest_sq[:, :, None]).any(axis=2)
+        neighbors.extend(np.sort(row[~row_blocked]) for row, row_blocked in zip(nearest, blocked, strict=True))
+    return neighbors
+
+
+def gabriel_neighbors(xy, candidates=16, rows=None, chunk_elements=1 << 22):
+    """
+    Compute every robot's neighbors in the Gabriel graph, limited to mutual nearest candidates.
+
+    Robots i and j are Gabriel neighbors when no other robot lies inside the
+    circle whose diameter is the segment ij, i.e. no w with
+    |iw|^2 + |jw|^2 < |ij|^2. Such a w is always closer to i than j is, so testing
+    each of i's nearest candidates against the closer ones is exact. An edge is
+    kept only when each robot is among the other's candidates, so the graph is
+    symmetric (the same from either end, and the same whether computed for all
+    robots or for some rows) and candidates bounds the degree. The resulting
+    graph is a planar subgraph of the Gabriel graph and keeps the swarm
+    connected as long as no longer edge is needed.
+
+    Args:
+        xy: Robot positions, shape (n, 2)
+        candidates: Nearest robots considered per robot, i.e. the maximum degree
+        rows: Indexes of the robots to compute, all robots when None
+        chunk_elements: Maximum number of pairwise distances held at once
+
+    Returns:
+        List of index arrays, the neighbors of each requested robot, in ascending order
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    count = len(xy)
+    all_rows = rows is None
+    rows = np.arange(count) if all_rows else np.asarray(rows, dtype=np.intp)
+    k = min(int(candidates), count - 1)
+    if k <= 0 or len(rows) == 0:
+        return [np.empty(0, dtype=np.intp) for _ in rows]
+    found = _gabriel_candidates(xy, k, rows, chunk_elements)
+    lengths = np.array([len(row) for row in found])
+    targets = np.concatenate(found)
+    if all_rows:
+        other_rows, other_found = rows, found
+    else:
+        # The far ends of the edges found, to check that they found the rows too
+        other_rows = np.unique(targets)
+        other_found = _gabriel_candidates(xy, k, other_rows, chunk_elements) if len(other_rows) else []
+    other_lengths = np.array([len(row) for row in other_found], dtype=np.intp)
+    other_edges = np.repeat(other_rows, other_lengths) * count
+    if len(other_edges):
+        other_edges += np.concatenate(other_found)
+    # Keep i -> j only when j -> i was found as well
+    mutual = np.isin(targets * count + np.repeat(rows, lengths), other_edges)
+    bounds = np.cumsum(lengths)[:-1]
+    return [row[keep] for row, keep in zip(np.split(targets, bounds), np.split(mutual, bounds), strict=True)]
@@ -0,0 +1,137 @@
+import json
+import random
+
+from graph import DELTA_TOPIC, SNAPSHOT_TOPIC, GraphPublisher, GraphView, apply_message, diff_graphs
+
+
+class RecordingClient:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload, qos=0):
+        self.messages.append((topic, json.loads(payload)))
+
+
+def random_graph(rng, robots=12):
+    present = [robot_id for robot_id in range(robots) if rng.random() < 0.8]
+    return {robot_id: [neighbor for neighbor in present if neighbor != robot_id and rng.random() < 0.3]
+            for robot_id in present}
+
+
+def position(x, y, orientation=0.0):
+    return {'x': x, 'y': y, 'orientation': orientation}
+
+
+def test_graph_view_versions_only_on_change():
+    view = GraphView()
+    positions = {1: position(0.1, 0.2), 2: position(0.4, 0.2)}
+
+    assert view.update(positions, {1: [2], 2: [1]}, 'RADIUS')
+    assert not view.update({1: position(0.1001, 0.2), 2: position(0.4, 0.2)}, {1: [2], 2: [1]}, 'RADIUS')
+    assert view.version == 1
+
+    snapshot = json.loads(view.snapshot)
+    assert snapshot['epoch'] == view.epoch
+    assert snapshot['version'] == 1
+    assert snapshot['neighbors'] == {'1': [2], '2': [1]}
+    assert snapshot['positions']['2'] == {'x': 0.4, 'y': 0.2, 'orientation': 0.0}
+
+
+def test_graph_view_ids_differ_across_restarts():
+    before = GraphView()
+    after = GraphView()
+
+    assert before.version == after.version == 0
+    assert before.etag != after.etag
+    assert before.etag == f'"{before.epoch}-0"'
+    assert before.snapshot_event().startswith(f'id: {before.epoch}-0\nevent: snapshot\n'.encode())
+
+
+def test_graph_view_queues_delta_events():
+    view = GraphView()
+    queue = view.subscribe()
+
+    view.update({1: position(0.1, 0.2), 2: position(0.4, 0.2)}, {1: [2], 2: [1]}, 'RADIUS')
+    view.update({1: position(0.1, 0.2), 2: position(0.9, 0.2)}, {1: [], 2: []}, 'RADIUS')
+
+    first = queue.get_nowait()
+    assert first.startswith(f'id: {view.epoch}-1\nevent: delta\n'.encode())
+    delta = json.loads(queue.get_nowait().split(b'data: ', 1)[1])
+    assert delta['version'] == 2
+    assert delta['base'] == 1
+    assert delta['removed'] == [[1, 2], [2, 1]]
+    assert list(delta['positions']) == ['2']
+
+
+def test_diff_graphs():
+    before = {1: frozenset({2, 3}), 2: frozenset({1}), 3: frozenset({1})}
+    after = {1: frozenset({2, 4}), 2: frozenset({1}), 4: frozenset({1})}
+
+    added, removed, robots_added, robots_removed = diff_graphs(before, after)
+
+    assert added == [[1, 4], [4, 1]]
+    assert removed == [[1, 3], [3, 1]]
+    assert robots_added == [4]
+    assert robots_removed == [3]
+    assert diff_graphs(after, after) == ([], [], [], [])
+
+
+def test_consumer_follows_published_graph():
+    rng = random.Random(0)
+    client = RecordingClient()
+    publisher = GraphPublisher(snapshot_interval=10.0)
+    graph, version = {}, None
+
+    for step in range(50):
+        neighborhoods = random_graph(rng)
+        publisher.flush(client, neighborhoods, 'RADIUS', now=float(step))
+        for _, message in client.messages:
+            version = apply_message(graph, version, message)
+        client.messages.clear()
+
+        assert version == publisher.version
+        assert graph == {robot_id: set(neighbors) for robot_id, neighbors in neighborhoods.items()}
+
+
+def test_publisher_sends_snapshots_then_deltas():
+    client = RecordingClient()
+    publisher = GraphPublisher(snapshot_interval=5.0)
+
+    assert publisher.flush(client, {1: [2], 2: [1]}, 'RADIUS', now=0.0) == 'snapshot'
+    assert publisher.flush(client, {1: [2], 2: [1]}, 'RADIUS', now=1.0) is None
+    assert publisher.flush(client, {1: [], 2: []}, 'RADIUS', now=2.0) == 'delta'
+    assert publisher.flush(client, {1: [], 2: []}, 'RADIUS', now=5.0) == 'snapshot'
+
+    assert [topic for topic, _ in client.messages] == [SNAPSHOT_TOPIC, DELTA_TOPIC, SNAPSHOT_TOPIC]
+    assert [message['version'] for _, message in client.messages] == [1, 2, 3]
+    assert client.messages[1][1]['base'] == 1
+
+
+def test_consumer_waits_for_snapshot_after_missed_delta():
+    client = RecordingClient()
+    publisher = GraphPublisher(snapshot_interval=5.0)
+    publisher.flush(client, {1: [2], 2: [1]}, now=0.0)
+    publisher.flush(client, {1: [], 2: []}, now=1.0)
+    publisher.flush(client, {1: [2], 2: [1], 3: []}, now=2.0)
+    publisher.flush(client, {1: [2], 2: [1], 3: []}, now=5.0)
+    snapshot, _, delta, resync = (message for _, message in client.messages)
+    graph = {}
+
+    version = apply_message(graph, None, delta)
+    assert version is None
+    assert graph == {}
+
+    version = apply_message(graph, apply_message(graph, None, snapshot), delta)
+    assert version is None
+
+    assert apply_message(graph, version, resync) == 4
+    assert graph == {1: {2}, 2: {1}, 3: set()}
+
+
+def test_apply_delta_removes_robots():
+    graph = {1: {2, 3}, 2: {1}, 3: {1}}
+    delta = {'version': 8, 'base': 7, 'added': [], 'removed': [[1, 3], [3, 1]],
+             'robots_added': [], 'robots_removed': [3]}
+
+    assert apply_message(graph, 7, delta) == 8
+    assert graph == {1: {2}, 2: {1}}
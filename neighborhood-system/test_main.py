@@ -0,0 +1,231 @@
+import asyncio
+import json
+from collections import OrderedDict
+
+import main
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from graph import GraphView
+from spatial import GridIndex
+
+
+class RecordingClient:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload, qos=0):
+        self.messages.append((topic, json.loads(payload)))
+
+
+@pytest.fixture(autouse=True)
+def state(monkeypatch):
+    """Fresh service state in RADIUS mode, recomputing on every message."""
+    for name in ('robot_positions', 'last_neighbors_sent', 'update_counter', 'current_neighbors'):
+        monkeypatch.setattr(main, name, {})
+    monkeypatch.setattr(main, 'last_seen', OrderedDict())
+    monkeypatch.setattr(main, 'spatial_index', GridIndex(1.0))
+    monkeypatch.setattr(main, 'neighborhood_type', 'RADIUS')
+    monkeypatch.setattr(main, 'radius_value', 1.0)
+    monkeypatch.setattr(main, 'TICK_RATE', 0.0)
+    monkeypatch.setattr(main, 'graph_view', GraphView(max_queued=2))
+
+
+def send_position(client, robot_id, **position):
+    main.on_message(client, f'robots/{robot_id}/position', json.dumps(position).encode())
+
+
+@pytest.mark.parametrize('position', [
+    {'y': 1.0},
+    {'x': 'left', 'y': 1.0},
+    {'x': None, 'y': 1.0},
+    {'x': float('nan'), 'y': 1.0},
+    {'x': 0.5, 'y': 1.0, 'timestamp': '2025-01-01'},
+])
+def test_invalid_position_leaves_no_state(position):
+    client = RecordingClient()
+    send_position(client, 1, x=0.0, y=1.0)
+
+    send_position(client, 9, **position)
+
+    assert list(main.robot_positions) == ['1']
+    assert list(main.last_seen) == ['1']
+    assert len(main.spatial_index) == 1
+    assert main.compute_all_neighbors(main.robot_positions) == {'1': []}
+
+
+def test_position_message_updates_state_together():
+    client = RecordingClient()
+
+    send_position(client, 1, x=0.0, y=0.0, orientation=0.5, timestamp=1.0)
+    send_position(client, 2, x=0.5, y=0, orientation=0.0)
+
+    assert main.robot_positions['2'] == {'x': 0.5, 'y': 0.0, 'orientation': 0.0}
+    assert list(main.last_seen) == ['1', '2']
+    assert sorted(main.spatial_index.query(0.0, 0.0, 1.0)) == ['1', '2']
+    assert client.messages[-1] == ('robots/2/neighbors', [1])
+
+
+def serve(test):
+    """Run test(client) against the HTTP API with an aiohttp test client."""
+    async def run():
+        async with TestClient(TestServer(main.create_app())) as client:
+            return await test(client)
+
+    return asyncio.run(run())
+
+
+def update_graph(step):
+    """Create a new graph view version by moving robot 2."""
+    positions = {'1': {'x': 0.0, 'y': 0.0}, '2': {'x': 0.1 * step, 'y': 0.0}}
+    assert main.graph_view.update(positions, {'1': [2], '2': [1]}, 'RADIUS')
+
+
+async def read_event(response):
+    """Next server-sent event of response as a field -> value dict."""
+    raw = await asyncio.wait_for(response.content.readuntil(b'\n\n'), 5.0)
+    return dict(line.split(': ', 1) for line in raw.decode().strip().split('\n'))
+
+
+def test_graph_etag_returns_304_until_the_graph_changes():
+    update_graph(1)
+
+    async def test(client):
+        response = await client.get('/graph')
+        etag = response.headers['ETag']
+        assert response.status == 200
+        assert (await response.json())['version'] == 1
+        statuses = []
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*', f'"{GraphView().epoch}-1"'):
+            response = await client.get('/graph', headers={'If-None-Match': if_none_match})
+            statuses.append(response.status)
+            assert response.headers['ETag'] == etag
+        assert await response.read() != b''
+        update_graph(2)
+        response = await client.get('/graph', headers={'If-None-Match': etag})
+        return statuses, response.status, response.headers['ETag']
+
+    statuses, status, etag = serve(test)
+
+    # An ETag of another epoch never matches, even at the same version
+    assert statuses == [304, 304, 304, 304, 200]
+    assert status == 200
+    assert etag == main.graph_view.etag
+
+
+@pytest.mark.parametrize('last_event_id', [None, 'current', 'stale'])
+def test_graph_stream_skips_the_snapshot_already_seen(last_event_id):
+    update_graph(1)
+    headers = {
+        None: {},
+        'current': {'Last-Event-ID': main.graph_view.event_id},
+        'stale': {'Last-Event-ID': f'{GraphView().epoch}-1'},
+    }[last_event_id]
+
+    async def test(client):
+        response = await client.get('/graph/stream', headers=headers)
+        assert response.headers['Content-Type'] == 'text/event-stream'
+        if last_event_id != 'current':
+            snapshot = await read_event(response)
+            assert snapshot['event'] == 'snapshot'
+            assert snapshot['id'] == f'{main.graph_view.epoch}-1'
+        else:
+            # Wait until the stream is subscribed before changing the graph
+            while not main.graph_view.subscribers:
+                await asyncio.sleep(0.01)
+        update_graph(2)
+        delta = await read_event(response)
+        response.close()
+        return delta
+
+    delta = serve(test)
+
+    assert delta['event'] == 'delta'
+    assert delta['id'] == f'{main.graph_view.epoch}-2'
+    assert json.loads(delta['data'])['base'] == 1
+
+
+def test_graph_stream_resyncs_a_subscriber_that_falls_behind():
+    update_graph(1)
+
+    async def test(client):
+        response = await client.get('/graph/stream')
+        assert (await read_event(response))['event'] == 'snapshot'
+        # More versions than the subscriber queue holds, before the stream gets to run
+        for step in range(2, 6):
+            update_graph(step)
+        resync = await read_event(response)
+        update_graph(6)
+        delta = await read_event(response)
+        response.close()
+        return resync, delta
+
+    resync, delta = serve(test)
+
+    assert resync['event'] == 'snapshot'
+    assert resync['id'] == f'{main.graph_view.epoch}-5'
+    assert json.loads(resync['data'])['positions']['2']['x'] == 0.5
+    assert delta['event'] == 'delta'
+    assert json.loads(delta['data'])['base'] == 5
+
+
+def test_stale_robots_are_evicted_after_ttl(monkeypatch):
+    monkeypatch.setattr(main, 'ROBOT_TTL', 2.0)
+    client = RecordingClient()
+    for robot_id, x in ((1, 0.0), (2, 0.2), (3, 0.4), (1, 0.0), (2, 0.2)):
+        send_position(client, robot_id, x=x, y=0.0)
+    assert main.current_neighbors == {'1': [2, 3], '2': [1, 3], '3': [1, 2]}
+    # Robot 3 went quiet before the others
+    now = main.last_seen['2']
+    main.last_seen['3'] = now - 2.5
+    main.last_seen.move_to_end('3', last=False)
+    client.messages.clear()
+
+    assert main.evict_stale_robots(client, now=now + 1.0) == {3}
+
+    assert sorted(main.robot_positions) == sorted(main.last_seen) == ['1', '2']
+    assert len(main.spatial_index) == 2
+    assert '3' not in main.current_neighbors
+    assert '3' not in main.last_neighbors_sent
+    # The evicted robot's own list is cleared and the lists it was part of are republished
+    assert sorted(client.messages) == [('robots/1/neighbors', [2]), ('robots/2/neighbors', [1]), ('robots/3/neighbors', [])]
+    client.messages.clear()
+    assert main.evict_stale_robots(client, now=now + 1.0) == set()
+    assert main.evict_stale_robots(client, now=now + 2.0) == {1, 2}
+    assert sorted(client.messages) == [('robots/1/neighbors', []), ('robots/2/neighbors', [])]
+    assert main.compute_all_neighbors(main.robot_positions) == {}
+
+
+def test_eviction_without_published_list_sends_nothing(monkeypatch):
+    monkeypatch.setattr(main, 'NEIGHBOR_OUTPUT', 'graph')
+    client = RecordingClient()
+    send_position(client, 1, x=0.0, y=0.0)
+
+    assert main.evict_stale_robots(client, now=main.last_seen['1'] + main.ROBOT_TTL) == {1}
+    assert client.messages == []
+
+
+@pytest.mark.parametrize('radius', [0, -1.0, '-0.5', 'nan', 'inf', 'wide'])
+def test_neighborhood_rejects_invalid_radius(radius):
+    async def test(client):
+        response = await client.post('/neighborhood', json={'type': 'RADIUS', 'radius': radius})
+        return response.status, await response.json()
+
+    status, body = serve(test)
+
+    assert status == 400
+    assert body == {'error': 'Invalid radius value'}
+    assert main.radius_value == 1.0
+
+
+def test_neighborhood_sets_radius(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, 'STATE_FILE', str(tmp_path / 'neighborhood_state.json'))
+
+    async def test(client):
+        response = await client.post('/neighborhood', json={'type': 'RADIUS', 'radius': '0.5'})
+        return response.status, await response.json()
+
+    status, body = serve(test)
+
+    assert status == 200
+    assert body['radius'] == main.radius_value == 0.5
+    assert main.spatial_index.cell_size == 0.5
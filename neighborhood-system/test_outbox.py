@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from graph import DELTA_TOPIC, SNAPSHOT_TOPIC
+from main import Outbox
+
+
+class RecordingClient:
+    def __init__(self, block=False):
+        self.messages = []
+        self.block = block
+        self.started = asyncio.Event()
+
+    async def publish(self, topic, payload, qos=0):
+        self.started.set()
+        if self.block:
+            await asyncio.Event().wait()
+        self.messages.append((topic, payload))
+
+
+def test_outbox_keeps_latest_message_per_topic_in_order():
+    async def run():
+        outbox = Outbox()
+        outbox.publish('robots/1/neighbors', 'a1')
+        outbox.publish('robots/2/neighbors', 'b1')
+        outbox.publish('robots/1/neighbors', 'a2')
+        client = RecordingClient()
+        sender = asyncio.create_task(outbox.send(client))
+        await asyncio.sleep(0)
+        outbox.publish('robots/3/neighbors', 'c1')
+        await asyncio.sleep(0)
+        sender.cancel()
+        return client.messages, outbox.pending
+
+    messages, pending = asyncio.run(run())
+
+    assert messages == [('robots/1/neighbors', 'a2'), ('robots/2/neighbors', 'b1'), ('robots/3/neighbors', 'c1')]
+    assert not pending
+
+
+@pytest.mark.parametrize('newer', [None, 'a2'])
+def test_outbox_requeues_in_flight_message_on_cancel(newer):
+    async def run():
+        outbox = Outbox()
+        outbox.publish('robots/1/neighbors', 'a1')
+        outbox.publish('robots/2/neighbors', 'b1')
+        client = RecordingClient(block=True)
+        sender = asyncio.create_task(outbox.send(client))
+        await client.started.wait()
+        if newer:
+            outbox.publish('robots/1/neighbors', newer)
+        sender.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await sender
+        return outbox.pending
+
+    pending = asyncio.run(run())
+
+    if newer:
+        assert [payload for _, payload, _ in pending.values()] == ['b1', 'a2']
+    else:
+        assert [payload for _, payload, _ in pending.values()] == ['a1', 'b1']
+
+
+def drain(outbox):
+    async def run():
+        client = RecordingClient()
+        sender = asyncio.create_task(outbox.send(client))
+        await asyncio.sleep(0)
+        sender.cancel()
+        return client.messages
+
+    return asyncio.run(run())
+
+
+def test_outbox_sends_every_graph_message_in_order():
+    outbox = Outbox()
+    outbox.publish(SNAPSHOT_TOPIC, 's1')
+    outbox.publish(DELTA_TOPIC, 'd2')
+    outbox.publish('robots/1/neighbors', 'a1')
+    outbox.publish(DELTA_TOPIC, 'd3')
+
+    assert drain(outbox) == [
+        (SNAPSHOT_TOPIC, 's1'), (DELTA_TOPIC, 'd2'), ('robots/1/neighbors', 'a1'), (DELTA_TOPIC, 'd3'),
+    ]
+
+
+def test_outbox_snapshot_supersedes_queued_graph_messages():
+    outbox = Outbox()
+    outbox.publish(SNAPSHOT_TOPIC, 's1')
+    outbox.publish(DELTA_TOPIC, 'd2')
+    outbox.publish('robots/1/neighbors', 'a1')
+    outbox.publish(SNAPSHOT_TOPIC, 's3')
+    outbox.publish(DELTA_TOPIC, 'd4')
+
+    assert drain(outbox) == [('robots/1/neighbors', 'a1'), (SNAPSHOT_TOPIC, 's3'), (DELTA_TOPIC, 'd4')]
+
+
+def test_outbox_requeues_in_flight_graph_delta():
+    async def run():
+        outbox = Outbox()
+        outbox.publish(DELTA_TOPIC, 'd2')
+        client = RecordingClient(block=True)
+        sender = asyncio.create_task(outbox.send(client))
+        await client.started.wait()
+        outbox.publish(DELTA_TOPIC, 'd3')
+        sender.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await sender
+        return outbox.pending
+
+    assert [payload for _, payload, _ in asyncio.run(run()).values()] == ['d2', 'd3']
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from spatial import GridIndex, gabriel_neighbors, knn_neighbors, radius_neighbors
+
+
+def random_points(count, seed=0):
+    return np.random.default_rng(seed).uniform(0.0, 2.0, size=(count, 2))
+
+
+def squared_distances(xy):
+    diff = xy[:, None, :] - xy[None, :, :]
+    return (diff * diff).sum(axis=2)
+
+
+def brute_force_gabriel(xy):
+    dist_sq = squared_distances(xy)
+    edges = set()
+    for i in range(len(xy)):
+        for j in range(len(xy)):
+            if i == j:
+                continue
+            witness = dist_sq[i] + dist_sq[j] < dist_sq[i, j]
+            witness[[i, j]] = False
+            if not witness.any():
+                edges.add((i, j))
+    return edges
+
+
+def edges_of(neighbors, rows=None):
+    rows = range(len(neighbors)) if rows is None else rows
+    return {(int(i), int(j)) for i, row in zip(rows, neighbors, strict=True) for j in row}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_radius_neighbors_match_brute_force(seed):
+    xy = random_points(300, seed)
+    dist_sq = squared_distances(xy)
+
+    neighbors = radius_neighbors(xy, 0.25, chunk_elements=5000)
+
+    for i, row in enumerate(neighbors):
+        expected = np.flatnonzero(dist_sq[i] <= 0.25**2)
+        np.testing.assert_array_equal(row, expected[expected != i])
+
+
+@pytest.mark.parametrize("radius", [0.0, -0.25])
+def test_radius_neighbors_without_reach(radius):
+    # Coincident robots are within a radius of 0, nothing is within a negative radius
+    xy = [[0.0, 0.0], [0.0, 0.0], [0.1, 0.0]]
+    index = GridIndex.from_positions(1.0, {i: {'x': x, 'y': y} for i, (x, y) in enumerate(xy)})
+    expected = [[1], [0], []] if radius == 0 else [[], [], []]
+
+    assert [row.tolist() for row in radius_neighbors(xy, radius)] == expected
+    assert [sorted(set(index.query(x, y, radius)) - {i}) for i, (x, y) in enumerate(xy)] == expected
+
+
+def test_grid_index_matches_brute_force():
+    xy = random_points(300)
+    index = GridIndex.from_positions(0.25, {i: {'x': x, 'y': y} for i, (x, y) in enumerate(xy)})
+    dist_sq = squared_distances(xy)
+
+    for i, (x, y) in enumerate(xy):
+        assert sorted(index.query(x, y, 0.25)) == np.flatnonzero(dist_sq[i] <= 0.25**2).tolist()
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_knn_neighbors_match_brute_force(k):
+    xy = random_points(200)
+    dist_sq = squared_distances(xy)
+    np.fill_diagonal(dist_sq, np.inf)
+
+    neighbors = knn_neighbors(xy, k, chunk_elements=3000)
+
+    for i, row in enumerate(neighbors):
+        np.testing.assert_array_equal(row, np.sort(np.argsort(dist_sq[i], kind='stable')[:k]))
+
+
+def test_knn_neighbors_for_some_rows():
+    xy = random_points(100)
+
+    assert [row.tolist() for row in knn_neighbors(xy, 4, rows=[3, 40])] == [
+        row.tolist() for row in np.array(knn_neighbors(xy, 4), dtype=object)[[3, 40]]
+    ]
+
+
+def test_gabriel_with_every_candidate_is_exact():
+    xy = random_points(80)
+
+    assert edges_of(gabriel_neighbors(xy, candidates=len(xy))) == brute_force_gabriel(xy)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_gabriel_with_few_candidates_is_symmetric_subset(seed):
+    xy = random_points(300, seed)
+    candidates = 4
+    dist_sq = squared_distances(xy)
+    np.fill_diagonal(dist_sq, np.inf)
+    nearest = np.argsort(dist_sq, axis=1)[:, :candidates]
+    mutual = {(i, int(j)) for i in range(len(xy)) for j in nearest[i] if i in nearest[j]}
+
+    edges = edges_of(gabriel_neighbors(xy, candidates=candidates, chunk_elements=4000))
+
+    assert edges == {(j, i) for i, j in edges}
+    assert edges == brute_force_gabriel(xy) & mutual
+    assert max(len(row) for row in gabriel_neighbors(xy, candidates=candidates)) <= candidates
+
+
+def test_gabriel_for_some_rows_matches_all_rows():
+    xy = random_points(200)
+    rows = [0, 17, 150]
+
+    everything = gabriel_neighbors(xy, candidates=6)
+    some = gabriel_neighbors(xy, candidates=6, rows=rows)
+
+    assert [row.tolist() for row in some] == [everything[i].tolist() for i in rows]
+
+
+def test_gabriel_with_too_few_robots():
+    assert [row.tolist() for row in gabriel_neighbors(np.zeros((1, 2)))] == [[]]
+    assert [row.tolist() for row in gabriel_neighbors([[0.0, 0.0], [1.0, 0.0]])] == [[1], [0]]